@@ -0,0 +1,184 @@
+"""
+Module: accumulators
+Streaming accumulators for the statistical commands.
+Each accumulator can be fed values in chunks (lists or NumPy arrays) or one at a time,
+and accumulators built on separate partitions can be merged into one.
+"""
+
+import random
+from collections import Counter
+import numpy as np
+
+class MeanVarianceAccumulator:
+    """
+    Running count, mean and sum of squared deviations (Welford's algorithm).
+    Chunks are reduced with NumPy and combined using Chan's parallel update.
+    """
+    def __init__(self):
+        self.count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        """Add a single value."""
+        self.count += 1
+        delta = value - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (value - self._mean)
+
+    def update(self, values):
+        """Add a chunk of values."""
+        chunk = np.asarray(values, dtype=float).ravel()
+        if chunk.size == 0:
+            return
+        chunk_mean = float(chunk.mean())
+        chunk_m2 = float(np.square(chunk - chunk_mean).sum())
+        self._combine(chunk.size, chunk_mean, chunk_m2)
+
+    def merge(self, other):
+        """Fold another MeanVarianceAccumulator into this one."""
+        if other.count:
+            self._combine(other.count, other._mean, other._m2)
+
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self._mean
+        self._mean += delta * count / total
+        self._m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    @property
+    def mean(self):
+        if self.count < 1:
+            raise ValueError("Mean requires at least 1 value.")
+        return self._mean
+
+    @property
+    def variance(self):
+        """Sample variance, matching statistics.variance."""
+        if self.count < 2:
+            raise ValueError("Variance requires at least 2 values.")
+        return self._m2 / (self.count - 1)
+
+class ModeAccumulator:
+    """Counts occurrences of each value; ties resolve to the value seen first."""
+    def __init__(self):
+        self.counts = Counter()
+
+    def add(self, value):
+        """Add a single value."""
+        self.counts[value] += 1
+
+    def update(self, values):
+        """Add a chunk of values."""
+        if isinstance(values, np.ndarray):
+            # Count with NumPy, then insert values in first-seen order to keep tie-breaking.
+            unique, first_seen, counts = np.unique(values.ravel(), return_index=True,
+                                                   return_counts=True)
+            order = np.argsort(first_seen, kind="stable")
+            values = dict(zip(unique[order].tolist(), counts[order].tolist()))
+        self.counts.update(values)
+
+    def merge(self, other):
+        """Fold another ModeAccumulator into this one."""
+        self.counts.update(other.counts)
+
+    @property
+    def count(self):
+        return sum(self.counts.values())
+
+    @property
+    def mode(self):
+        if not self.counts:
+            raise ValueError("Mode requires at least 1 value.")
+        return self.counts.most_common(1)[0][0]
+
+class MedianAccumulator:
+    """
+    Streaming median.
+    By default every value is kept in compact float64 chunks and the median is exact.
+    With 'sketch_size' set, memory is bounded by a KLL-style compactor: once a level
+    holds more than 'sketch_size' values it is sorted and every other value is promoted
+    to the next level with double weight, giving an approximate median.
+    """
+    _PENDING_LIMIT = 4096
+
+    def __init__(self, sketch_size=None, seed=None):
+        self.count = 0
+        self.sketch_size = sketch_size
+        # _levels[i] holds arrays whose values each stand for 2**i inputs.
+        self._levels = [[]]
+        self._pending = []
+        self._rng = random.Random(seed)
+
+    def add(self, value):
+        """Add a single value."""
+        self._pending.append(value)
+        if len(self._pending) >= self._PENDING_LIMIT:
+            self._flush_pending()
+
+    def update(self, values):
+        """Add a chunk of values."""
+        chunk = np.asarray(values, dtype=float).ravel()
+        if chunk.size:
+            self._append(0, chunk)
+
+    def merge(self, other):
+        """Fold another MedianAccumulator into this one."""
+        other._flush_pending()
+        for level, chunks in enumerate(other._levels):
+            for chunk in chunks:
+                self._append(level, chunk)
+
+    @property
+    def exact(self):
+        """True while no values have been compacted."""
+        return not any(self._levels[1:])
+
+    @property
+    def median(self):
+        self._flush_pending()
+        if self.count < 1:
+            raise ValueError("Median requires at least 1 value.")
+        if self.exact:
+            return float(np.median(np.concatenate(self._levels[0])))
+        values = []
+        weights = []
+        for level, chunks in enumerate(self._levels):
+            for chunk in chunks:
+                values.append(chunk)
+                weights.append(np.full(chunk.size, 2 ** level))
+        values = np.concatenate(values)
+        order = np.argsort(values, kind="stable")
+        cumulative = np.cumsum(np.concatenate(weights)[order])
+        position = np.searchsorted(cumulative, cumulative[-1] / 2)
+        return float(values[order][position])
+
+    def _flush_pending(self):
+        if self._pending:
+            pending = np.asarray(self._pending, dtype=float)
+            self._pending = []
+            self._append(0, pending)
+
+    def _append(self, level, chunk):
+        while len(self._levels) <= level:
+            self._levels.append([])
+        self._levels[level].append(chunk)
+        self.count += chunk.size * 2 ** level
+        if self.sketch_size is not None:
+            self._compact()
+
+    def _compact(self):
+        level = 0
+        while level < len(self._levels):
+            chunks = self._levels[level]
+            if sum(chunk.size for chunk in chunks) > self.sketch_size:
+                merged = np.sort(np.concatenate(chunks))
+                # An odd value out stays at this level so total weight is preserved.
+                keep = merged[-1:] if merged.size % 2 else merged[:0]
+                paired = merged[:merged.size - keep.size]
+                self._levels[level] = [keep] if keep.size else []
+                if level + 1 == len(self._levels):
+                    self._levels.append([])
+                self._levels[level + 1].append(paired[self._rng.randint(0, 1)::2])
+            level += 1
@@ -0,0 +1,164 @@
+"""
+Module: columnar_store
+Binary columnar storage for calculation history.
+
+A store is a directory (conventionally named '*.cols') holding one file per column:
+
+  meta.json              row count and the command vocabulary
+  command.npy            int32 codes into the command vocabulary
+  arguments.offsets.npy  int64 start offsets (rows + 1) into arguments.bin
+  arguments.bin          UTF-8 argument strings, concatenated
+  result.npy             float64 results
+  timestamp.npy          datetime64[us] timestamps
+
+Opening a store only reads meta.json; column files are memory-mapped on first use, so
+rows are paged in by the OS as they are touched. pandas is only imported to build or
+write DataFrames.
+"""
+
+import json
+import os
+import shutil
+import numpy as np
+
+COLUMNAR_SUFFIX = ".cols"
+FORMAT_VERSION = 1
+EXPORT_CHUNK_ROWS = 100_000
+
+def _format_timestamps(values):
+    """Render datetime64[us] values in the history's 'YYYY-MM-DD HH:MM:SS.ffffff' form."""
+    if values.size == 0:
+        return np.array([], dtype=object)
+    return np.char.replace(np.datetime_as_string(values, unit="us"), "T", " ").astype(object)
+
+def is_columnar_path(path):
+    """Return True if 'path' names a columnar store rather than a CSV file."""
+    return os.fspath(path).rstrip(os.sep).endswith(COLUMNAR_SUFFIX)
+
+class ColumnarHistory:
+    """Read-only, lazily loaded view of a columnar history store."""
+    def __init__(self, path):
+        self.path = os.fspath(path).rstrip(os.sep)
+        old_path = f"{self.path}.old"
+        if not os.path.exists(self.path) and os.path.exists(old_path):
+            # A write was interrupted between swapping the old store out and the new one in.
+            os.replace(old_path, self.path)
+        with open(os.path.join(self.path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported columnar history version: {meta.get('version')}")
+        self.rows = meta["rows"]
+        self.commands = meta["commands"]
+        self._columns = {}
+
+    def __len__(self):
+        return self.rows
+
+    def _column(self, name):
+        if name not in self._columns:
+            if name == "arguments.bin":
+                column_path = os.path.join(self.path, name)
+                if os.path.getsize(column_path) == 0:
+                    self._columns[name] = np.zeros(0, dtype=np.uint8)
+                else:
+                    self._columns[name] = np.memmap(column_path, dtype=np.uint8, mode="r")
+            else:
+                self._columns[name] = np.load(os.path.join(self.path, f"{name}.npy"),
+                                              mmap_mode="r")
+        return self._columns[name]
+
+    @property
+    def results(self):
+        """Memory-mapped float64 result column."""
+        return self._column("result")
+
+    @property
+    def timestamps(self):
+        """Memory-mapped datetime64[us] timestamp column."""
+        return self._column("timestamp")
+
+    @property
+    def command_codes(self):
+        """Memory-mapped int32 codes into self.commands."""
+        return self._column("command")
+
+    def arguments(self, start=0, stop=None):
+        """Decode the argument strings for rows [start, stop)."""
+        stop = self.rows if stop is None else stop
+        offsets = np.asarray(self._column("arguments.offsets")[start:stop + 1])
+        if offsets.size == 0:
+            return []
+        blob = self._column("arguments.bin")[offsets[0]:offsets[-1]].tobytes()
+        relative = (offsets - offsets[0]).tolist()
+        return [blob[relative[i]:relative[i + 1]].decode("utf-8")
+                for i in range(len(relative) - 1)]
+
+    def to_dataframe(self, start=0, stop=None):
+        """Materialize rows [start, stop) in the same shape as the CSV history."""
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        stop = self.rows if stop is None else min(stop, self.rows)
+        start = min(start, stop)
+        vocabulary = np.array(self.commands, dtype=object)
+        return pd.DataFrame({
+            "command": vocabulary[np.asarray(self.command_codes[start:stop])],
+            "arguments": self.arguments(start, stop),
+            "result": np.array(self.results[start:stop]),
+            "timestamp": _format_timestamps(self.timestamps[start:stop]),
+        }, index=pd.RangeIndex(start, stop))
+
+    def last_timestamp(self):
+        """Timestamp string of the final row, or None for an empty store."""
+        if self.rows == 0:
+            return None
+        return _format_timestamps(self.timestamps[self.rows - 1:])[0]
+
+    def export_csv(self, csv_path):
+        """Write the store to a CSV file in chunks."""
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            self.to_dataframe(0, 0).to_csv(f, index=False)
+            for start in range(0, self.rows, EXPORT_CHUNK_ROWS):
+                chunk = self.to_dataframe(start, start + EXPORT_CHUNK_ROWS)
+                chunk.to_csv(f, index=False, header=False)
+
+    @staticmethod
+    def write(path, frame):
+        """
+        Write a history DataFrame as a columnar store at 'path'.
+        The store is built in a sibling directory and swapped in, so readers never
+        see a partially written store.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        path = os.fspath(path).rstrip(os.sep)
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        codes, commands = pd.factorize(frame["command"].astype(str))
+        encoded = [str(value).encode("utf-8") for value in frame["arguments"]]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        timestamps = np.array(frame["timestamp"].astype(str).tolist(), dtype="datetime64[us]")
+
+        np.save(os.path.join(tmp_path, "command.npy"), codes.astype(np.int32))
+        np.save(os.path.join(tmp_path, "arguments.offsets.npy"), offsets)
+        with open(os.path.join(tmp_path, "arguments.bin"), "wb") as f:
+            f.write(b"".join(encoded))
+        np.save(os.path.join(tmp_path, "result.npy"), frame["result"].to_numpy(dtype=float))
+        np.save(os.path.join(tmp_path, "timestamp.npy"), timestamps)
+        with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"version": FORMAT_VERSION, "rows": len(frame),
+                       "commands": [str(name) for name in commands]}, f)
+
+        old_path = f"{path}.old"
+        if os.path.exists(path):
+            shutil.rmtree(old_path, ignore_errors=True)
+            os.replace(path, old_path)
+        os.replace(tmp_path, path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    @classmethod
+    def import_csv(cls, csv_path, path):
+        """Convert a CSV history file into a columnar store and open it."""
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        cls.write(path, pd.read_csv(csv_path))
+        return cls(path)
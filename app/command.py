@@ -1,9 +1,16 @@
 import math
-import statistics
 from abc import ABC, abstractmethod
+import numpy as np
 from .calculator import Calculator
+from .accumulators import MeanVarianceAccumulator, MedianAccumulator, ModeAccumulator
+
+# Calculator holds no state, so every command shares one instance.
+_CALCULATOR = Calculator()
 
 class Command(ABC):
+    # Commands whose result depends only on their arguments may be served from a ResultCache.
+    cacheable = True
+
     @abstractmethod
     def execute(self):  # pragma: no cover
         pass  # pragma: no cover
@@ -11,7 +18,7 @@ class Command(ABC):
 class AddCommand(Command):
     def __init__(self, args):
         self.args = args
-        self.calculator = Calculator()
+        self.calculator = _CALCULATOR
     
     def execute(self):
         if len(self.args) != 2:
@@ -21,7 +28,7 @@ class AddCommand(Command):
 class SubtractCommand(Command):
     def __init__(self, args):
         self.args = args
-        self.calculator = Calculator()
+        self.calculator = _CALCULATOR
     
     def execute(self):
         if len(self.args) != 2:
@@ -31,7 +38,7 @@ class SubtractCommand(Command):
 class MultiplyCommand(Command):
     def __init__(self, args):
         self.args = args
-        self.calculator = Calculator()
+        self.calculator = _CALCULATOR
     
     def execute(self):
         if len(self.args) != 2:
@@ -41,7 +48,7 @@ class MultiplyCommand(Command):
 class DivideCommand(Command):
     def __init__(self, args):
         self.args = args
-        self.calculator = Calculator()
+        self.calculator = _CALCULATOR
     
     def execute(self):
         if len(self.args) != 2:
@@ -56,11 +63,11 @@ class SqrtCommand(Command):
     def execute(self):
         if len(self.args) != 1:
             raise ValueError("SqrtCommand requires exactly 1 argument.")
-        if self.args[0] < 0:
-            raise ValueError("Cannot take square root of a negative number.")
-        return math.sqrt(self.args[0])
+        return _sqrt(self.args)
 
 # Statistical Operations
+# Each command feeds its arguments to a streaming accumulator (see app/accumulators.py),
+# so the same code path also serves chunked and merged inputs.
 
 class MeanCommand(Command):
     """Command to calculate the mean of a list of numbers."""
@@ -70,7 +77,7 @@ class MeanCommand(Command):
     def execute(self):
         if len(self.args) < 1:
             raise ValueError("MeanCommand requires at least 1 argument.")
-        return statistics.mean(self.args)
+        return _mean(self.args)
 
 class MedianCommand(Command):
     """Command to calculate the median of a list of numbers."""
@@ -80,7 +87,7 @@ class MedianCommand(Command):
     def execute(self):
         if len(self.args) < 1:
             raise ValueError("MedianCommand requires at least 1 argument.")
-        return statistics.median(self.args)
+        return _median(self.args)
 
 class ModeCommand(Command):
     """Command to calculate the mode of a list of numbers."""
@@ -90,7 +97,7 @@ class ModeCommand(Command):
     def execute(self):
         if len(self.args) < 1:
             raise ValueError("ModeCommand requires at least 1 argument.")
-        return statistics.mode(self.args)
+        return _mode(self.args)
 
 class VarianceCommand(Command):
     """Command to calculate the variance of a list of numbers."""
@@ -100,10 +107,182 @@ class VarianceCommand(Command):
     def execute(self):
         if len(self.args) < 2:
             raise ValueError("VarianceCommand requires at least 2 arguments.")
-        return statistics.variance(self.args)
+        return _variance(self.args)
+
+# Flyweight dispatch
+# The kernels below take the argument list and do no arity checks; the Command classes
+# above check arity on every execute(), Operation checks it once when a line is parsed.
+
+def _add(args):
+    return _CALCULATOR.add(args[0], args[1])
+
+def _subtract(args):
+    return _CALCULATOR.subtract(args[0], args[1])
+
+def _multiply(args):
+    return _CALCULATOR.multiply(args[0], args[1])
+
+def _divide(args):
+    return _CALCULATOR.divide(args[0], args[1])
+
+def _sqrt(args):
+    if args[0] < 0:
+        raise ValueError("Cannot take square root of a negative number.")
+    return math.sqrt(args[0])
+
+def _mean(args):
+    accumulator = MeanVarianceAccumulator()
+    accumulator.update(args)
+    return accumulator.mean
+
+def _median(args):
+    accumulator = MedianAccumulator()
+    accumulator.update(args)
+    return accumulator.median
+
+def _mode(args):
+    accumulator = ModeAccumulator()
+    accumulator.update(args)
+    return accumulator.mode
+
+def _variance(args):
+    accumulator = MeanVarianceAccumulator()
+    accumulator.update(args)
+    return accumulator.variance
+
+class Operation:
+    """
+    A stateless command shared by every call. 'function' takes the argument list;
+    'min_args' and 'max_args' (None = unbounded) are checked by check_arity() when a
+    command line is parsed, so executing a resolved Operation allocates no Command.
+    """
+    __slots__ = ("name", "function", "command_class", "min_args", "max_args")
+
+    def __init__(self, name, function, command_class, min_args=0, max_args=None):
+        self.name = name
+        self.function = function
+        self.command_class = command_class
+        self.min_args = min_args
+        self.max_args = max_args
+
+    @property
+    def cacheable(self):
+        return self.command_class.cacheable
+
+    def check_arity(self, count):
+        """Raise ValueError, worded like the Command classes, if 'count' arguments won't do."""
+        if self.min_args <= count and (self.max_args is None or count <= self.max_args):
+            return
+        label = self.command_class.__name__
+        if self.min_args == self.max_args:
+            if count != self.min_args:
+                plural = "argument" if self.min_args == 1 else "arguments"
+                raise ValueError(f"{label} requires exactly {self.min_args} {plural}.")
+        elif count < self.min_args:
+            plural = "argument" if self.min_args == 1 else "arguments"
+            raise ValueError(f"{label} requires at least {self.min_args} {plural}.")
+        elif self.max_args is not None and count > self.max_args:
+            plural = "argument" if self.max_args == 1 else "arguments"
+            raise ValueError(f"{label} requires at most {self.max_args} {plural}.")
+
+    @classmethod
+    def wrap(cls, name, command_class):
+        """Adapt any Command class; it keeps checking its own arity in execute()."""
+        return cls(name, lambda args: command_class(args).execute(), command_class)
+
+OPERATIONS = {operation.name: operation for operation in (
+    Operation("add", _add, AddCommand, 2, 2),
+    Operation("subtract", _subtract, SubtractCommand, 2, 2),
+    Operation("multiply", _multiply, MultiplyCommand, 2, 2),
+    Operation("divide", _divide, DivideCommand, 2, 2),
+    Operation("sqrt", _sqrt, SqrtCommand, 1, 1),
+    Operation("mean", _mean, MeanCommand, 1),
+    Operation("median", _median, MedianCommand, 1),
+    Operation("mode", _mode, ModeCommand, 1),
+    Operation("variance", _variance, VarianceCommand, 2),
+)}
+
+# Vectorized batch execution
+
+class BatchResult:
+    """
+    Outcome of a vectorized batch run.
+    'values' holds one result per element (NaN where the element failed), 'mask' is
+    True for failed elements and 'errors' maps each error message to the indices it hit.
+    """
+    def __init__(self, values, mask, errors):
+        self.values = values
+        self.mask = mask
+        self.errors = errors
+
+    @property
+    def error_count(self):
+        """Number of elements that failed validation."""
+        return int(self.mask.sum())
+
+    def error_report(self):
+        """Return (index, message) pairs for every failed element, ordered by index."""
+        report = [(int(i), message) for message, indices in self.errors.items() for i in indices]
+        return sorted(report)
+
+# name -> (command class, ufunc, [(error message, predicate over operands)])
+BATCH_OPERATIONS = {
+    "add": (AddCommand, np.add, []),
+    "subtract": (SubtractCommand, np.subtract, []),
+    "multiply": (MultiplyCommand, np.multiply, []),
+    "divide": (DivideCommand, np.divide, [
+        ("Division by zero is not allowed.", lambda a, b: b == 0),
+    ]),
+    "sqrt": (SqrtCommand, np.sqrt, [
+        ("Cannot take square root of a negative number.", lambda a: a < 0),
+    ]),
+}
+
+# Row-wise versions of the statistical kernels. They repeat the accumulators' arithmetic
+# step for step, so each row gives exactly the scalar command's result.
+
+def _batch_mean(rows):
+    count = rows.shape[1]
+    # MeanVarianceAccumulator folds the chunk mean into an empty state as mean * n / n.
+    return rows.mean(axis=1) * count / count
+
+def _batch_median(rows):
+    return np.median(rows, axis=1)
+
+def _batch_variance(rows):
+    deviations = rows - rows.mean(axis=1, keepdims=True)
+    return np.square(deviations).sum(axis=1) / (rows.shape[1] - 1)
+
+# Rows wider than this are counted one at a time; pairwise counting grows with width**2.
+_BATCH_MODE_MAX_WIDTH = 64
+
+def _batch_mode(rows):
+    width = rows.shape[1]
+    if width > _BATCH_MODE_MAX_WIDTH:
+        return np.array([_mode(row) for row in rows.tolist()], dtype=float)
+    values = np.empty(len(rows))
+    step = max(1, (1 << 22) // (width * width))
+    for start in range(0, len(rows), step):
+        block = rows[start:start + step]
+        # How often each value occurs in its row; NaN never equals itself, but the
+        # scalar command still counts each NaN once.
+        counts = (block[:, :, None] == block[:, None, :]).sum(axis=2) + np.isnan(block)
+        # The first position with the top count holds the first-seen most common value,
+        # which is how ModeAccumulator breaks ties.
+        values[start:start + step] = block[np.arange(len(block)), counts.argmax(axis=1)]
+    return values
+
+# name -> (command class, function over a 2-D array returning one value per row)
+BATCH_REDUCTIONS = {
+    "mean": (MeanCommand, _batch_mean),
+    "median": (MedianCommand, _batch_median),
+    "mode": (ModeCommand, _batch_mode),
+    "variance": (VarianceCommand, _batch_variance),
+}
 
 class CommandFactory:
-    def __init__(self):
+    def __init__(self, cache=None):
+        self.cache = cache
         self.commands = {
             "add": AddCommand,
             "subtract": SubtractCommand,
@@ -115,9 +294,92 @@ class CommandFactory:
             "mode": ModeCommand,
             "variance": VarianceCommand
         }
+        # name -> Operation, kept in step with self.commands by resolve().
+        self._operations = {}
     
     def create_command(self, command_name, args):
         command_class = self.commands.get(command_name.lower())
         if command_class:
             return command_class(args)
         return None
+
+    def execute_command(self, command_name, args):
+        """
+        Create and execute a command, serving repeated calls from the result cache when
+        one is configured and the command is cacheable.
+        Raises ValueError for unknown commands or the wrong number of arguments.
+        """
+        return self.execute_operation(self.resolve(command_name, len(args)), args)
+
+    def resolve(self, command_name, arg_count=None):
+        """
+        Return the shared Operation for 'command_name', checking 'arg_count' against its
+        arity when given. Commands registered in self.commands without a flyweight are
+        wrapped. Raises ValueError for unknown commands or a bad argument count.
+        """
+        name = command_name.lower()
+        command_class = self.commands.get(name)
+        if command_class is None:
+            raise ValueError(f"Unknown command '{command_name}'.")
+        operation = self._operations.get(name)
+        if operation is None or operation.command_class is not command_class:
+            operation = OPERATIONS.get(name)
+            if operation is None or operation.command_class is not command_class:
+                operation = Operation.wrap(name, command_class)
+            self._operations[name] = operation
+        if arg_count is not None:
+            operation.check_arity(arg_count)
+        return operation
+
+    def execute_operation(self, operation, args):
+        """
+        Run a resolved Operation on arguments whose count was already checked, serving
+        repeated calls from the result cache when one is configured.
+        """
+        if self.cache is None or not operation.cacheable:
+            return operation.function(args)
+        key = self.cache.make_key("command", operation.name, args)
+        return self.cache.get_or_compute(key, lambda: operation.function(args))
+
+    def execute_batch(self, command_name, *operands):
+        """
+        Run an arithmetic or sqrt command over NumPy arrays in one vectorized pass.
+        Operands are broadcast against each other. Elements that would raise in the
+        scalar command are masked and reported in the returned BatchResult.
+        """
+        operation = BATCH_OPERATIONS.get(command_name.lower())
+        if operation is None:
+            raise ValueError(f"Command '{command_name}' does not support batch execution.")
+        command_class, ufunc, checks = operation
+        if len(operands) != ufunc.nin:
+            plural = "argument" if ufunc.nin == 1 else "arguments"
+            raise ValueError(f"{command_class.__name__} requires exactly {ufunc.nin} {plural}.")
+        arrays = np.broadcast_arrays(*(np.asarray(op, dtype=float) for op in operands))
+        mask = np.zeros(arrays[0].shape, dtype=bool)
+        errors = {}
+        for message, predicate in checks:
+            failed = predicate(*arrays) & ~mask
+            if failed.any():
+                errors[message] = np.flatnonzero(failed)
+                mask |= failed
+        values = np.full(arrays[0].shape, np.nan)
+        ufunc(*arrays, out=values, where=~mask)
+        return BatchResult(values, mask, errors)
+
+    def execute_batch_rows(self, command_name, rows):
+        """
+        Run mean, median, mode or variance over every row of a 2-D array in one vectorized
+        pass, each row holding one call's arguments.
+        Raises ValueError, like the scalar command, if rows are too short for the command.
+        """
+        name = command_name.lower()
+        reduction = BATCH_REDUCTIONS.get(name)
+        if reduction is None:
+            raise ValueError(f"Command '{command_name}' does not support row-wise batch "
+                             "execution.")
+        rows = np.asarray(rows, dtype=float)
+        if rows.ndim != 2:
+            raise ValueError("Row-wise batch execution needs a 2-D array.")
+        OPERATIONS[name].check_arity(rows.shape[1])
+        values = reduction[1](rows)
+        return BatchResult(values, np.zeros(values.shape, dtype=bool), {})
@@ -0,0 +1,140 @@
+"""
+Module: expression
+Compiles formulas such as '(3 + 4) * sqrt(2) / mean(1, 2, 3)' into reusable callables.
+
+Expressions are parsed with Python's ast module and restricted to numbers, variables,
+the + - * / operators (evaluated by Calculator), unary minus, and calls to calculator
+commands or plugins. Constant subexpressions are folded at compile time, and the rest
+is compiled into a tree of closures. Compiled expressions are cached by source text,
+so re-evaluating a formula with different variable values skips parsing entirely.
+"""
+
+import ast
+from .calculator import Calculator
+from .result_cache import ResultCache
+
+class CompiledExpression:
+    """
+    A compiled formula. Call it with a mapping of variable values to evaluate it.
+    'variables' lists the free names the formula reads.
+    """
+    def __init__(self, source, function, variables):
+        self.source = source
+        self.variables = variables
+        self._function = function
+
+    def __call__(self, variables=None):
+        return self._function(variables or {})
+
+class ExpressionCompiler:
+    """
+    Compiles expressions over a CommandFactory's commands and, optionally, a
+    PluginManager's plugins. Up to 'cache_size' compiled expressions are kept.
+    """
+    def __init__(self, command_factory, plugin_manager=None, cache_size=256):
+        self.command_factory = command_factory
+        self.plugin_manager = plugin_manager
+        self.cache = ResultCache(maxsize=cache_size)
+        calculator = Calculator()
+        self.operators = {
+            ast.Add: calculator.add,
+            ast.Sub: calculator.subtract,
+            ast.Mult: calculator.multiply,
+            ast.Div: calculator.divide,
+        }
+
+    def compile(self, source):
+        """
+        Return the CompiledExpression for 'source', from the cache when possible.
+        Raises ValueError for invalid syntax or unsupported constructs.
+        """
+        source = source.strip()
+        return self.cache.get_or_compute(("expression", source), lambda: self._compile(source))
+
+    def evaluate(self, source, variables=None):
+        """Compile (or reuse) 'source' and evaluate it with 'variables'."""
+        return self.compile(source)(variables)
+
+    def _compile(self, source):
+        try:
+            tree = ast.parse(source, mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid expression: {e.msg}.") from None
+        variables = set()
+        function = self._compile_node(self._fold(tree.body), variables)
+        return CompiledExpression(source, function, frozenset(variables))
+
+    def _function(self, name, arg_count):
+        """
+        Return (callable, pure) for a call of 'name' with 'arg_count' arguments.
+        Commands are resolved and arity-checked here, once per compile.
+        Raises ValueError for unknown names or a wrong argument count.
+        """
+        if name.lower() in self.command_factory.commands:
+            operation = self.command_factory.resolve(name, arg_count)
+            execute = self.command_factory.execute_operation
+            return (lambda *args: execute(operation, args)), True
+        if self.plugin_manager is not None and name in self.plugin_manager.plugins:
+            execute_plugin = self.plugin_manager.execute_plugin
+            pure = name not in self.plugin_manager.nondeterministic
+            # Plugins are looked up on every call, so reloads take effect immediately.
+            return (lambda *args: execute_plugin(name, *args)), pure
+        raise ValueError(f"Unknown function '{name}'.")
+
+    def _fold(self, node):
+        """Replace subtrees without variables or impure calls by their value."""
+        if isinstance(node, ast.BinOp):
+            node.left, node.right = self._fold(node.left), self._fold(node.right)
+            foldable = all(isinstance(child, ast.Constant) for child in (node.left, node.right))
+        elif isinstance(node, ast.UnaryOp):
+            node.operand = self._fold(node.operand)
+            foldable = isinstance(node.operand, ast.Constant)
+        elif isinstance(node, ast.Call):
+            node.args = [self._fold(arg) for arg in node.args]
+            foldable = (isinstance(node.func, ast.Name) and not node.keywords
+                        and self._function(node.func.id, len(node.args))[1]
+                        and all(isinstance(arg, ast.Constant) for arg in node.args))
+        else:
+            return node
+        if not foldable:
+            return node
+        try:
+            value = self._compile_node(node, set())({})
+        except Exception:  # pylint: disable=broad-exception-caught
+            # Leave it to fail at evaluation time, like the unfolded expression would.
+            return node
+        return ast.copy_location(ast.Constant(value), node)
+
+    def _compile_node(self, node, variables):
+        if isinstance(node, ast.Constant):
+            if isinstance(node.value, bool) or not isinstance(node.value, (int, float)):
+                raise ValueError(f"Unsupported constant {node.value!r}.")
+            value = node.value
+            return lambda env: value
+        if isinstance(node, ast.Name):
+            name = node.id
+            variables.add(name)
+
+            def load(env):
+                try:
+                    return env[name]
+                except KeyError:
+                    raise ValueError(f"Undefined variable '{name}'.") from None
+            return load
+        if isinstance(node, ast.BinOp):
+            operator = self.operators.get(type(node.op))
+            if operator is None:
+                raise ValueError(f"Unsupported operator '{type(node.op).__name__}'.")
+            left = self._compile_node(node.left, variables)
+            right = self._compile_node(node.right, variables)
+            return lambda env: operator(left(env), right(env))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = self._compile_node(node.operand, variables)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            return lambda env: -operand(env)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            function, _ = self._function(node.func.id, len(node.args))
+            args = [self._compile_node(arg, variables) for arg in node.args]
+            return lambda env: function(*[arg(env) for arg in args])
+        raise ValueError(f"Unsupported expression element '{type(node).__name__}'.")
@@ -0,0 +1,142 @@
+"""
+Module: file_operands
+Reads operands for the statistical commands from files, e.g. 'mean @data.f64' or
+'median @values.csv:col2'.
+
+Raw binary files (.f64/.bin little-endian float64, .f32 float32, .npy) are memory-mapped
+one slice at a time and handed to the streaming accumulators; anything else is read as
+CSV in chunks of rows. No Python float list is built, so memory stays bounded by the
+chunk size however large the file is. For files, the median uses the accumulator's
+bounded sketch, which stays exact until more than MEDIAN_SKETCH_SIZE values are seen.
+"""
+
+import csv
+import os
+import re
+import numpy as np
+from .accumulators import MeanVarianceAccumulator, MedianAccumulator, ModeAccumulator
+
+CHUNK_SIZE = 1 << 20
+MEDIAN_SKETCH_SIZE = 1 << 20
+BINARY_DTYPES = {".f64": "<f8", ".bin": "<f8", ".f32": "<f4"}
+STATISTICS = ("mean", "median", "mode", "variance")
+
+def is_file_operand(token):
+    return token.startswith("@") and len(token) > 1
+
+def parse_file_operand(token):
+    """
+    Split '@path[:column]' into (path, column or None).
+    A colon only starts a column when what follows it is not part of the path,
+    so Windows drive letters such as '@C:\\data.f64' are left alone.
+    """
+    if not is_file_operand(token):
+        raise ValueError(f"File operands look like '@path[:column]', got '{token}'.")
+    path, _, column = token[1:].rpartition(":")
+    if not path or not column or "/" in column or "\\" in column:
+        return token[1:], None
+    return path, column
+
+def iter_file_values(path, column=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield the numbers in 'path' as float64 arrays of at most 'chunk_size' values.
+    'column' selects a CSV column by header name, 1-based index ('2') or 'col2';
+    without it the first column is read. A first row without any numbers is taken
+    as the header, and empty CSV cells are skipped.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in BINARY_DTYPES or extension == ".npy":
+        if column is not None:
+            raise ValueError(f"Binary file '{path}' has no columns.")
+        return _iter_binary(path, extension, chunk_size)
+    return _iter_csv(path, column, chunk_size)
+
+def _iter_binary(path, extension, chunk_size):
+    if extension == ".npy":
+        dtype, offset, count = _npy_layout(path)
+    else:
+        dtype, offset = np.dtype(BINARY_DTYPES[extension]), 0
+        size = os.path.getsize(path)
+        if size % dtype.itemsize:
+            raise ValueError(f"Size of '{path}' is not a multiple of {dtype.itemsize} bytes.")
+        count = size // dtype.itemsize
+    for start in range(0, count, chunk_size):
+        # Each chunk gets its own mapping, so pages are released once it has been consumed.
+        chunk = np.memmap(path, dtype=dtype, mode="r", offset=offset + start * dtype.itemsize,
+                          shape=(min(chunk_size, count - start),))
+        yield np.asarray(chunk, dtype=float)
+
+def _npy_layout(path):
+    """Return (dtype, data offset, value count) from the header of a .npy file."""
+    with open(path, "rb") as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1, 0):
+            shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        else:
+            shape, _, dtype = np.lib.format.read_array_header_2_0(f)
+        offset = f.tell()
+    if dtype.hasobject:
+        raise ValueError(f"'{path}' does not hold numbers.")
+    return dtype, offset, int(np.prod(shape))
+
+def _iter_csv(path, column, chunk_size):
+    import pandas as pd  # pylint: disable=import-outside-toplevel
+    with open(path, newline="", encoding="utf-8") as f:
+        first_row = next(csv.reader(f), None)
+    if not first_row:
+        return
+    has_header = not any(_is_number(cell) for cell in first_row)
+    index = _column_index(path, column, first_row if has_header else None)
+    if index >= len(first_row):
+        raise ValueError(f"'{path}' has no column {index + 1}.")
+    reader = pd.read_csv(path, header=0 if has_header else None, usecols=[index],
+                         chunksize=chunk_size, skip_blank_lines=True)
+    for frame in reader:
+        try:
+            chunk = frame.iloc[:, 0].to_numpy(dtype=float)
+        except ValueError:
+            raise ValueError(f"Column {index + 1} of '{path}' contains non-numeric values.") \
+                from None
+        yield chunk[~np.isnan(chunk)]
+
+def _column_index(path, column, header):
+    """Return the 0-based index of 'column' in a CSV file with the given header row."""
+    if column is None:
+        return 0
+    if header is not None and column in header:
+        return header.index(column)
+    match = re.fullmatch(r"(?:col)?(\d+)", column, re.IGNORECASE)
+    if match is None or int(match.group(1)) < 1:
+        raise ValueError(f"Column '{column}' not found in '{path}'.")
+    return int(match.group(1)) - 1
+
+def _is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
+
+def execute_statistic(command_name, tokens, chunk_size=CHUNK_SIZE,
+                      median_sketch_size=MEDIAN_SKETCH_SIZE):
+    """
+    Run a statistical command over 'tokens', a mix of numbers and '@path[:column]'
+    file operands, feeding file contents to the command's accumulator chunk by chunk.
+    Raises ValueError for other commands or unreadable values, OSError for missing files.
+    """
+    name = command_name.lower()
+    if name not in STATISTICS:
+        raise ValueError(f"File operands are only supported by {', '.join(STATISTICS)}.")
+    if name == "median":
+        accumulator = MedianAccumulator(sketch_size=median_sketch_size)
+    elif name == "mode":
+        accumulator = ModeAccumulator()
+    else:
+        accumulator = MeanVarianceAccumulator()
+    for token in tokens:
+        if is_file_operand(token):
+            for chunk in iter_file_values(*parse_file_operand(token), chunk_size=chunk_size):
+                accumulator.update(chunk)
+        else:
+            accumulator.add(float(token))
+    return getattr(accumulator, name)
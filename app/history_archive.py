@@ -0,0 +1,195 @@
+"""
+Module: history_archive
+Segment files for history records rolled out of memory.
+
+HistoryArchive appends records to CSV segment files in one directory
+(segment-000001.csv, segment-000002.csv, ...). A new segment is started once the
+current one holds 'segment_records' rows or, with 'segment_period' set to 'hour', 'day'
+or 'month', when a record's timestamp falls in a different period than the segment's
+first record. Segments use the history CSV layout, so each one can also be opened with
+HistoryManager.load_history. Nothing is read until a segment is listed, loaded or queried.
+
+Appends are idempotent: before writing, 'last_append.json' records the batch's first
+record and where the segments ended. If a crash stops the history from noting that the
+rows were archived, the same rows are appended again later, and the ones already
+written are skipped.
+"""
+
+import csv
+import json
+import math
+import os
+import re
+from .history_index import HistoryIndex
+from .history_manager import COLUMNS, _parse_result
+
+# Length of the timestamp prefix ('YYYY-MM-DD HH') that names each period.
+PERIODS = {"hour": 13, "day": 10, "month": 7}
+_SEGMENT_NAME = re.compile(r"segment-(\d{6})\.csv")
+_MARKER = "last_append.json"
+
+class HistoryArchive:
+    """Archived history records, stored as segment files in 'directory'."""
+    def __init__(self, directory, segment_records=100000, segment_period=None):
+        if segment_period is not None and segment_period not in PERIODS:
+            raise ValueError(f"Segment period must be one of {', '.join(PERIODS)}.")
+        if segment_records < 1:
+            raise ValueError("Segments must hold at least one record.")
+        self.directory = directory
+        self.segment_records = segment_records
+        self.segment_period = segment_period
+        os.makedirs(directory, exist_ok=True)
+        # [name, rows, period key] of the segment being appended to, once known.
+        self._current = None
+
+    def segment_names(self):
+        """Names of the segment files, oldest first."""
+        return sorted(name for name in os.listdir(self.directory)
+                      if _SEGMENT_NAME.fullmatch(name))
+
+    def _path(self, name):
+        if not _SEGMENT_NAME.fullmatch(name):
+            raise ValueError(f"'{name}' is not a history segment.")
+        return os.path.join(self.directory, name)
+
+    def _period_key(self, timestamp):
+        if self.segment_period is None:
+            return None
+        return str(timestamp)[:PERIODS[self.segment_period]]
+
+    def _current_segment(self):
+        if self._current is None:
+            names = self.segment_names()
+            if names:
+                records = self.read(names[-1])
+                key = self._period_key(records[0][3]) if records else None
+                self._current = [names[-1], len(records), key]
+        return self._current
+
+    def refresh(self):
+        """Forget the cached current segment, e.g. after another process appended."""
+        self._current = None
+
+    def append(self, rows):
+        """
+        Append records given as column lists (as HistoryManager keeps them), starting
+        new segments as the size or period limit is reached. Each touched segment is
+        fsynced before this returns.
+        """
+        records = list(zip(*(rows[column] for column in COLUMNS)))
+        done = self._already_archived(records)
+        records = records[done:]
+        if not records:
+            return
+        current = self._current_segment()
+        if not done:
+            # Resuming a batch keeps its marker, in case this attempt is cut short too.
+            self._write_marker(records[0], current)
+        position = 0
+        while position < len(records):
+            key = self._period_key(records[position][3])
+            if current is None or current[1] >= self.segment_records or key != current[2]:
+                number = 1 if current is None else int(current[0][8:14]) + 1
+                current = [f"segment-{number:06d}.csv", 0, key]
+                mode = "w"
+            else:
+                mode = "a"
+            # Write the run of records that belongs in this segment in one go.
+            stop = min(len(records), position + self.segment_records - current[1])
+            if key is not None:
+                end = position + 1
+                while end < stop and self._period_key(records[end][3]) == key:
+                    end += 1
+                stop = end
+            with open(self._path(current[0]), mode, encoding="utf-8", newline="") as out:
+                writer = csv.writer(out, lineterminator="\n")
+                if mode == "w":
+                    writer.writerow(COLUMNS)
+                writer.writerows(_csv_row(record) for record in records[position:stop])
+                out.flush()
+                os.fsync(out.fileno())
+            current[1] += stop - position
+            self._current = current
+            position = stop
+
+    def _already_archived(self, records):
+        """
+        Return how many leading 'records' an earlier append of the same batch wrote:
+        the rows after the position recorded when that batch, starting with the same
+        record, was begun.
+        """
+        if not records:
+            return 0
+        try:
+            with open(os.path.join(self.directory, _MARKER), encoding="utf-8") as f:
+                marker = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if marker["first"] != _marker_key(records[0]):
+            return 0
+        written = sum(len(self.read(name)) for name in self.segment_names()
+                      if name >= marker["segment"]) - marker["rows"]
+        return max(0, min(written, len(records)))
+
+    def _write_marker(self, first, current):
+        path = os.path.join(self.directory, _MARKER)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump({"first": _marker_key(first),
+                       "segment": current[0] if current is not None else "",
+                       "rows": current[1] if current is not None else 0}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+
+    def read(self, name):
+        """Return the records of segment 'name' as (command, arguments, result, timestamp)."""
+        with open(self._path(name), encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)
+            return [(command, arguments, _parse_result(result), timestamp)
+                    for command, arguments, result, timestamp in reader]
+
+    def load(self, name):
+        """Return segment 'name' as a DataFrame shaped like HistoryManager.history."""
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        return pd.DataFrame(self.read(name), columns=list(COLUMNS))
+
+    def segments(self):
+        """Return one dict per segment with its name, row count and timestamp range."""
+        summaries = []
+        for name in self.segment_names():
+            timestamps = [record[3] for record in self.read(name)]
+            summaries.append({"name": name, "rows": len(timestamps),
+                              "first_timestamp": min(timestamps, default=None),
+                              "last_timestamp": max(timestamps, default=None)})
+        return summaries
+
+    def query(self, command=None, since=None, until=None, result_min=None, result_max=None,
+              min_inclusive=True, max_inclusive=True, limit=None):
+        """
+        Return archived records matching every condition (see HistoryIndex.query) as a
+        DataFrame indexed by (segment, row), oldest segment first.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        labels = []
+        records = []
+        for name in self.segment_names():
+            if limit is not None and len(records) >= limit:
+                break
+            index = HistoryIndex.from_records(self.read(name))
+            remaining = None if limit is None else limit - len(records)
+            for row, record in index.query(command, since, until, result_min, result_max,
+                                           min_inclusive, max_inclusive, remaining):
+                labels.append((name, row))
+                records.append(record)
+        return pd.DataFrame(records, columns=list(COLUMNS),
+                            index=pd.MultiIndex.from_tuples(labels, names=["segment", "row"]))
+
+def _csv_row(record):
+    result = record[2]
+    if isinstance(result, float) and math.isnan(result):
+        return (record[0], record[1], "", record[3])
+    return record
+
+def _marker_key(record):
+    return [str(value) for value in record]
@@ -0,0 +1,405 @@
+"""
+Module: history_index
+Secondary indexes over calculation history for filtered queries.
+
+HistoryIndex keeps, for every history row position, a per-command row list, a
+timestamp-sorted index and a result-sorted index. The indexes are updated as records
+are added, edited or cleared, so queries only touch the rows they return.
+HistoryAggregates keeps per-command count, sum, min, max and mean of the results in
+the same incremental way, so summaries cost O(number of commands).
+"""
+
+import bisect
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+class _SortedIndex:
+    """
+    Sorted (key, row) pairs with cheap appends.
+    Keys that arrive in order are appended directly; out-of-order keys wait in a small
+    pending list that is merged in before the next lookup.
+    """
+    _INSORT_LIMIT = 64
+
+    def __init__(self):
+        self.keys = []
+        self.rows = []
+        self._pending = []
+
+    def add(self, key, row):
+        if not self._pending and (not self.keys or key >= self.keys[-1]):
+            self.keys.append(key)
+            self.rows.append(row)
+        else:
+            self._pending.append((key, row))
+
+    def remove(self, key, row):
+        self._merge()
+        position = bisect.bisect_left(self.keys, key)
+        while self.rows[position] != row:
+            position += 1
+        del self.keys[position]
+        del self.rows[position]
+
+    def range(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """Return the rows whose key lies between 'low' and 'high' (None = unbounded)."""
+        self._merge()
+        if low is None:
+            start = 0
+        elif low_inclusive:
+            start = bisect.bisect_left(self.keys, low)
+        else:
+            start = bisect.bisect_right(self.keys, low)
+        if high is None:
+            stop = len(self.keys)
+        elif high_inclusive:
+            stop = bisect.bisect_right(self.keys, high)
+        else:
+            stop = bisect.bisect_left(self.keys, high)
+        return self.rows[start:max(start, stop)]
+
+    def _merge(self):
+        if not self._pending:
+            return
+        if len(self._pending) <= self._INSORT_LIMIT:
+            for key, row in self._pending:
+                position = bisect.bisect_right(self.keys, key)
+                self.keys.insert(position, key)
+                self.rows.insert(position, row)
+        else:
+            keys = self.keys + [key for key, _ in self._pending]
+            rows = self.rows + [row for _, row in self._pending]
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            self.keys = [keys[i] for i in order]
+            self.rows = [rows[i] for i in order]
+        self._pending = []
+
+def _result_key(value):
+    """Return the result as a float for the result index, or None if it is not numeric."""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+class HistoryIndex:
+    """
+    Indexes history rows by command, timestamp and result.
+    Each row is stored as a (command, arguments, result, timestamp) tuple at its
+    position in the history, so query results can be returned without a DataFrame scan.
+    """
+    def __init__(self):
+        self.records = []
+        self.by_command = defaultdict(list)
+        self.by_timestamp = _SortedIndex()
+        self.by_result = _SortedIndex()
+
+    @classmethod
+    def from_records(cls, entries):
+        """Build an index over existing rows, sorting each sorted index once."""
+        index = cls()
+        for entry in entries:
+            index.add(entry)
+        index.by_timestamp.range()
+        index.by_result.range()
+        return index
+
+    def __len__(self):
+        return len(self.records)
+
+    def add(self, entry):
+        """Index a (command, arguments, result, timestamp) row appended to the history."""
+        row = len(self.records)
+        self.records.append(entry)
+        self.by_command[entry[0]].append(row)
+        self.by_timestamp.add(entry[3], row)
+        result = _result_key(entry[2])
+        if result is not None:
+            self.by_result.add(result, row)
+
+    def edit(self, row, fields):
+        """Re-index a row after some of its fields changed."""
+        command, arguments, result, timestamp = self.records[row]
+        if "command" in fields and fields["command"] != command:
+            rows = self.by_command[command]
+            rows.pop(bisect.bisect_left(rows, row))
+            if not rows:
+                del self.by_command[command]
+            command = fields["command"]
+            bisect.insort(self.by_command[command], row)
+        if "timestamp" in fields:
+            self.by_timestamp.remove(timestamp, row)
+            timestamp = fields["timestamp"]
+            self.by_timestamp.add(timestamp, row)
+        if "result" in fields:
+            old_key = _result_key(result)
+            if old_key is not None:
+                self.by_result.remove(old_key, row)
+            result = fields["result"]
+            new_key = _result_key(result)
+            if new_key is not None:
+                self.by_result.add(new_key, row)
+        arguments = fields.get("arguments", arguments)
+        self.records[row] = (command, arguments, result, timestamp)
+
+    def query(self, command=None, since=None, until=None, result_min=None, result_max=None,
+              min_inclusive=True, max_inclusive=True, limit=None):
+        """
+        Return (row, record) pairs matching every given condition, in history order.
+        'since' is inclusive and 'until' exclusive; both compare against the
+        'YYYY-MM-DD HH:MM:SS.ffffff' timestamps, so a date prefix such as '2025-03-11' works.
+        The smallest candidate set among the used indexes is scanned for the other conditions.
+        """
+        candidates = []
+        if command is not None:
+            candidates.append(self.by_command.get(command, []))
+        if since is not None or until is not None:
+            candidates.append(sorted(self.by_timestamp.range(since, until, True, False)))
+        if result_min is not None or result_max is not None:
+            candidates.append(sorted(self.by_result.range(result_min, result_max,
+                                                          min_inclusive, max_inclusive)))
+        rows = min(candidates, key=len) if candidates else range(len(self.records))
+
+        matches = []
+        for row in rows:
+            record = self.records[row]
+            if command is not None and record[0] != command:
+                continue
+            if since is not None and record[3] < since:
+                continue
+            if until is not None and record[3] >= until:
+                continue
+            if result_min is not None or result_max is not None:
+                result = _result_key(record[2])
+                if result is None:
+                    continue
+                if result_min is not None and (result < result_min or
+                                               (result == result_min and not min_inclusive)):
+                    continue
+                if result_max is not None and (result > result_max or
+                                               (result == result_max and not max_inclusive)):
+                    continue
+            matches.append((row, record))
+            if limit is not None and len(matches) >= limit:
+                break
+        return matches
+
+class _CommandAggregate:
+    """
+    Running statistics of one command's numeric results.
+    The sum is compensated (Neumaier) so retracting values does not accumulate error.
+    Infinite results are counted rather than summed, so retracting one restores a
+    finite sum; if finite results overflow the running sum, it is recomputed from
+    the live values (scaled down) until it fits again.
+    Min and max come from heaps with lazy deletion: retracted values are only popped
+    once they reach the top, and the heaps are rebuilt when mostly dead.
+    """
+    __slots__ = ("count", "numeric", "_sum", "_compensation", "_overflowed", "_positive_inf",
+                 "_negative_inf", "_min_heap", "_max_heap", "_removed_min", "_removed_max")
+
+    def __init__(self):
+        self.count = 0
+        self.numeric = 0
+        self._reset_numeric()
+
+    def _reset_numeric(self):
+        self._sum = 0.0
+        self._compensation = 0.0
+        self._overflowed = False
+        self._positive_inf = 0
+        self._negative_inf = 0
+        self._min_heap = []
+        self._max_heap = []
+        self._removed_min = Counter()
+        self._removed_max = Counter()
+
+    def load(self, count, values):
+        """Start from 'count' records whose numeric results are 'values'."""
+        self.count = count
+        self.numeric = len(values)
+        self._reset_numeric()
+        finite = [value for value in values if math.isfinite(value)]
+        self._positive_inf = sum(1 for value in values if value == math.inf)
+        self._negative_inf = len(values) - len(finite) - self._positive_inf
+        try:
+            self._sum = math.fsum(finite)
+        except OverflowError:
+            self._overflowed = True
+        self._min_heap = list(values)
+        self._max_heap = [-value for value in values]
+        heapq.heapify(self._min_heap)
+        heapq.heapify(self._max_heap)
+
+    def add(self, value):
+        self.count += 1
+        if value is None:
+            return
+        self.numeric += 1
+        self._count_or_accumulate(value, 1)
+        heapq.heappush(self._min_heap, value)
+        heapq.heappush(self._max_heap, -value)
+
+    def remove(self, value):
+        self.count -= 1
+        if value is None:
+            return
+        self.numeric -= 1
+        if self.numeric == 0:
+            self._reset_numeric()
+            return
+        self._count_or_accumulate(value, -1)
+        self._removed_min[value] += 1
+        self._removed_max[-value] += 1
+        if len(self._min_heap) > 2 * self.numeric + 64:
+            self._rebuild()
+
+    def _count_or_accumulate(self, value, sign):
+        if value == math.inf:
+            self._positive_inf += sign
+        elif value == -math.inf:
+            self._negative_inf += sign
+        elif not self._overflowed:
+            self._accumulate(sign * value)
+
+    def _accumulate(self, value):
+        total = self._sum + value
+        if not math.isfinite(total):
+            self._overflowed = True
+            return
+        if abs(self._sum) >= abs(value):
+            self._compensation += (self._sum - total) + value
+        else:
+            self._compensation += (value - total) + self._sum
+        self._sum = total
+
+    def _live_values(self):
+        removed = Counter(self._removed_min)
+        live = []
+        for value in self._min_heap:
+            if removed[value]:
+                removed[value] -= 1
+            else:
+                live.append(value)
+        return live
+
+    def _rebuild(self):
+        live = self._live_values()
+        heapq.heapify(live)
+        self._min_heap = live
+        self._max_heap = [-value for value in live]
+        heapq.heapify(self._max_heap)
+        self._removed_min = Counter()
+        self._removed_max = Counter()
+
+    @staticmethod
+    def _top(heap, removed):
+        while removed[heap[0]]:
+            removed[heap[0]] -= 1
+            heapq.heappop(heap)
+        return heap[0]
+
+    def summary(self):
+        if not self.numeric:
+            return {"count": self.count, "sum": None, "min": None, "max": None, "mean": None}
+        if self._positive_inf and self._negative_inf:
+            total = mean = math.nan
+        elif self._positive_inf or self._negative_inf:
+            total = mean = math.inf if self._positive_inf else -math.inf
+        else:
+            total, mean = self._finite_total()
+        return {"count": self.count, "sum": total,
+                "min": self._top(self._min_heap, self._removed_min),
+                "max": -self._top(self._max_heap, self._removed_max),
+                "mean": mean}
+
+    def _finite_total(self):
+        """Sum and mean of the results, all finite here."""
+        if not self._overflowed:
+            total = self._sum + self._compensation
+            return total, total / self.numeric
+        values = self._live_values()
+        # A power of two scales exactly and keeps the sum of len(values) values in range.
+        scale = 2.0 ** len(values).bit_length()
+        scaled = math.fsum(value / scale for value in values)
+        total = scaled * scale
+        if math.isfinite(total):
+            self._sum, self._compensation, self._overflowed = total, 0.0, False
+        return total, scaled / len(values) * scale
+
+class HistoryAggregates:
+    """
+    Per-command aggregates over history rows, updated as rows are added, edited or
+    removed. 'count' counts every record; sum, min, max and mean cover numeric results.
+    """
+    def __init__(self):
+        self.commands = {}
+
+    @classmethod
+    def from_columns(cls, commands, results):
+        """Build the aggregates over existing rows, heapifying each command's values once."""
+        counts = Counter(commands)
+        values = defaultdict(list)
+        for command, result in zip(commands, results):
+            result = _result_key(result)
+            if result is not None:
+                values[command].append(result)
+        aggregates = cls()
+        for command, count in counts.items():
+            aggregate = aggregates.commands[command] = _CommandAggregate()
+            aggregate.load(count, values[command])
+        return aggregates
+
+    def add(self, command, result):
+        aggregate = self.commands.get(command)
+        if aggregate is None:
+            aggregate = self.commands[command] = _CommandAggregate()
+        aggregate.add(_result_key(result))
+
+    def remove(self, command, result):
+        aggregate = self.commands[command]
+        aggregate.remove(_result_key(result))
+        if not aggregate.count:
+            del self.commands[command]
+
+    def summary(self):
+        """Return one dict per command, sorted by command name."""
+        return [dict(command=command, **self.commands[command].summary())
+                for command in sorted(self.commands)]
+
+_CLAUSE = re.compile(r"^(command|since|until|result|limit)(>=|<=|=|>|<)(.+)$")
+
+def parse_query(text):
+    """
+    Parse 'command=divide since=2025-03-11 result>100 limit 50' into query() keyword
+    arguments. Raises ValueError for clauses it does not understand.
+    """
+    tokens = text.split()
+    options = {}
+    position = 0
+    while position < len(tokens):
+        token = tokens[position]
+        if token == "limit" and position + 1 < len(tokens):
+            token = f"limit={tokens[position + 1]}"
+            position += 1
+        position += 1
+        match = _CLAUSE.match(token)
+        if match is None:
+            raise ValueError(f"Unrecognized query clause '{token}'.")
+        field, operator, value = match.groups()
+        if field != "result" and operator != "=":
+            raise ValueError(f"'{field}' only supports '='.")
+        if field == "limit":
+            options["limit"] = int(value)
+        elif field == "result":
+            number = float(value)
+            if operator in (">", ">=", "="):
+                options["result_min"] = number
+                options["min_inclusive"] = operator != ">"
+            if operator in ("<", "<=", "="):
+                options["result_max"] = number
+                options["max_inclusive"] = operator != "<"
+        else:
+            options[field] = value
+    return options
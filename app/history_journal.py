@@ -0,0 +1,163 @@
+"""
+Module: history_journal
+Append-only journal of history changes written next to a CSV snapshot.
+
+Each journal line is a JSON object. The first line is a checkpoint describing the
+snapshot the journal applies to; every later line is an "add", "edit", "clear" or
+"evict" operation. Loading history replays the journal on top of the snapshot, and compaction
+folds the journal back into a fresh snapshot.
+"""
+
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager, nullcontext
+
+def _json_default(value):
+    # NumPy scalars (e.g. results from the statistical commands) expose item().
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+class HistoryJournal:
+    """
+    Writes history operations to 'journal_path' as they happen.
+    Writes are flushed to the OS immediately and fsynced once 'fsync_every' entries
+    are pending or 'fsync_interval' seconds have passed since the last fsync.
+    'compact_threshold' is the number of entries after which compaction is due.
+    Only one process may use a journal file at a time; see shared_journal.py for
+    histories written by several processes.
+    """
+    # HistoryManager compacts a shared journal differently (see SharedJournal).
+    shared = False
+
+    def __init__(self, journal_path, fsync_every=100, fsync_interval=1.0,
+                 compact_threshold=10000):
+        self.journal_path = journal_path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_threshold = compact_threshold
+        self.entries = 0
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._valid_bytes = 0
+
+    @staticmethod
+    def fingerprint(frame):
+        """
+        Identify a snapshot by row count and last timestamp.
+        A journal whose checkpoint does not match its snapshot was superseded by a
+        compaction that replaced the snapshot but was interrupted before the journal.
+        """
+        if frame.empty:
+            return {"rows": 0, "last_timestamp": None}
+        return {"rows": len(frame), "last_timestamp": str(frame["timestamp"].iloc[-1])}
+
+    def lock(self, exclusive=False):  # pylint: disable=unused-argument
+        """A single-process journal needs no file lock; SharedJournal takes one."""
+        return nullcontext()
+
+    def read_entries(self, fingerprint):
+        """
+        Return the operations to replay on a snapshot with the given fingerprint.
+        Returns None when there is no usable journal for that snapshot.
+        A torn final line left by a crash is dropped when appending resumes.
+        """
+        if not os.path.exists(self.journal_path):
+            return None
+        entries = []
+        self._valid_bytes = 0
+        with open(self.journal_path, "rb") as f:
+            for line_number, line in enumerate(f, start=1):
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("incomplete line")
+                    entry = json.loads(line)
+                except ValueError:
+                    logging.warning("Ignoring torn journal line %d in %s",
+                                    line_number, self.journal_path)
+                    break
+                if line_number == 1:
+                    if entry.get("op") != "checkpoint" or entry.get("snapshot") != fingerprint:
+                        logging.warning("Journal %s does not match its snapshot; ignoring it.",
+                                        self.journal_path)
+                        return None
+                else:
+                    entries.append(entry)
+                self._valid_bytes += len(line)
+        return entries
+
+    def start(self, fingerprint, replayed=None):
+        """
+        Begin appending. If 'replayed' is None the journal is rewritten with a fresh
+        checkpoint for 'fingerprint'; otherwise the existing file is continued after
+        its last complete entry.
+        """
+        if replayed is None:
+            self._rewrite(fingerprint)
+        else:
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(self._valid_bytes)
+            self.entries = len(replayed)
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+
+    def append(self, entry):
+        """Write one operation to the journal."""
+        self.append_many((entry,))
+
+    def append_many(self, entries):
+        """Write several operations with a single flush."""
+        written = 0
+        for entry in entries:
+            self._file.write(json.dumps(entry, default=_json_default))
+            self._file.write("\n")
+            written += 1
+        self._file.flush()
+        self.entries += written
+        self._unsynced += written
+        if (self._unsynced >= self.fsync_every
+                or time.monotonic() - self._last_sync >= self.fsync_interval):
+            self.sync()
+
+    @property
+    def needs_compaction(self):
+        return self.entries >= self.compact_threshold
+
+    def sync(self):
+        """Force pending journal writes to disk."""
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    @contextmanager
+    def folding(self, fingerprint):
+        """
+        Wrap the writing of the snapshot, with 'fingerprint', that contains every
+        journaled change; afterwards the journal starts over, checkpointed at it.
+        """
+        yield
+        self._rewrite(fingerprint)
+
+    def _rewrite(self, fingerprint):
+        """Atomically replace the journal with an empty one checkpointed at 'fingerprint'."""
+        self.close()
+        tmp_path = self.journal_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"op": "checkpoint", "snapshot": fingerprint}))
+            f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.journal_path)
+        self.entries = 0
+        self._file = open(self.journal_path, "a", encoding="utf-8")
+
+    def close(self):
+        """Sync and close the journal file."""
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
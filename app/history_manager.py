@@ -1,20 +1,91 @@
-from threading import Lock
-import pandas as pd
+import csv
+import logging
+import math
+import os
+from threading import Lock, RLock
 from datetime import datetime
+from .columnar_store import ColumnarHistory, is_columnar_path
+from .history_index import HistoryAggregates, HistoryIndex
+
+COLUMNS = ("command", "arguments", "result", "timestamp")
+
+def _cell_text(value):
+    # Written like DataFrame.to_string writes a missing result.
+    if isinstance(value, float) and math.isnan(value):
+        return "NaN"
+    return str(value)
+
+def _now():
+    # Use microsecond precision to ensure unique timestamps.
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+
+def _parse_result(text):
+    """Read a result from CSV the way pandas would: numbers as floats, blanks as NaN."""
+    if text == "":
+        return math.nan
+    try:
+        return float(text)
+    except ValueError:
+        return text
 
 class HistoryManager:
+    """
+    Calculation history, safe to share between threads.
+    Every change takes a short state lock just long enough to append to the column
+    buffer and queue its journal entry. Queued entries are then written by whichever
+    writer holds the journal lock, in queue order, so concurrent writers share one
+    journal write instead of waiting for each other's I/O. Rows are stamped while the
+    state lock is held, so history order is also timestamp order.
+
+    Until a DataFrame is asked for, the history lives only in plain column lists and
+    CSV snapshots are read and written with the csv module, so short-lived runs such as
+    batch mode never import pandas.
+
+    With set_retention, only the most recent records stay in memory; older ones are
+    rolled over into a HistoryArchive (see history_archive.py).
+    """
     _instance = None
     _lock = Lock()
 
     def __init__(self):
-        # Initialize the DataFrame with explicit columns and types.
-        self.history = pd.DataFrame({
+        # The history DataFrame, or None while every row is in the column lists below.
+        self._history = None
+        # Rows appended since the DataFrame was last materialized, kept as
+        # plain column lists so add_record never copies the existing history.
+        self._pending = self._empty_buffer()
+        # A columnar store opened by load_history but not yet read into the DataFrame.
+        self._store = None
+        # Query indexes and per-command aggregates, each built on first use and then
+        # maintained incrementally.
+        self._index = None
+        self._aggregates = None
+        # Optional append-only journal (see open_journal) and the snapshot it extends.
+        self.journal = None
+        self.snapshot_path = None
+        # Lock order: _journal_lock before _state_lock.
+        self._state_lock = RLock()
+        self._journal_lock = RLock()
+        # Journal entries for changes already applied in memory but not yet written.
+        self._unjournaled = []
+        # Retention limit and archive (see set_retention), and evicted rows not yet archived.
+        self.capacity = None
+        self.archive = None
+        self._unarchived = []
+
+    @staticmethod
+    def _empty_frame():
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        return pd.DataFrame({
             "command": pd.Series(dtype="str"),
             "arguments": pd.Series(dtype="str"),
             "result": pd.Series(dtype="float"),
             "timestamp": pd.Series(dtype="str")
         })
 
+    @staticmethod
+    def _empty_buffer():
+        return {column: [] for column in COLUMNS}
+
     @classmethod
     def get_instance(cls):
         with cls._lock:
@@ -22,44 +93,537 @@ class HistoryManager:
                 cls._instance = HistoryManager()
             return cls._instance
 
+    @property
+    def history(self):
+        """The full history as a DataFrame, materializing any buffered rows first."""
+        with self._state_lock:
+            if self._store is not None:
+                self._history = self._store.to_dataframe()
+                self._store = None
+            elif self._history is None:
+                self._history = self._empty_frame()
+            self._flush_pending()
+            return self._history
+
+    @history.setter
+    def history(self, frame):
+        with self._state_lock:
+            self._pending = self._empty_buffer()
+            self._store = None
+            self._index = None
+            self._aggregates = None
+            self._history = frame
+
+    def _flush_pending(self):
+        """Fold the pending column buffer into the DataFrame in a single concat."""
+        if not self._pending["command"]:
+            return
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        chunk = pd.DataFrame(self._pending, columns=list(COLUMNS))
+        self._pending = self._empty_buffer()
+        if self._history.empty:
+            self._history = chunk
+        else:
+            self._history = pd.concat([self._history, chunk], ignore_index=True)
+
+    def _append_row(self, record):
+        pending = self._pending
+        for column in COLUMNS:
+            pending[column].append(record[column])
+        if self._index is not None:
+            self._index.add(tuple(record[column] for column in COLUMNS))
+        if self._aggregates is not None:
+            self._aggregates.add(record["command"], record["result"])
+
+    @property
+    def _lists_only(self):
+        """True while every row is held in the column lists (no DataFrame, no store)."""
+        return self._history is None and self._store is None
+
+    def _apply_edit(self, index, fields):
+        if self._lists_only:
+            if index < 0 or index >= len(self._pending["command"]):
+                raise IndexError("History record index out of range")
+            old = (self._pending["command"][index], self._pending["result"][index])
+            for column, value in fields.items():
+                self._pending[column][index] = value
+        else:
+            history = self.history
+            if index < 0 or index >= len(history):
+                raise IndexError("History record index out of range")
+            old = (history.at[index, "command"], history.at[index, "result"])
+            for column, value in fields.items():
+                history.at[index, column] = value
+        if self._index is not None:
+            self._index.edit(index, fields)
+        if self._aggregates is not None:
+            # Retract the old values and apply the new ones.
+            self._aggregates.remove(*old)
+            self._aggregates.add(fields.get("command", old[0]), fields.get("result", old[1]))
+
+    def _apply_clear(self):
+        self._history = None
+        self._pending = self._empty_buffer()
+        self._store = None
+        self._index = None
+        self._aggregates = None
+
+    def set_retention(self, capacity, archive=None):
+        """
+        Keep about 'capacity' records in memory: once there are more than capacity * 9/8,
+        the oldest are evicted down to 'capacity' and appended to 'archive' (a
+        HistoryArchive), or dropped without one. 'capacity' None keeps everything.
+        """
+        if capacity is not None and capacity < 1:
+            raise ValueError("History capacity must be at least 1.")
+        with self._state_lock:
+            self.capacity = capacity
+            self.archive = archive
+            self._enforce_capacity()
+        self._write_journal()
+
+    def _enforce_capacity(self):
+        """Evict the oldest rows if over capacity; the caller holds the state lock."""
+        if self.capacity is None:
+            return
+        # Evicting in batches keeps the index rebuilds and segment writes rare.
+        excess = self._row_count() - self.capacity
+        if excess <= self.capacity // 8:
+            return
+        rows = self._drop_oldest(excess)
+        if self.journal is not None and self.journal.shared:
+            # The rows stay on disk, where other processes may still be using them;
+            # compaction archives them from there.
+            return
+        if self.archive is not None:
+            self._unarchived.append((self.archive, rows))
+        self._queue_journal({"op": "evict", "count": excess})
+
+    def _drop_oldest(self, count):
+        """Remove the first 'count' rows and return them as column lists."""
+        if self._lists_only:
+            rows = {column: self._pending[column][:count] for column in COLUMNS}
+            for column in COLUMNS:
+                del self._pending[column][:count]
+        else:
+            history = self.history
+            rows = {column: history[column].iloc[:count].tolist() for column in COLUMNS}
+            self._history = history.iloc[count:].reset_index(drop=True)
+        # Row positions shifted; the index is rebuilt on the next query.
+        self._index = None
+        if self._aggregates is not None:
+            for command, result in zip(rows["command"], rows["result"]):
+                self._aggregates.remove(command, result)
+        return rows
+
+    @staticmethod
+    def _archive_rows(batches):
+        """Append evicted rows to their archives; the caller holds the journal lock."""
+        for archive, rows in batches:
+            archive.append(rows)
+
+    def _queue_journal(self, *entries):
+        """Queue journal entries; the caller holds the state lock."""
+        if self.journal is not None:
+            self._unjournaled.extend(entries)
+
+    def _write_journal(self):
+        """
+        Write every queued journal entry; called without the state lock held.
+        Evicted rows are archived first, so an 'evict' entry is only ever journaled
+        after its rows are safely in the archive.
+        """
+        if self.journal is None and not self._unarchived:
+            return
+        with self._journal_lock:
+            with self._state_lock:
+                entries, self._unjournaled = self._unjournaled, []
+                batches, self._unarchived = self._unarchived, []
+            self._archive_rows(batches)
+            if not entries or self.journal is None:
+                return
+            self.journal.append_many(entries)
+            if self.journal.needs_compaction:
+                self.compact(only_if_due=True)
+
     def add_record(self, command, arguments, result):
-        # Use microsecond precision to ensure unique timestamps.
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-        new_record = {
-            "command": command,
-            "arguments": str(arguments),
-            "result": result,
-            "timestamp": timestamp
-        }
-        new_record_df = pd.DataFrame([new_record])
-        self.history = pd.concat([self.history, new_record_df], ignore_index=True)
+        arguments = str(arguments)
+        with self._state_lock:
+            record = {
+                "command": command,
+                "arguments": arguments,
+                "result": result,
+                "timestamp": _now()
+            }
+            self._append_row(record)
+            self._queue_journal({"op": "add", "record": record})
+            if self.capacity is not None:
+                self._enforce_capacity()
+        self._write_journal()
+
+    def add_records(self, records):
+        """
+        Append an iterable of (command, arguments, result) records in one call.
+        """
+        records = [(command, str(arguments), result) for command, arguments, result in records]
+        with self._state_lock:
+            entries = []
+            for command, arguments, result in records:
+                record = {
+                    "command": command,
+                    "arguments": arguments,
+                    "result": result,
+                    "timestamp": _now()
+                }
+                self._append_row(record)
+                entries.append({"op": "add", "record": record})
+            self._queue_journal(*entries)
+            if self.capacity is not None:
+                self._enforce_capacity()
+        self._write_journal()
 
     def get_history(self):
-        if self.history.empty:
+        if self.record_count() == 0:
             return "No history available."
         return self.history.to_string(index=True)
 
+    def record_count(self):
+        """Number of history records, computed without materializing the DataFrame."""
+        with self._state_lock:
+            return self._row_count()
+
+    def _row_count(self):
+        if self._store is not None:
+            base = len(self._store)
+        else:
+            base = 0 if self._history is None else len(self._history)
+        return base + len(self._pending["command"])
+
+    def history_slice(self, start=0, stop=None):
+        """
+        Return records [start, stop) as a DataFrame indexed by record position.
+        Only the requested rows are read from a lazy store or the pending buffer.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        with self._state_lock:
+            total = self.record_count()
+            stop = total if stop is None else max(0, min(stop, total))
+            start = max(0, min(start, stop))
+            base = total - len(self._pending["command"])
+            parts = []
+            if start < base:
+                if self._store is not None:
+                    parts.append(self._store.to_dataframe(start, min(stop, base)))
+                else:
+                    parts.append(self._history.iloc[start:min(stop, base)])
+            if stop > base:
+                first, last = max(start, base) - base, stop - base
+                parts.append(pd.DataFrame(
+                    {column: self._pending[column][first:last] for column in COLUMNS},
+                    index=pd.RangeIndex(base + first, base + last)))
+        if not parts:
+            return self._empty_frame()
+        return parts[0] if len(parts) == 1 else pd.concat(parts)
+
+    def write_history(self, out, start=0, stop=None, chunk_rows=1000):
+        """
+        Stream records [start, stop) to the text stream 'out' as a table, formatting
+        'chunk_rows' rows at a time instead of building one string. Column widths are
+        measured over the whole range first, so every chunk lines up with the header.
+        Returns the number of rows written.
+        """
+        total = self.record_count()
+        stop = total if stop is None else max(0, min(stop, total))
+        start = max(0, min(start, stop))
+        if start == stop:
+            out.write("No history available.\n")
+            return 0
+        chunks = range(start, stop, chunk_rows)
+        widths = [len(str(stop - 1))] + [len(column) for column in COLUMNS]
+        for chunk_start in chunks:
+            cells = self._history_cells(chunk_start, stop, chunk_rows)
+            widths = [max([width, *map(len, values)]) for width, values in zip(widths, cells)]
+        out.write(" " * widths[0])
+        for column, width in zip(COLUMNS, widths[1:]):
+            out.write(f" {column:>{width}}")
+        out.write("\n")
+        for chunk_start in chunks:
+            cells = self._history_cells(chunk_start, stop, chunk_rows)
+            for row in zip(*cells):
+                out.write(f"{row[0]:<{widths[0]}}")
+                for cell, width in zip(row[1:], widths[1:]):
+                    out.write(f" {cell:>{width}}")
+                out.write("\n")
+        return stop - start
+
+    def _history_cells(self, chunk_start, stop, chunk_rows):
+        """The index and column values of one write_history chunk, as lists of strings."""
+        chunk = self.history_slice(chunk_start, min(chunk_start + chunk_rows, stop))
+        return [[str(label) for label in chunk.index]] + [
+            [_cell_text(value) for value in chunk[column].tolist()] for column in COLUMNS]
+
+    def query(self, command=None, since=None, until=None, result_min=None, result_max=None,
+              min_inclusive=True, max_inclusive=True, limit=None):
+        """
+        Return the history rows matching all given conditions as a DataFrame indexed by
+        record position. See HistoryIndex.query for the meaning of each condition.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        with self._state_lock:
+            if self._index is None:
+                if self._lists_only:
+                    columns = [self._pending[column] for column in COLUMNS]
+                else:
+                    history = self.history
+                    columns = [history[column].tolist() for column in COLUMNS]
+                self._index = HistoryIndex.from_records(zip(*columns))
+            matches = self._index.query(command, since, until, result_min, result_max,
+                                        min_inclusive, max_inclusive, limit)
+        return pd.DataFrame([record for _, record in matches], columns=list(COLUMNS),
+                            index=[row for row, _ in matches])
+
+    def stats(self):
+        """
+        Return per-command count, sum, min, max and mean of the results, one dict per
+        command. The aggregates are built on the first call and kept up to date by every
+        later change, so repeated calls cost O(number of commands).
+        """
+        with self._state_lock:
+            if self._aggregates is None:
+                if self._lists_only:
+                    commands, results = self._pending["command"], self._pending["result"]
+                else:
+                    history = self.history
+                    commands, results = history["command"].tolist(), history["result"].tolist()
+                self._aggregates = HistoryAggregates.from_columns(commands, results)
+            return self._aggregates.summary()
+
     def clear_history(self):
-        self.history = self.history.iloc[0:0]
+        with self._state_lock:
+            self._apply_clear()
+            # Stamped so a shared journal can order it among other processes' changes.
+            self._queue_journal({"op": "clear", "timestamp": _now()})
+        self._write_journal()
 
     def save_history(self, filepath):
-        self.history.to_csv(filepath, index=False)
+        """
+        Save the history as CSV, or as a binary columnar store when 'filepath' ends
+        with '.cols'. The file is written beside the target and swapped in atomically.
+        """
+        with self._state_lock:
+            if is_columnar_path(filepath):
+                ColumnarHistory.write(filepath, self.history)
+                return
+            tmp_path = f"{filepath}.tmp"
+            if self._lists_only:
+                with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                    writer = csv.writer(f, lineterminator="\n")
+                    writer.writerow(COLUMNS)
+                    results = ["" if isinstance(value, float) and math.isnan(value) else value
+                               for value in self._pending["result"]]
+                    writer.writerows(zip(self._pending["command"], self._pending["arguments"],
+                                         results, self._pending["timestamp"]))
+            else:
+                self.history.to_csv(tmp_path, index=False)
+        with open(tmp_path, "rb") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
 
     def load_history(self, filepath):
-        self.history = pd.read_csv(filepath)
+        """
+        Load history from a CSV file, or open a '.cols' columnar store lazily:
+        its rows are only read when the DataFrame is first needed.
+        """
+        if is_columnar_path(filepath):
+            store = ColumnarHistory(filepath)
+            with self._state_lock:
+                self._apply_clear()
+                self._store = store
+            return
+        with open(filepath, encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is not None and tuple(header) != COLUMNS:
+                # Not the history's own layout; let pandas interpret it.
+                import pandas as pd  # pylint: disable=import-outside-toplevel
+                self.history = pd.read_csv(filepath)
+                return
+            buffer = self._empty_buffer()
+            for command, arguments, result, timestamp in reader:
+                buffer["command"].append(command)
+                buffer["arguments"].append(arguments)
+                buffer["result"].append(_parse_result(result))
+                buffer["timestamp"].append(timestamp)
+        with self._state_lock:
+            self._apply_clear()
+            self._pending = buffer
+
+    def _fingerprint(self, journal):
+        """Snapshot fingerprint for the journal, taken without materializing a lazy store."""
+        if self._store is not None and not self._pending["command"]:
+            return {"rows": len(self._store), "last_timestamp": self._store.last_timestamp()}
+        if self._lists_only:
+            timestamps = self._pending["timestamp"]
+            return {"rows": len(timestamps),
+                    "last_timestamp": str(timestamps[-1]) if timestamps else None}
+        return journal.fingerprint(self.history)
 
     def edit_record(self, index, new_command=None, new_arguments=None, new_result=None):
         """
         Edit an existing history record at the given index and update the timestamp.
         Raises IndexError if the index is out of range.
         """
-        if index < 0 or index >= len(self.history):
-            raise IndexError("History record index out of range")
+        fields = {}
         if new_command is not None:
-            self.history.at[index, "command"] = new_command
+            fields["command"] = new_command
         if new_arguments is not None:
-            self.history.at[index, "arguments"] = str(new_arguments)
+            fields["arguments"] = str(new_arguments)
         if new_result is not None:
-            self.history.at[index, "result"] = new_result
-        # Update the timestamp (with microseconds) so even rapid edits yield a new value.
-        self.history.at[index, "timestamp"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+            fields["result"] = new_result
+        with self._state_lock:
+            # Update the timestamp (with microseconds) so even rapid edits yield a new value.
+            fields["timestamp"] = _now()
+            target = self._timestamp_at(index)
+            self._apply_edit(index, fields)
+            # The old timestamp identifies the record even where positions differ.
+            self._queue_journal({"op": "edit", "index": index, "target": target,
+                                 "fields": fields})
+        self._write_journal()
+
+    def open_journal(self, snapshot_path, journal):
+        """
+        Load history from the snapshot at 'snapshot_path' plus any journal entries
+        written since, then journal every later change instead of rewriting the snapshot.
+        """
+        with self._journal_lock, self._state_lock:
+            replayed = self._load_journaled(snapshot_path, journal)
+            self.snapshot_path = snapshot_path
+            self.journal = journal
+            self._unjournaled = []
+            if replayed is None:
+                journal.start(self._fingerprint(journal))
+            else:
+                journal.start(None, replayed)
+            self._enforce_capacity()
+            self._write_journal()
+            if journal.needs_compaction:
+                self.compact(only_if_due=True)
+
+    def load_journaled(self, snapshot_path, journal):
+        """
+        Load history from the snapshot plus journal like open_journal, but read-only:
+        the journal is not continued or compacted, and no retention limit is applied.
+        """
+        with self._state_lock:
+            self._load_journaled(snapshot_path, journal)
+
+    def _load_journaled(self, snapshot_path, journal):
+        """Load the snapshot and replay the journal; return the replayed entries or None."""
+        interrupted_store = is_columnar_path(snapshot_path) and os.path.exists(
+            f"{snapshot_path}.old")
+        # A shared journal is not compacted by another process while this reads.
+        with journal.lock():
+            if os.path.exists(snapshot_path) or interrupted_store:
+                self.load_history(snapshot_path)
+            else:
+                self._apply_clear()
+            replayed = journal.read_entries(self._fingerprint(journal))
+            self._replay_entries(replayed or ())
+        return replayed
+
+    def _replay_entries(self, entries):
+        """Apply journal entries in order; the caller holds the state lock."""
+        for entry in entries:
+            if entry["op"] == "add":
+                self._append_row(entry["record"])
+            elif entry["op"] == "edit":
+                index = self._locate(entry["index"], entry.get("target"))
+                if index is None:
+                    logging.warning("Skipping journaled edit of a record that no longer exists.")
+                    continue
+                self._apply_edit(index, entry["fields"])
+            elif entry["op"] == "clear":
+                self._apply_clear()
+            elif entry["op"] == "evict":
+                # Already archived before this entry was written.
+                self._drop_oldest(entry["count"])
+
+    def _timestamp_at(self, index):
+        """Timestamp of record 'index', or None if there is no such record."""
+        if not 0 <= index < self._row_count():
+            return None
+        if self._lists_only:
+            return self._pending["timestamp"][index]
+        return self.history.at[index, "timestamp"]
+
+    def _locate(self, index, target):
+        """
+        Return the position of the record an edit was made to: 'index' if that record
+        is stamped 'target', else the record stamped 'target' (positions differ when
+        another process added records to a shared journal), or None if it is gone.
+        """
+        if target is None or self._timestamp_at(index) == target:
+            return index
+        timestamps = (self._pending["timestamp"] if self._lists_only
+                      else self.history["timestamp"].tolist())
+        try:
+            return timestamps.index(target)
+        except ValueError:
+            return None
+
+    def compact(self, only_if_due=False):
+        """
+        Fold the journal into a fresh snapshot and start an empty journal.
+        With a shared journal, 'only_if_due' skips the work if another process has
+        compacted since this one last looked.
+        """
+        if self.journal is not None and self.journal.shared:
+            self._compact_shared(only_if_due)
+            return
+        with self._journal_lock, self._state_lock:
+            # Rows evicted since the last write are in neither the snapshot nor the archive.
+            batches, self._unarchived = self._unarchived, []
+            self._archive_rows(batches)
+            with self.journal.folding(self._fingerprint(self.journal)):
+                self.save_history(self.snapshot_path)
+            # Queued entries describe changes the new snapshot already contains.
+            self._unjournaled = []
+
+    def _compact_shared(self, only_if_due):
+        """
+        Fold the snapshot and every process's journal segment, as found on disk, into a
+        fresh snapshot while holding the shared journal's exclusive lock. With a retention
+        limit, records beyond it are archived here rather than when they are evicted
+        from memory, since other processes may still hold them.
+        This process's own view of the history is left as it is.
+        """
+        journal = self.journal
+        with self._journal_lock:
+            with self._state_lock:
+                entries, self._unjournaled = self._unjournaled, []
+            if entries:
+                journal.append_many(entries)
+            journal.sync()
+            with journal.lock(exclusive=True):
+                merged = HistoryManager()
+                if os.path.exists(self.snapshot_path):
+                    merged.load_history(self.snapshot_path)
+                merged._replay_entries(journal.read_entries(merged._fingerprint(journal)) or ())
+                if only_if_due and not journal.needs_compaction:
+                    return
+                excess = 0 if self.capacity is None else merged._row_count() - self.capacity
+                if excess > 0:
+                    rows = merged._drop_oldest(excess)
+                    if self.archive is not None:
+                        self.archive.refresh()
+                        self.archive.append(rows)
+                with journal.folding(merged._fingerprint(journal)):
+                    merged.save_history(self.snapshot_path)
+
+    def close_journal(self):
+        """Flush and detach the journal; the snapshot plus journal hold the full history."""
+        self._write_journal()
+        with self._journal_lock:
+            if self.journal is not None:
+                self.journal.close()
+                self.journal = None
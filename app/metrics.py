@@ -0,0 +1,246 @@
+"""
+Module: metrics
+Per-command counters and latency histograms.
+
+Timings are grouped by stage ("parse", "execute", "history", "plugin") and command name.
+Each series keeps a call count, an error count and an HDR-style log-linear histogram, so
+percentiles stay within 12.5% of the true value while memory stays a few dozen buckets.
+A disabled Metrics object hands out a shared no-op timer, so instrumented code costs
+one method call per stage.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+METRICS_FORMATS = ("prometheus", "json")
+
+class LatencyHistogram:
+    """
+    Log-linear histogram of durations in nanoseconds.
+    Every power of two is split into 2**SUB_BUCKET_BITS equal buckets, as in HdrHistogram.
+    """
+    SUB_BUCKET_BITS = 3
+    _SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    @classmethod
+    def bucket_index(cls, ns):
+        if ns < cls._SUB_BUCKETS:
+            return ns
+        shift = ns.bit_length() - 1 - cls.SUB_BUCKET_BITS
+        return ((shift + 1) << cls.SUB_BUCKET_BITS) + (ns >> shift) - cls._SUB_BUCKETS
+
+    @classmethod
+    def bucket_upper_ns(cls, index):
+        """Largest duration (in nanoseconds) that falls into bucket 'index'."""
+        if index < cls._SUB_BUCKETS:
+            return index
+        shift = (index >> cls.SUB_BUCKET_BITS) - 1
+        mantissa = cls._SUB_BUCKETS + (index & (cls._SUB_BUCKETS - 1))
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, ns):
+        index = self.bucket_index(ns)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, fraction):
+        """Duration in nanoseconds below which 'fraction' (0-1) of the samples fall."""
+        if not self.count:
+            return 0
+        threshold = fraction * self.count
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= threshold:
+                return min(self.bucket_upper_ns(index), self.max_ns)
+        return self.max_ns
+
+    def cumulative_buckets(self):
+        """Return (upper bound ns, samples at or below it) pairs for the non-empty buckets."""
+        seen = 0
+        buckets = []
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            buckets.append((self.bucket_upper_ns(index), seen))
+        return buckets
+
+class _Timer:
+    __slots__ = ("metrics", "stage", "command", "start")
+
+    def __init__(self, metrics, stage, command):
+        self.metrics = metrics
+        self.stage = stage
+        self.command = command
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.metrics.record(self.stage, self.command, time.perf_counter_ns() - self.start,
+                            error=exc_type is not None)
+        return False
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+class Metrics:
+    """
+    Thread-safe registry of (stage, command) series.
+    Use 'with metrics.time("execute", "add"): ...'; an exception escaping the block
+    counts as an error for that series.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._series = {}
+        self._started = time.monotonic()
+
+    def time(self, stage, command):
+        """Return a context manager that times one call of 'command' in 'stage'."""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, stage, command)
+
+    def record(self, stage, command, ns, error=False):
+        """Record one call that took 'ns' nanoseconds."""
+        with self._lock:
+            series = self._series.get((stage, command))
+            if series is None:
+                series = self._series[(stage, command)] = [LatencyHistogram(), 0]
+            series[0].record(ns)
+            if error:
+                series[1] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+            self._started = time.monotonic()
+
+    def snapshot(self):
+        """
+        Return one dict per series with count, errors, throughput (calls per second since
+        the last reset) and latency percentiles in seconds, sorted by command then stage.
+        """
+        with self._lock:
+            elapsed = max(time.monotonic() - self._started, 1e-9)
+            rows = []
+            for (stage, command), (histogram, errors) in sorted(
+                    self._series.items(), key=lambda item: (item[0][1], item[0][0])):
+                rows.append({
+                    "command": command,
+                    "stage": stage,
+                    "count": histogram.count,
+                    "errors": errors,
+                    "rate_per_second": histogram.count / elapsed,
+                    "mean_seconds": histogram.total_ns / histogram.count / 1e9,
+                    "p50_seconds": histogram.percentile(0.50) / 1e9,
+                    "p90_seconds": histogram.percentile(0.90) / 1e9,
+                    "p99_seconds": histogram.percentile(0.99) / 1e9,
+                    "max_seconds": histogram.max_ns / 1e9,
+                    "buckets": [(upper / 1e9, seen)
+                                for upper, seen in histogram.cumulative_buckets()],
+                })
+            return rows
+
+    def format_table(self):
+        """Render the snapshot as a text table for the 'stats' REPL command."""
+        rows = self.snapshot()
+        if not rows:
+            return "No metrics recorded." if self.enabled else "Metrics are disabled."
+        lines = [f"{'command':<12} {'stage':<8} {'count':>7} {'errors':>6} {'/s':>8} "
+                 f"{'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}"]
+        for row in rows:
+            lines.append(
+                f"{row['command']:<12} {row['stage']:<8} {row['count']:>7} {row['errors']:>6} "
+                f"{row['rate_per_second']:>8.2f} "
+                + " ".join(f"{row[key] * 1e6:>7.1f}us"
+                           for key in ("p50_seconds", "p90_seconds", "p99_seconds",
+                                       "max_seconds")))
+        return "\n".join(lines)
+
+    def to_json(self):
+        return json.dumps({"metrics": self.snapshot()}, indent=2)
+
+    def to_prometheus(self):
+        """Render the series in the Prometheus text exposition format."""
+        lines = ["# HELP calc_command_seconds Time spent per command and stage.",
+                 "# TYPE calc_command_seconds histogram"]
+        errors = ["# HELP calc_command_errors_total Calls that raised an error.",
+                  "# TYPE calc_command_errors_total counter"]
+        for row in self.snapshot():
+            labels = f'command="{row["command"]}",stage="{row["stage"]}"'
+            for upper, seen in row["buckets"]:
+                lines.append(f'calc_command_seconds_bucket{{{labels},le="{upper:.9g}"}} {seen}')
+            lines.append(f'calc_command_seconds_bucket{{{labels},le="+Inf"}} {row["count"]}')
+            lines.append(f"calc_command_seconds_sum{{{labels}}} "
+                         f"{row['mean_seconds'] * row['count']:.9g}")
+            lines.append(f"calc_command_seconds_count{{{labels}}} {row['count']}")
+            errors.append(f"calc_command_errors_total{{{labels}}} {row['errors']}")
+        return "\n".join(lines + errors) + "\n"
+
+    def dump(self, path, output_format="prometheus"):
+        """Write the metrics to 'path' atomically in 'prometheus' or 'json' format."""
+        if output_format not in METRICS_FORMATS:
+            raise ValueError(f"Unknown metrics format '{output_format}'.")
+        text = self.to_json() if output_format == "json" else self.to_prometheus()
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+class MetricsDumper:
+    """Background thread that dumps 'metrics' to 'path' every 'interval' seconds."""
+    def __init__(self, metrics, path, interval=60.0, output_format="prometheus"):
+        if output_format not in METRICS_FORMATS:
+            raise ValueError(f"Unknown metrics format '{output_format}'.")
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.output_format = output_format
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-dumper", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self._dump()
+
+    def _dump(self):
+        try:
+            self.metrics.dump(self.path, self.output_format)
+        except OSError as e:
+            logging.error("Could not write metrics to %s: %s", self.path, e)
+
+    def stop(self):
+        """Stop the thread and write a final dump."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self._dump()
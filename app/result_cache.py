@@ -0,0 +1,88 @@
+"""
+Module: result_cache
+A bounded cache of command and plugin results keyed on normalized name + arguments.
+"""
+
+from collections import OrderedDict
+from threading import Lock
+
+EVICTION_POLICIES = ("lru", "fifo")
+
+class ResultCache:
+    """
+    Maps (kind, name, args) keys to results, evicting the least recently used entry
+    ("lru") or the oldest inserted entry ("fifo") once 'maxsize' entries are held.
+    A maxsize of 0 disables caching. Safe to share between threads; compute() runs
+    outside the lock, so a slow plugin does not hold up other lookups.
+    """
+    def __init__(self, maxsize=256, policy="lru"):
+        if maxsize < 0:
+            raise ValueError("Cache size must be non-negative.")
+        if policy not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy '{policy}'.")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    @staticmethod
+    def make_key(kind, name, args):
+        """
+        Build a normalized cache key, or return None if the arguments are unhashable.
+        Names are case-insensitive and numeric arguments compare by value (2 == 2.0).
+        """
+        key = (kind, name.lower(), tuple(args))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def get_or_compute(self, key, compute):
+        """Return the cached result for 'key', calling compute() and storing it on a miss."""
+        if key is None or self.maxsize == 0:
+            return compute()
+        with self._lock:
+            if key in self._entries:
+                self.hits += 1
+                if self.policy == "lru":
+                    self._entries.move_to_end(key)
+                return self._entries[key]
+            self.misses += 1
+        result = compute()
+        with self._lock:
+            self._entries[key] = result
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return result
+
+    def invalidate(self, kind, name):
+        """Drop every cached result for the command or plugin 'name'."""
+        name = name.lower()
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == kind and key[1] == name]:
+                del self._entries[key]
+
+    def clear(self):
+        """Drop all entries and reset the hit/miss counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Return a dictionary describing the cache's size and effectiveness."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "policy": self.policy,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,230 @@
+"""
+Module: shared_journal
+A history journal that several processes can write at the same time.
+
+Every process appends its changes to its own segment file in one directory
+('<pid>-<random>.journal', JSON lines like HistoryJournal's) and holds an advisory
+lock on it while it runs, so writes never wait for other processes. A manifest records,
+for the current snapshot, how many bytes of each segment it already contains.
+Loading merges the unfolded tail of every segment by timestamp. Compaction, which
+takes the directory's lock file exclusively, folds them all into a new snapshot and
+deletes the segments of processes that have exited; loading takes the lock shared.
+"""
+
+import heapq
+import json
+import logging
+import os
+import re
+import uuid
+from contextlib import contextmanager
+from .history_journal import HistoryJournal
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    # Without advisory locks every segment counts as in use, so none are deleted.
+    fcntl = None
+
+_SEGMENT_NAME = re.compile(r"\d+-[0-9a-f]{12}\.journal")
+
+def _entry_time(entry):
+    """The timestamp that orders an entry among other processes' entries."""
+    if entry["op"] == "add":
+        return entry["record"]["timestamp"]
+    if entry["op"] == "edit":
+        return entry["fields"]["timestamp"]
+    return entry.get("timestamp", "")
+
+def _read_segment(path, offset):
+    """
+    Return the complete entries of segment 'path' after byte 'offset', and the offset
+    just past the last of them. A partial last line is left for a later read: its
+    writer may still be writing it, or it was torn by a crash.
+    """
+    entries = []
+    try:
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    logging.warning("Ignoring the rest of journal segment %s after a bad line.",
+                                    path)
+                    break
+                offset += len(line)
+    except FileNotFoundError:
+        # Deleted by a compaction after it was listed.
+        pass
+    return entries, offset
+
+class SharedJournal(HistoryJournal):
+    """
+    Journals this process's history changes to a segment in 'directory' that other
+    processes' SharedJournals on the same directory merge in when they load.
+    'legacy_path' names a single-process journal (see HistoryJournal) to fold in once.
+    Compaction is due after 'compact_threshold' unfolded entries or, when loading,
+    once more than 'max_segments' segment files have piled up.
+    """
+    shared = True
+
+    def __init__(self, directory, fsync_every=100, fsync_interval=1.0,
+                 compact_threshold=10000, legacy_path=None, max_segments=64):
+        super().__init__(None, fsync_every, fsync_interval, compact_threshold)
+        self.directory = directory
+        self.legacy_path = legacy_path
+        self.max_segments = max_segments
+        os.makedirs(directory, exist_ok=True)
+        self._manifest_path = os.path.join(directory, "manifest.json")
+        # Set by read_entries: the snapshot fingerprint and whether the manifest matched
+        # it, and how far each segment was read.
+        self._fingerprint = None
+        self._manifest_current = False
+        self._offsets = {}
+        self._segments = 0
+
+    @contextmanager
+    def lock(self, exclusive=False):
+        """Hold the directory's advisory lock, shared for loading, exclusive to compact."""
+        with open(os.path.join(self.directory, "lock"), "a", encoding="utf-8") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def segment_names(self):
+        return sorted(name for name in os.listdir(self.directory)
+                      if _SEGMENT_NAME.fullmatch(name))
+
+    def _read_manifest(self, fingerprint):
+        """
+        Return the manifest for the snapshot with 'fingerprint' and whether a manifest
+        exists at all. A compaction interrupted after replacing the snapshot left the
+        matching manifest in 'manifest.json.tmp'.
+        """
+        found = False
+        for path in (self._manifest_path, f"{self._manifest_path}.tmp"):
+            try:
+                with open(path, encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except (OSError, ValueError):
+                continue
+            found = found or path == self._manifest_path
+            if manifest.get("snapshot") == fingerprint:
+                return manifest, True
+        return None, found
+
+    def _write_manifest(self, path, fingerprint, folded):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"snapshot": fingerprint, "folded": folded}, f)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def read_entries(self, fingerprint):
+        """
+        Return the entries of every segment (and of the legacy journal) not yet in the
+        snapshot with 'fingerprint', merged in timestamp order; each segment's own order
+        is kept. Returns None when nothing applies to that snapshot.
+        The caller holds lock().
+        """
+        self._fingerprint = fingerprint
+        manifest, found = self._read_manifest(fingerprint)
+        self._manifest_current = manifest is not None
+        if found and manifest is None:
+            logging.warning("Journal segments in %s do not match the snapshot; ignoring them.",
+                            self.directory)
+        legacy = None
+        if self.legacy_path is not None and os.path.exists(self.legacy_path):
+            legacy = HistoryJournal(self.legacy_path).read_entries(fingerprint)
+        names = self.segment_names()
+        self._segments = len(names)
+        self._offsets = {}
+        sources = []
+        if manifest is not None:
+            for name in names:
+                entries, self._offsets[name] = _read_segment(
+                    os.path.join(self.directory, name), manifest["folded"].get(name, 0))
+                sources.append(entries)
+        if manifest is None and legacy is None:
+            self.entries = 0
+            return None
+        # Legacy entries predate every segment.
+        entries = (legacy or []) + list(heapq.merge(*sources, key=_entry_time))
+        self.entries = len(entries)
+        return entries
+
+    def start(self, fingerprint, replayed=None):
+        """
+        Create this process's segment and lock it for as long as it is open. If no
+        manifest matched the snapshot, one is written first, marking any existing
+        segments as already folded in.
+        """
+        fingerprint = self._fingerprint if fingerprint is None else fingerprint
+        with self.lock(exclusive=not self._manifest_current):
+            if not self._manifest_current:
+                # Another process may have written it since read_entries looked.
+                manifest, _ = self._read_manifest(fingerprint)
+                if manifest is None:
+                    folded = {name: os.path.getsize(os.path.join(self.directory, name))
+                              for name in self.segment_names()}
+                    self._write_manifest(f"{self._manifest_path}.tmp", fingerprint, folded)
+                    os.replace(f"{self._manifest_path}.tmp", self._manifest_path)
+                self._manifest_current = True
+            # Created under the lock, so a compaction never sees it unlocked and empty.
+            name = f"{os.getpid()}-{uuid.uuid4().hex[:12]}.journal"
+            self.journal_path = os.path.join(self.directory, name)
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+
+    @property
+    def needs_compaction(self):
+        return self.entries >= self.compact_threshold or self._segments > self.max_segments
+
+    @contextmanager
+    def folding(self, fingerprint):
+        """
+        Wrap the writing of the snapshot, with 'fingerprint', that contains everything
+        the last read_entries returned. The new manifest is written to a temporary file
+        first, so a crash after the snapshot is replaced still finds the manifest that
+        matches it. Afterwards the segments of exited processes and the legacy journal
+        are deleted. The caller holds lock(exclusive=True).
+        """
+        temporary = f"{self._manifest_path}.tmp"
+        self._write_manifest(temporary, fingerprint, self._offsets)
+        yield
+        os.replace(temporary, self._manifest_path)
+        for name, folded in self._offsets.items():
+            path = os.path.join(self.directory, name)
+            if path == self.journal_path or self._in_use(path):
+                continue
+            # A writer may have appended more before it exited; keep those for next time.
+            # A torn or bad last line, which no read will return, does not count.
+            if not _read_segment(path, folded)[0]:
+                os.remove(path)
+        if self.legacy_path is not None and os.path.exists(self.legacy_path):
+            os.remove(self.legacy_path)
+        self._fingerprint = fingerprint
+        self.entries = 0
+        self._segments = 0
+
+    @staticmethod
+    def _in_use(path):
+        """True if a running process still holds the segment's lock."""
+        if fcntl is None:
+            return True
+        with open(path, "rb") as f:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+        return False
+
+    def close(self):
+        """Sync and close this process's segment, deleting it if nothing was written."""
+        path = self.journal_path if self._file is not None else None
+        super().close()
+        if path is not None and os.path.getsize(path) == 0:
+            os.remove(path)
@@ -0,0 +1,129 @@
+"""
+Module: batch_mode
+Runs calculator commands non-interactively from a file or stdin.
+Input lines flow through a generator pipeline (read -> parse -> execute -> write),
+results are written as JSON lines or CSV, and history is recorded in bulk.
+"""
+
+import csv
+import json
+import logging
+import math
+from app.file_operands import execute_statistic, is_file_operand
+
+OUTPUT_FORMATS = ("jsonl", "csv")
+CSV_FIELDS = ("line", "command", "args", "result", "error")
+
+def iter_command_lines(stream):
+    """
+    Yield (line_number, command_line) pairs from a text stream.
+    Semicolon-separated commands on one line are yielded individually;
+    blank lines and lines starting with '#' are skipped.
+    """
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        for cmd_line in line.split(";"):
+            cmd_line = cmd_line.strip()
+            if cmd_line:
+                yield line_number, cmd_line
+
+def parse_plugin_args(raw_args):
+    """Convert plugin arguments that look like numbers to floats, leaving the rest as text."""
+    return [float(arg) if arg.replace('.', '', 1).isdigit() else arg for arg in raw_args]
+
+def parse_commands(command_lines):
+    """Yield (line_number, command_name, raw_args) for each command line."""
+    for line_number, cmd_line in command_lines:
+        parts = cmd_line.split()
+        yield line_number, parts[0], parts[1:]
+
+def execute_commands(parsed, command_factory, plugin_manager, history_records=None):
+    """
+    Execute parsed commands and yield one result dict per command.
+    Errors are reported in the 'error' field instead of stopping the run.
+    Statistical commands accept '@path[:column]' file operands (see app/file_operands.py).
+    Successful arithmetic and statistical results are appended to 'history_records'
+    as (command, arguments, result) tuples when a list is supplied.
+    """
+    plugin_commands = set(plugin_manager.get_plugin_commands()) if plugin_manager else set()
+    # Checked once per run so the per-command log line costs nothing unless DEBUG is on.
+    debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+    for line_number, command_name, raw_args in parsed:
+        record = {"line": line_number, "command": command_name, "args": raw_args,
+                  "result": None, "error": None}
+        try:
+            if command_name in plugin_commands:
+                args = parse_plugin_args(raw_args)
+                record["result"] = plugin_manager.execute_plugin(command_name, *args)
+            elif any(is_file_operand(arg) for arg in raw_args):
+                record["result"] = execute_statistic(command_name, raw_args)
+                if history_records is not None:
+                    history_records.append((command_name, raw_args, record["result"]))
+            else:
+                args = list(map(float, raw_args))
+                record["result"] = command_factory.execute_command(command_name, args)
+                if history_records is not None:
+                    history_records.append((command_name, args, record["result"]))
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            record["error"] = str(e)
+        if debug:
+            logging.debug("Line %d: %s %s -> %s", line_number, command_name, " ".join(raw_args),
+                          record["result"] if record["error"] is None else record["error"])
+        yield record
+
+def to_json_line(record):
+    """
+    Serialize a result dict as strict JSON, which has no NaN or infinity: a non-finite
+    result is written as null with an error instead.
+    """
+    result = record["result"]
+    if isinstance(result, float) and not math.isfinite(result):
+        record = dict(record, result=None, error=f"Result {result} is not a finite number.")
+    try:
+        return json.dumps(record, default=str, allow_nan=False)
+    except ValueError:
+        # E.g. a plugin returned a list holding NaN.
+        return json.dumps(dict(record, result=None,
+                               error="Result contains a number that is not finite."),
+                          default=str, allow_nan=False)
+
+def write_jsonl(results, out):
+    """Write result dicts as JSON lines and return the number written."""
+    count = 0
+    for count, record in enumerate(results, start=1):
+        out.write(to_json_line(record))
+        out.write("\n")
+    return count
+
+def write_csv(results, out):
+    """Write result dicts as CSV rows (arguments space-separated) and return the number written."""
+    writer = csv.writer(out)
+    writer.writerow(CSV_FIELDS)
+    count = 0
+    for count, record in enumerate(results, start=1):
+        writer.writerow((record["line"], record["command"], " ".join(record["args"]),
+                         "" if record["result"] is None else record["result"],
+                         record["error"] or ""))
+    return count
+
+def run_batch(stream, out, command_factory, plugin_manager=None, history_manager=None,
+              output_format="jsonl"):
+    """
+    Run every command in 'stream', writing results to 'out' in 'output_format'.
+    Recorded calculations are added to 'history_manager' in a single bulk call.
+    Returns the number of commands processed.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format '{output_format}'.")
+    history_records = [] if history_manager is not None else None
+    results = execute_commands(parse_commands(iter_command_lines(stream)),
+                               command_factory, plugin_manager, history_records)
+    writer = write_jsonl if output_format == "jsonl" else write_csv
+    count = writer(results, out)
+    out.flush()
+    if history_records:
+        history_manager.add_records(history_records)
+    logging.info("Batch run processed %d commands.", count)
+    return count
@@ -0,0 +1,46 @@
+"""
+Benchmark: throughput of batch_mode.run_batch on a generated 1M-line input file.
+Run from the project root with `python benchmarks/bench_batch_mode.py [lines]`.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# pylint: disable=wrong-import-position
+from app.command import CommandFactory
+from app.history_manager import HistoryManager
+from batch_mode import run_batch
+
+COMMANDS = ("add", "subtract", "multiply", "divide")
+
+def write_input(path, lines):
+    rng = random.Random(42)
+    with open(path, "w", encoding="utf-8") as f:
+        for _ in range(lines):
+            f.write(f"{rng.choice(COMMANDS)} {rng.randint(0, 999)} {rng.randint(1, 999)}\n")
+
+def main():
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path = os.path.join(tmp, "commands.txt")
+        write_input(input_path, lines)
+        for output_format in ("jsonl", "csv"):
+            output_path = os.path.join(tmp, f"results.{output_format}")
+            history_manager = HistoryManager()
+            start = time.perf_counter()
+            with open(input_path, encoding="utf-8") as src, \
+                    open(output_path, "w", encoding="utf-8", newline="",
+                         buffering=1 << 20) as out:
+                run_batch(src, out, CommandFactory(), history_manager=history_manager,
+                          output_format=output_format)
+            elapsed = time.perf_counter() - start
+            print(f"{output_format:>5}: {lines} lines in {elapsed:.2f}s "
+                  f"({lines / elapsed:,.0f} commands/s)")
+
+if __name__ == "__main__":
+    main()
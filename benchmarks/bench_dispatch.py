@@ -0,0 +1,35 @@
+"""
+Benchmark: per-operation dispatch overhead of the command paths.
+Compares building a Command per call (create_command().execute()), execute_command()
+(resolve + flyweight on every call) and execute_operation() on an Operation resolved
+once up front, the way parsed command lines and compiled expressions use it.
+Run from the project root with `python benchmarks/bench_dispatch.py`.
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.command import CommandFactory  # pylint: disable=wrong-import-position
+
+CASES = (("add", [3.0, 4.0]), ("divide", [3.0, 4.0]), ("sqrt", [16.0]), ("mean", [1.0, 2.0, 3.0]))
+
+def main():
+    factory = CommandFactory()
+    print(f"{'command':<8} {'Command object':>15} {'execute_command':>16} {'resolved':>10}")
+    for name, args in CASES:
+        operation = factory.resolve(name, len(args))
+        paths = (lambda: factory.create_command(name, args).execute(),
+                 lambda: factory.execute_command(name, args),
+                 lambda: factory.execute_operation(operation, args))
+        timings = []
+        for path in paths:
+            number, _ = timeit.Timer(path).autorange()
+            best = min(timeit.repeat(path, number=number, repeat=5)) / number
+            timings.append(f"{best * 1e9:.0f} ns")
+        print(f"{name:<8} {timings[0]:>15} {timings[1]:>16} {timings[2]:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark: statistics over file operands.
+Writes a float64 file of N values (and a CSV of N / 10 values) to a temporary directory,
+then runs each statistic in a fresh process and reports throughput and peak resident
+memory, to show that memory stays bounded regardless of file size.
+Run from the project root with `python benchmarks/bench_file_operands.py [values]`.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+CHILD = """
+import resource, sys, time
+sys.path.insert(0, {root!r})
+from app.file_operands import execute_statistic
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+result = execute_statistic({command!r}, [{operand!r}])
+elapsed = time.perf_counter() - start
+after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(result, elapsed, before, after)
+"""
+
+def write_values(path, size, chunk=1_000_000, csv=False):
+    rng = np.random.default_rng(42)
+    with open(path, "w" if csv else "wb") as f:
+        if csv:
+            f.write("id,value\n")
+        for start in range(0, size, chunk):
+            values = rng.normal(100.0, 15.0, min(chunk, size - start)).round(3)
+            if csv:
+                f.write("".join(f"{start + i},{value}\n" for i, value in enumerate(values)))
+            else:
+                values.astype("<f8").tofile(f)
+
+def run(command, operand):
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.format(root=ROOT, command=command, operand=operand)],
+        check=True, capture_output=True, text=True).stdout.split()
+    result, elapsed, before, after = float(output[0]), float(output[1]), int(output[2]), \
+        int(output[3])
+    return result, elapsed, before, after
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000_000
+    with tempfile.TemporaryDirectory() as workdir:
+        binary = os.path.join(workdir, "data.f64")
+        table = os.path.join(workdir, "data.csv")
+        write_values(binary, size)
+        write_values(table, size // 10, csv=True)
+        print(f"data.f64: {size:,} values ({os.path.getsize(binary) / 2**20:,.0f} MiB), "
+              f"data.csv: {size // 10:,} rows ({os.path.getsize(table) / 2**20:,.0f} MiB)")
+        print(f"{'operand':>18} {'op':>9} {'result':>10} {'seconds':>8} {'Mvalues/s':>10} "
+              f"{'peak RSS MiB':>13} {'(+ over start)':>14}")
+        for operand, count in (("@" + binary, size), ("@" + table + ":value", size // 10)):
+            for command in ("mean", "variance", "median", "mode"):
+                result, elapsed, before, after = run(command, operand)
+                print(f"{os.path.basename(operand):>18} {command:>9} {result:>10.3f} "
+                      f"{elapsed:>8.2f} {count / elapsed / 1e6:>10.1f} {after / 1024:>13.0f} "
+                      f"{(after - before) / 1024:>14.0f}")
+
+if __name__ == "__main__":
+    main()
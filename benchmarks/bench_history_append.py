@@ -0,0 +1,36 @@
+"""
+Benchmark: per-record cost of HistoryManager.add_record as history grows.
+Run from the project root with `python benchmarks/bench_history_append.py`.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.history_manager import HistoryManager  # pylint: disable=wrong-import-position
+
+SIZES = (1_000, 10_000, 100_000, 1_000_000)
+
+def bench_append(size):
+    """Return the mean add_record cost in microseconds for a history of 'size' rows."""
+    hm = HistoryManager()
+    start = time.perf_counter()
+    for i in range(size):
+        hm.add_record("add", [i, 1.0], i + 1.0)
+    elapsed = time.perf_counter() - start
+    materialize_start = time.perf_counter()
+    rows = len(hm.history)
+    materialize = time.perf_counter() - materialize_start
+    assert rows == size
+    return elapsed / size * 1e6, materialize
+
+def main():
+    print(f"{'records':>10} {'us/append':>10} {'materialize s':>14}")
+    for size in SIZES:
+        per_append, materialize = bench_append(size)
+        print(f"{size:>10} {per_append:>10.2f} {materialize:>14.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark: indexed history queries vs. a full DataFrame scan.
+Run from the project root with `python benchmarks/bench_history_query.py [rows]`.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# pylint: disable=wrong-import-position
+from app.history_manager import HistoryManager
+from bench_history_startup import make_history
+
+QUERIES = {
+    "command=divide limit 50": {"command": "divide", "limit": 50},
+    "since=<last hour> (narrow)": None,
+    "result>1990": {"result_min": 1990.0, "min_inclusive": False},
+    "command=divide result>1990 limit 50": {"command": "divide", "result_min": 1990.0,
+                                             "min_inclusive": False, "limit": 50},
+}
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    hm = HistoryManager()
+    hm.history = make_history(rows)
+    frame = hm.history
+    since = frame["timestamp"].iloc[-1000]
+    QUERIES["since=<last hour> (narrow)"] = {"since": since}
+
+    start = time.perf_counter()
+    hm.query(limit=1)
+    print(f"{rows:,} rows, one-time index build {time.perf_counter() - start:.2f}s")
+    for label, conditions in QUERIES.items():
+        repeats = 20
+        start = time.perf_counter()
+        for _ in range(repeats):
+            matches = hm.query(**conditions)
+        indexed = (time.perf_counter() - start) / repeats
+        start = time.perf_counter()
+        mask = frame["command"] == conditions.get("command", frame["command"])
+        if "since" in conditions:
+            mask &= frame["timestamp"] >= conditions["since"]
+        if "result_min" in conditions:
+            mask &= frame["result"] > conditions["result_min"]
+        scanned = frame[mask].head(conditions.get("limit", rows))
+        scan = time.perf_counter() - start
+        assert len(scanned) == len(matches)
+        print(f"{label:>38}: {len(matches):>6} rows  indexed {indexed * 1e3:8.3f}ms  "
+              f"full scan {scan * 1e3:8.1f}ms")
+    hm.add_record("divide", [1.0, 1.0], 1.0)
+    start = time.perf_counter()
+    hm.query(command="divide", limit=1)
+    print(f"query right after add_record {(time.perf_counter() - start) * 1e3:.3f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: replaying a large history with the grouped, vectorized engine vs. a loop that
+parses and re-executes one record at a time.
+The history mixes arithmetic, sqrt and statistics records; one in 10,000 results is off.
+Run from the project root with `python benchmarks/bench_history_replay.py [rows] [workers]`.
+"""
+
+import ast
+import math
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# pylint: disable=wrong-import-position
+from app.command import CommandFactory
+from history_replay import replay_history
+
+def make_history(rows):
+    rng = np.random.default_rng(7)
+    a = rng.integers(0, 1000, rows).astype(float)
+    b = rng.integers(1, 1000, rows).astype(float)
+    kinds = rng.choice(["add", "subtract", "multiply", "divide", "sqrt", "mean", "mode"],
+                       size=rows, p=[0.25, 0.2, 0.2, 0.2, 0.05, 0.05, 0.05])
+    commands, arguments, results = [], [], []
+    for kind, x, y in zip(kinds.tolist(), a.tolist(), b.tolist()):
+        args = [x] if kind == "sqrt" else [x, y, x] if kind in ("mean", "mode") else [x, y]
+        commands.append(kind)
+        arguments.append(str(args))
+        results.append({"add": x + y, "subtract": x - y, "multiply": x * y, "divide": x / y,
+                        "sqrt": math.sqrt(x), "mean": (x + y + x) / 3, "mode": x}[kind])
+    for row in range(0, rows, 10000):
+        results[row] += 1.0
+    return {"command": commands, "arguments": arguments, "result": results}
+
+def replay_one_by_one(history):
+    factory = CommandFactory()
+    differing = 0
+    for command, text, recorded in zip(history["command"], history["arguments"],
+                                       history["result"]):
+        result = factory.execute_command(command, ast.literal_eval(text))
+        differing += not math.isclose(result, recorded, rel_tol=1e-9)
+    return differing
+
+def timed(function):
+    start = time.perf_counter()
+    value = function()
+    return value, time.perf_counter() - start
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    history = make_history(rows)
+    print(f"{rows:,} records")
+    naive, elapsed = timed(lambda: replay_one_by_one(history))
+    print(f"{'one record at a time':<24} {elapsed:6.2f}s {rows / elapsed:>12,.0f} records/s")
+    for count in sorted({1, workers}):
+        report, elapsed = timed(lambda: replay_history(history, workers=count))
+        assert report.totals()["mismatch"] == naive
+        print(f"{f'engine, {count} worker(s)':<24} {elapsed:6.2f}s {rows / elapsed:>12,.0f} "
+              f"records/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark: resident memory and append throughput with and without a retention limit.
+Each configuration runs in a fresh process that appends N records one at a time and
+reports its resident set size after every fifth of the run.
+Run from the project root with
+`python benchmarks/bench_history_retention.py [records] [capacity]`.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+CHILD = """
+import os, sys, time
+sys.path.insert(0, {root!r})
+from app.history_archive import HistoryArchive
+from app.history_manager import HistoryManager
+
+def rss_mib():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+hm = HistoryManager()
+if {capacity}:
+    hm.set_retention({capacity}, HistoryArchive({archive!r}))
+step = {records} // 5
+checkpoints = []
+start = time.perf_counter()
+for i in range({records}):
+    hm.add_record("add", [float(i), 1.0], i + 1.0)
+    if (i + 1) % step == 0:
+        checkpoints.append(rss_mib())
+elapsed = time.perf_counter() - start
+print(" ".join(f"{{value:.0f}}" for value in checkpoints), {records} / elapsed)
+"""
+
+def run(records, capacity, archive):
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.format(root=ROOT, records=records, capacity=capacity,
+                                            archive=archive)],
+        check=True, capture_output=True, text=True).stdout.split()
+    return output[:-1], float(output[-1])
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    capacity = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    print(f"{records:,} records appended; RSS in MiB after each fifth of the run")
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, limit in (("unbounded", 0), (f"capacity {capacity:,}", capacity)):
+            checkpoints, rate = run(records, limit, os.path.join(workdir, "archive"))
+            print(f"{label:>18}: RSS {' -> '.join(checkpoints):<32} {rate:>10,.0f} records/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark: time to open a large history as CSV vs. the columnar store.
+Run from the project root with `python benchmarks/bench_history_startup.py [rows]`.
+"""
+
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# pylint: disable=wrong-import-position
+from app.history_manager import HistoryManager
+
+COMMANDS = np.array(["add", "subtract", "multiply", "divide"], dtype=object)
+
+def make_history(rows):
+    rng = np.random.default_rng(42)
+    a = rng.integers(0, 1000, rows).astype(float)
+    b = rng.integers(1, 1000, rows).astype(float)
+    start = np.datetime64("2025-03-11T00:00:00.000000")
+    timestamps = start + np.arange(rows).astype("timedelta64[ms]")
+    return pd.DataFrame({
+        "command": COMMANDS[rng.integers(0, 4, rows)],
+        "arguments": [f"[{x}, {y}]" for x, y in zip(a.tolist(), b.tolist())],
+        "result": a + b,
+        "timestamp": np.char.replace(np.datetime_as_string(timestamps, unit="us"), "T", " "),
+    })
+
+def timed(func):
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000_000
+    writer = HistoryManager()
+    writer.history = make_history(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "history.csv")
+        cols_path = os.path.join(tmp, "history.cols")
+        writer.save_history(csv_path)
+        writer.save_history(cols_path)
+        print(f"{rows:,} rows")
+        for label, path in (("csv", csv_path), ("columnar", cols_path)):
+            hm = HistoryManager()
+            open_time = timed(lambda hm=hm, path=path: hm.load_history(path))
+            full_time = timed(lambda hm=hm: len(hm.history))
+            print(f"{label:>9}: open {open_time:8.4f}s, "
+                  f"first full DataFrame access {full_time:8.3f}s")
+        hm = HistoryManager()
+        hm.load_history(cols_path)
+        tail_time = timed(lambda: hm._store.to_dataframe(rows - 20, rows))
+        print(f"{'columnar':>9}: last 20 rows without materializing {tail_time:.4f}s")
+
+if __name__ == "__main__":
+    main()
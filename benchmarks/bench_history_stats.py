@@ -0,0 +1,53 @@
+"""
+Benchmark: incrementally maintained `history stats` vs. a full DataFrame groupby.
+Run from the project root with `python benchmarks/bench_history_stats.py [rows]`.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# pylint: disable=wrong-import-position
+from app.history_manager import HistoryManager
+from bench_history_startup import make_history
+
+def timed(function, repeats=20):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        value = function()
+    return value, (time.perf_counter() - start) / repeats
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    hm = HistoryManager()
+    hm.history = make_history(rows)
+    frame = hm.history
+
+    _, build = timed(hm.stats, repeats=1)
+    print(f"{rows:,} rows, one-time aggregate build {build:.2f}s")
+    stats, maintained = timed(hm.stats)
+    grouped, scan = timed(lambda: frame.groupby("command")["result"].agg(
+        ["count", "sum", "min", "max", "mean"]), repeats=5)
+    assert [row["count"] for row in stats] == list(grouped["count"])
+    print(f"history stats: maintained {maintained * 1e6:8.1f}us  "
+          f"groupby scan {scan * 1e3:8.1f}ms")
+
+    appends = 100_000
+    fresh = HistoryManager()
+    _, plain = timed(lambda: [fresh.add_record("add", [1.0, 2.0], 3.0)
+                              for _ in range(appends)], repeats=1)
+    tracked = HistoryManager()
+    tracked.stats()
+    _, maintaining = timed(lambda: [tracked.add_record("add", [1.0, 2.0], 3.0)
+                                    for _ in range(appends)], repeats=1)
+    print(f"add_record: {plain / appends * 1e6:.2f}us without aggregates, "
+          f"{maintaining / appends * 1e6:.2f}us while maintaining them")
+    for index in range(0, appends, 10):
+        tracked.edit_record(index, new_result=float(index))
+    _, after_edits = timed(tracked.stats)
+    print(f"history stats after {appends // 10:,} edits: {after_edits * 1e6:.1f}us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark: HistoryManager.add_record throughput with concurrent writer threads.
+Each run checks that no record was lost. Run from the project root with
+`python benchmarks/bench_history_threads.py [records per thread]`.
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# pylint: disable=wrong-import-position
+from app.history_journal import HistoryJournal
+from app.history_manager import HistoryManager
+
+THREADS = (1, 4, 16)
+
+def bench_writers(threads, per_thread, journal_dir=None):
+    """Return records per second for 'threads' writers, optionally journaling to 'journal_dir'."""
+    hm = HistoryManager()
+    if journal_dir is not None:
+        hm.open_journal(os.path.join(journal_dir, f"history-{threads}.csv"),
+                        HistoryJournal(os.path.join(journal_dir, f"history-{threads}.journal"),
+                                       compact_threshold=10 ** 9))
+
+    def write(worker):
+        for i in range(per_thread):
+            hm.add_record("add", [worker, i], i + 1.0)
+
+    workers = [threading.Thread(target=write, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    hm.close_journal()
+    assert hm.record_count() == threads * per_thread, "records were lost"
+    return threads * per_thread / elapsed
+
+def main():
+    per_thread = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    print(f"{'threads':>8} {'records/s':>12} {'journaled/s':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for threads in THREADS:
+            memory = bench_writers(threads, per_thread)
+            journaled = bench_writers(threads, per_thread, tmp)
+            print(f"{threads:>8} {memory:>12,.0f} {journaled:>12,.0f}")
+
+if __name__ == "__main__":
+    main()
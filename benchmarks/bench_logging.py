@@ -0,0 +1,118 @@
+"""
+Benchmark: command throughput with logging off and on, synchronous vs. queued.
+Runs N batch commands, logged at DEBUG to a file, and N failing commands logged as errors
+the way the REPL does, under several logging configurations. The last runs log to stderr
+connected to a slow reader, where a synchronous handler blocks the commands.
+Run from the project root with `python benchmarks/bench_logging.py [commands]`.
+"""
+
+import io
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# pylint: disable=wrong-import-position
+from app.command import CommandFactory
+from batch_mode import run_batch
+from logger_setup import setup_logging, stop_logging
+
+CONFIGS = (
+    ("off (WARNING)", {"LOG_LEVEL": "WARNING"}),
+    ("DEBUG sync text", {"LOG_LEVEL": "DEBUG"}),
+    ("DEBUG sync json", {"LOG_LEVEL": "DEBUG", "LOG_FORMAT": "json"}),
+    ("DEBUG queue text", {"LOG_LEVEL": "DEBUG", "LOG_QUEUE": "1"}),
+    ("DEBUG queue json", {"LOG_LEVEL": "DEBUG", "LOG_QUEUE": "1", "LOG_FORMAT": "json"}),
+)
+ERROR_CONFIGS = (
+    ("errors sync, no limit", {"LOG_RATE_LIMIT": "0"}),
+    ("errors sync, limited", {}),
+    ("errors queue, no limit", {"LOG_QUEUE": "1", "LOG_RATE_LIMIT": "0"}),
+    ("errors queue, limited", {"LOG_QUEUE": "1"}),
+)
+SLOW_SINK_CONFIGS = (
+    ("slow stderr sync", {"LOG_LEVEL": "DEBUG"}),
+    ("slow stderr queue", {"LOG_LEVEL": "DEBUG", "LOG_QUEUE": "1"}),
+)
+# Reads stderr at roughly 400 KB/s, about a quarter of what the DEBUG workload writes.
+SLOW_READER = "import sys, time\nwhile sys.stdin.buffer.read1(2048):\n    time.sleep(0.005)\n"
+ENV_KEYS = ("LOG_LEVEL", "LOG_FORMAT", "LOG_QUEUE", "LOG_RATE_LIMIT", "LOG_FILE", "LOG_CONFIG")
+
+def configure(settings, log_file=None):
+    for key in ENV_KEYS:
+        os.environ.pop(key, None)
+    os.environ.update(settings)
+    if log_file is not None:
+        os.environ["LOG_FILE"] = log_file
+    setup_logging()
+
+def close_logging():
+    """Stop the listener (draining the queue) and close the file handlers."""
+    stop_logging()
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers:
+        handler.close()
+    root_logger.handlers.clear()
+
+def batch_workload(size):
+    factory = CommandFactory()
+    lines = "".join(f"divide {i} 0\n" if i % 10 == 0 else f"add {i} 1\n" for i in range(size))
+    return lambda: run_batch(io.StringIO(lines), io.StringIO(), factory)
+
+def error_workload(size):
+    factory = CommandFactory()
+
+    def run():
+        for i in range(size):
+            try:
+                factory.execute_command("divide", [float(i), 0.0])
+            except ValueError as e:
+                logging.error("Error processing command: %s", e)
+    return run
+
+def measure(name, settings, workload, size, workdir):
+    log_file = os.path.join(workdir, name.replace(" ", "_").replace(",", "") + ".log")
+    configure(settings, log_file)
+    start = time.perf_counter()
+    workload()
+    elapsed = time.perf_counter() - start
+    close_logging()
+    flushed = time.perf_counter() - start
+    print(f"{name:<24} {size / elapsed:>12,.0f} {size / flushed:>14,.0f} "
+          f"{os.path.getsize(log_file) / 2**20:>8.1f}")
+
+def measure_slow_sink(name, settings, size):
+    reader = subprocess.Popen([sys.executable, "-c", SLOW_READER], stdin=subprocess.PIPE)
+    stderr = sys.stderr
+    sys.stderr = io.TextIOWrapper(reader.stdin, encoding="utf-8")
+    try:
+        configure(settings)
+        start = time.perf_counter()
+        batch_workload(size)()
+        elapsed = time.perf_counter() - start
+        close_logging()
+        flushed = time.perf_counter() - start
+    finally:
+        sys.stderr.close()
+        sys.stderr = stderr
+        reader.wait()
+    print(f"{name:<24} {size / elapsed:>12,.0f} {size / flushed:>14,.0f}")
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    print(f"{size:,} commands per run")
+    print(f"{'logging':<24} {'commands/s':>12} {'incl. flush/s':>14} {'log MiB':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, settings in CONFIGS:
+            measure(name, settings, batch_workload(size), size, workdir)
+        for name, settings in ERROR_CONFIGS:
+            measure(name, settings, error_workload(size), size, workdir)
+    for name, settings in SLOW_SINK_CONFIGS:
+        measure_slow_sink(name, settings, size // 10)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: several calculator processes writing one history at the same time.
+Starts P processes that each add N records to a history in a temporary directory,
+compacting every few hundred records, first with the shared journal and then with the
+single-process journal. Reports the time taken and how many records survive.
+Run from the project root with `python benchmarks/bench_shared_history.py [P] [N]`.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from app.history_journal import HistoryJournal
+from app.history_manager import HistoryManager
+from app.shared_journal import SharedJournal
+
+COMPACT_THRESHOLD = 500
+WRITER = (
+    "import sys\n"
+    "from app.history_manager import HistoryManager\n"
+    "from app.history_journal import HistoryJournal\n"
+    "from app.shared_journal import SharedJournal\n"
+    "hm = HistoryManager()\n"
+    "if sys.argv[3] == 'shared':\n"
+    f"    journal = SharedJournal('history.journal.d', compact_threshold={COMPACT_THRESHOLD})\n"
+    "else:\n"
+    f"    journal = HistoryJournal('history.journal', compact_threshold={COMPACT_THRESHOLD})\n"
+    "hm.open_journal('history.csv', journal)\n"
+    "for i in range(int(sys.argv[2])):\n"
+    "    hm.add_record('add', [sys.argv[1], i], i)\n"
+    "hm.close_journal()\n"
+)
+
+def open_journal(mode):
+    if mode == "shared":
+        return SharedJournal("history.journal.d")
+    return HistoryJournal("history.journal")
+
+def run(mode, processes, records):
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        start = time.perf_counter()
+        workers = [subprocess.Popen([sys.executable, "-c", WRITER, str(n), str(records), mode],
+                                    cwd=directory, env=env, stderr=subprocess.DEVNULL)
+                   for n in range(processes)]
+        failed = sum(worker.wait() != 0 for worker in workers)
+        elapsed = time.perf_counter() - start
+        cwd = os.getcwd()
+        os.chdir(directory)
+        try:
+            history = HistoryManager()
+            history.open_journal("history.csv", open_journal(mode))
+            kept = len(set(history.history["arguments"]))
+            history.close_journal()
+        finally:
+            os.chdir(cwd)
+    print(f"{mode:>8}: {elapsed:6.2f} s, {failed} of {processes} processes failed, "
+          f"{kept} of {processes * records} records kept")
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    records = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    for mode in ("shared", "single"):
+        run(mode, processes, records)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark: interpreter startup cost of the calculator.
+Reports the cumulative `-X importtime` cost of importing main, the slowest top-level
+imports, and the wall time of a one-command batch run (`echo "add 1 2" | main.py`).
+Run from the project root with `python benchmarks/bench_startup.py [runs]`.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def import_times(module="main"):
+    """Return {module: cumulative microseconds} from one `python -X importtime` run."""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name[1:].rstrip()] = int(cumulative)
+    return times
+
+def batch_wall_time(workdir):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(ROOT, "main.py")], input="add 1 2\n",
+                   cwd=workdir, capture_output=True, text=True, check=True)
+    return time.perf_counter() - start
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    samples = [import_times() for _ in range(runs)]
+    total = statistics.median(sample["main"] for sample in samples) / 1000
+    print(f"import main: {total:.1f} ms (median of {runs})")
+    top_level = {name.strip(): value for name, value in samples[-1].items()
+                 if name.startswith("  ") and not name.startswith("   ")}
+    for name, value in sorted(top_level.items(), key=lambda item: -item[1])[:5]:
+        print(f"  {name:<28} {value / 1000:>7.1f} ms")
+    print("pandas imported:", any(name.strip() == "pandas" for name in samples[-1]))
+    with tempfile.TemporaryDirectory() as workdir:
+        wall = statistics.median(batch_wall_time(workdir) for _ in range(runs))
+    print(f'echo "add 1 2" | python main.py: {wall * 1000:.0f} ms (median of {runs})')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Benchmark: streaming accumulators vs. the statistics module.
+Run from the project root with `python benchmarks/bench_statistics.py [values]`.
+"""
+
+import os
+import statistics
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# pylint: disable=wrong-import-position
+from app.accumulators import MeanVarianceAccumulator, MedianAccumulator, ModeAccumulator
+
+CHUNK = 1_000_000
+
+def timed(func):
+    start = time.perf_counter()
+    value = func()
+    return value, time.perf_counter() - start
+
+def streamed(accumulator_class, attr, data):
+    accumulator = accumulator_class()
+    for start in range(0, data.size, CHUNK):
+        accumulator.update(data[start:start + CHUNK])
+    return getattr(accumulator, attr)
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    rng = np.random.default_rng(42)
+    data = rng.normal(100.0, 15.0, size)
+    values = data.tolist()
+    discrete = rng.integers(0, 1000, size)
+    discrete_values = discrete.tolist()
+
+    cases = [
+        ("mean", lambda: streamed(MeanVarianceAccumulator, "mean", data),
+         lambda: statistics.mean(values)),
+        ("variance", lambda: streamed(MeanVarianceAccumulator, "variance", data),
+         lambda: statistics.variance(values)),
+        ("median", lambda: streamed(MedianAccumulator, "median", data),
+         lambda: statistics.median(values)),
+        ("mode", lambda: streamed(ModeAccumulator, "mode", discrete),
+         lambda: statistics.mode(discrete_values)),
+    ]
+    print(f"{size:,} values, chunks of {CHUNK:,}")
+    print(f"{'op':>9} {'accumulator s':>14} {'statistics s':>13} {'speedup':>8}")
+    for name, fast, reference in cases:
+        fast_value, fast_time = timed(fast)
+        ref_value, ref_time = timed(reference)
+        assert np.isclose(fast_value, ref_value), (name, fast_value, ref_value)
+        print(f"{name:>9} {fast_time:>14.3f} {ref_time:>13.3f} {ref_time / fast_time:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Load generator for the calculator server (`main.py --serve`).
+Opens N concurrent connections, each keeping up to P requests in flight, and reports
+throughput plus p50/p99 request latency.
+
+Run from the project root with
+`python benchmarks/loadgen.py [--connections 100] [--requests 1000] [--pipeline 1]`.
+Without --port, a server is started in a temporary directory and stopped afterwards.
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+COMMANDS = ("add", "subtract", "multiply", "divide")
+
+async def client(host, port, requests, pipeline, latencies, seed):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    in_flight = asyncio.Semaphore(pipeline)
+    sent_at = []
+
+    async def receive():
+        for i in range(requests):
+            await reader.readline()
+            latencies.append(time.perf_counter() - sent_at[i])
+            in_flight.release()
+
+    receiver = asyncio.create_task(receive())
+    for _ in range(requests):
+        await in_flight.acquire()
+        sent_at.append(time.perf_counter())
+        writer.write(f"{rng.choice(COMMANDS)} {rng.randint(0, 999)} "
+                     f"{rng.randint(1, 999)}\n".encode())
+        await writer.drain()
+    await receiver
+    writer.close()
+    await writer.wait_closed()
+
+async def run_load(host, port, connections, requests, pipeline):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, requests, pipeline, latencies, seed)
+                           for seed in range(connections)))
+    return time.perf_counter() - start, sorted(latencies)
+
+def start_server(workdir):
+    """Start `main.py --serve` on a free port in 'workdir' and return (process, port)."""
+    os.symlink(os.path.join(ROOT, "plugins"), os.path.join(workdir, "plugins"))
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "main.py"), "--serve", "--port", "0"],
+        cwd=workdir, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("Listening on"):
+        process.kill()
+        raise RuntimeError(f"Server did not start: {line!r}")
+    return process, int(line.rsplit(":", 1)[1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="use a running server instead of starting one")
+    parser.add_argument("--connections", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=1000, help="requests per connection")
+    parser.add_argument("--pipeline", type=int, default=1, help="requests in flight per connection")
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        process, port = (None, options.port) if options.port else start_server(workdir)
+        try:
+            elapsed, latencies = asyncio.run(run_load(options.host, port, options.connections,
+                                                      options.requests, options.pipeline))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+    total = len(latencies)
+    print(f"{total} requests over {options.connections} connections "
+          f"(pipeline {options.pipeline}) in {elapsed:.2f}s: {total / elapsed:,.0f} req/s")
+    print(f"latency p50 {latencies[total // 2] * 1000:.2f} ms, "
+          f"p99 {latencies[int(total * 0.99)] * 1000:.2f} ms")
+
+if __name__ == "__main__":
+    main()
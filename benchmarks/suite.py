@@ -0,0 +1,235 @@
+"""
+Benchmark suite for the calculator's core paths.
+
+Measures Calculator operations, CommandFactory.create_command/execute_command,
+HistoryManager.add_record/save_history/load_history and PluginManager.load_plugins at
+several data sizes, writes the results as JSON and compares them with a stored
+baseline. The run fails (exit status 1) if any benchmark is slower than its baseline
+by more than the threshold.
+
+Run from the project root:
+  python benchmarks/suite.py                     compare with benchmarks/baseline.json
+  python benchmarks/suite.py --quick             smaller sizes, for a fast check
+  python benchmarks/suite.py --output out.json   also write this run's results
+  python benchmarks/suite.py --update-baseline   store this run as the new baseline
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+# pylint: disable=wrong-import-position
+from app.calculator import Calculator
+from app.command import CommandFactory
+from app.history_manager import HistoryManager
+from plugin_manager import PluginManager
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+DEFAULT_THRESHOLD = 1.0
+HISTORY_SIZES = (1_000, 10_000, 100_000)
+QUICK_HISTORY_SIZES = (1_000, 10_000)
+PLUGIN_COUNTS = (10, 100)
+QUICK_PLUGIN_COUNTS = (10,)
+
+def measure(function, repeat=5, min_time=0.02):
+    """
+    Return the best seconds per call of 'function' over 'repeat' timed runs; the
+    minimum is the least disturbed by other activity on the machine.
+    Each run calls it enough times to last at least 'min_time' seconds. As with timeit,
+    the garbage collector is paused while timing.
+    """
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return _measure(function, repeat, min_time)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+def _measure(function, repeat, min_time):
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+    timings = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return min(timings)
+
+def calibration_loop():
+    """Fixed pure-Python work used to scale results to the speed of the current machine."""
+    total = 0
+    for i in range(1000):
+        total += i * i
+    return total
+
+def filled_history(rows):
+    hm = HistoryManager()
+    hm.add_records(("add", [i, 1.0], i + 1.0) for i in range(rows))
+    return hm
+
+def bench_calculator():
+    calculator = Calculator()
+    yield "calculator.add", lambda: calculator.add(3.0, 4.0)
+    yield "calculator.subtract", lambda: calculator.subtract(3.0, 4.0)
+    yield "calculator.multiply", lambda: calculator.multiply(3.0, 4.0)
+    yield "calculator.divide", lambda: calculator.divide(3.0, 4.0)
+
+def bench_commands(sizes):
+    factory = CommandFactory()
+    yield "command_factory.create_command", lambda: factory.create_command("add", [3.0, 4.0])
+    yield "command_factory.execute_command[add]", lambda: factory.execute_command(
+        "add", [3.0, 4.0])
+    for size in sizes:
+        values = [float(i % 97) for i in range(size)]
+        yield (f"command_factory.execute_command[mean,{size}]",
+               lambda values=values: factory.execute_command("mean", values))
+
+def bench_history(sizes, workdir):
+    for size in sizes:
+        appended = filled_history(size)
+        yield (f"history.add_record[{size}]",
+               lambda hm=appended: hm.add_record("add", [1.0, 2.0], 3.0))
+        hm = filled_history(size)
+        for name, filename in (("csv", "history.csv"), ("cols", "history.cols")):
+            path = os.path.join(workdir, filename)
+            yield (f"history.save_history[{name},{size}]",
+                   lambda hm=hm, path=path: hm.save_history(path))
+            # Loads read their own fixture, so they also run when filtered on their own.
+            fixture = os.path.join(workdir, f"load_{size}_{filename}")
+            hm.save_history(fixture)
+            yield (f"history.load_history[{name},{size}]",
+                   lambda fixture=fixture: HistoryManager().load_history(fixture))
+
+def bench_plugins(counts, workdir):
+    for count in counts:
+        plugin_dir = os.path.join(workdir, f"plugins_{count}")
+        os.makedirs(plugin_dir)
+        for i in range(count):
+            with open(os.path.join(plugin_dir, f"plugin_{i}.py"), "w", encoding="utf-8") as f:
+                f.write("def triple(x):\n    return x * 3\n\n"
+                        f"def register():\n    return {{'name': 'triple_{i}', "
+                        "'function': triple}\n")
+        manifest_dir = os.path.join(plugin_dir, "__pycache__")
+
+        def cold(plugin_dir=plugin_dir, manifest_dir=manifest_dir):
+            shutil.rmtree(manifest_dir, ignore_errors=True)
+            PluginManager(plugin_dir).load_plugins()
+
+        yield f"plugin_manager.load_plugins[cold,{count}]", cold
+        yield (f"plugin_manager.load_plugins[warm,{count}]",
+               lambda plugin_dir=plugin_dir: PluginManager(plugin_dir).load_plugins())
+
+def run_suite(quick=False, name_filter=None):
+    """Run every benchmark (or those whose name contains 'name_filter'); return the results."""
+    history_sizes = QUICK_HISTORY_SIZES if quick else HISTORY_SIZES
+    plugin_counts = QUICK_PLUGIN_COUNTS if quick else PLUGIN_COUNTS
+    groups = {"calculator.": lambda workdir: bench_calculator(),
+              "command_factory.": lambda workdir: bench_commands(history_sizes),
+              "history.": lambda workdir: bench_history(history_sizes, workdir),
+              "plugin_manager.": lambda workdir: bench_plugins(plugin_counts, workdir)}
+    results = {}
+    calibration = measure(calibration_loop)
+    with tempfile.TemporaryDirectory() as workdir:
+        for prefix, group in groups.items():
+            if (name_filter is not None and not name_filter.startswith(prefix)
+                    and any(name_filter.startswith(other) for other in groups)):
+                continue
+            for name, function in group(workdir):
+                if name_filter is None or name_filter in name:
+                    seconds = measure(function)
+                    results[name] = {"seconds_per_op": seconds, "ops_per_second": 1 / seconds,
+                                     "relative": seconds / calibration}
+    return {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "quick": quick, "calibration_seconds": calibration},
+        "results": results,
+    }
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare two suite runs benchmark by benchmark.
+    Returns (name, baseline seconds, current seconds, ratio) rows for the benchmarks both
+    runs share, and the subset of those rows that are slower by more than 'threshold'.
+    The ratio compares times relative to each run's calibration loop, so a baseline
+    recorded on a faster or slower machine still applies.
+    """
+    rows = []
+    for name, current in results["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            continue
+        ratio = current["relative"] / previous["relative"]
+        rows.append((name, previous["seconds_per_op"], current["seconds_per_op"], ratio))
+    return rows, [row for row in rows if row[3] > 1 + threshold]
+
+def format_seconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the calculator benchmark suite.")
+    parser.add_argument("--quick", action="store_true", help="use smaller data sizes")
+    parser.add_argument("--filter", help="only run benchmarks whose name contains this text")
+    parser.add_argument("--output", help="write this run's results to a JSON file")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown as a fraction (default: 1.0, i.e. twice as slow)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store this run as the baseline instead of comparing")
+    options = parser.parse_args(argv)
+
+    results = run_suite(options.quick, options.filter)
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if options.update_baseline:
+        with open(options.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Stored {len(results['results'])} benchmarks in {options.baseline}")
+        return 0
+
+    baseline = None
+    if os.path.exists(options.baseline):
+        with open(options.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    if baseline is None:
+        for name, result in results["results"].items():
+            print(f"{name:<50} {format_seconds(result['seconds_per_op']):>10}")
+        print(f"No baseline at {options.baseline}; run with --update-baseline to store one.")
+        return 0
+
+    rows, regressions = compare(results, baseline, options.threshold)
+    print(f"{'benchmark':<50} {'baseline':>10} {'current':>10} {'ratio':>6}")
+    for name, previous, current, ratio in rows:
+        flag = "  REGRESSION" if (name, previous, current, ratio) in regressions else ""
+        print(f"{name:<50} {format_seconds(previous):>10} {format_seconds(current):>10} "
+              f"{ratio:>6.2f}{flag}")
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than baseline by more than "
+              f"{options.threshold:.0%}.")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+"""
+Module: history_replay
+Re-executes recorded history and reports every record whose result no longer matches.
+
+Records are grouped by command and argument count, and each group's argument strings
+are parsed into one NumPy array in a single pass. Arithmetic and sqrt groups then run
+through CommandFactory.execute_batch, and the statistics through execute_batch_rows.
+Records with file operands run through the scalar commands, 'eval' records through the
+expression compiler, and plugin records through the PluginManager. With several
+workers, contiguous slices of the history are replayed in separate processes and their
+reports merged.
+"""
+
+import ast
+import csv
+import json
+import math
+import warnings
+from itertools import repeat
+import numpy as np
+from app.command import BATCH_OPERATIONS, BATCH_REDUCTIONS, CommandFactory
+from app.expression import ExpressionCompiler
+from app.file_operands import execute_statistic, is_file_operand
+from plugin_manager import PluginManager
+
+# Results within this relative difference of the recorded ones count as matching.
+DEFAULT_TOLERANCE = 1e-9
+STATUSES = ("match", "mismatch", "error", "skipped")
+REPORT_FORMATS = ("jsonl", "csv")
+REPORT_FIELDS = ("row", "command", "arguments", "recorded", "replayed", "status", "error")
+# Histories shorter than this are replayed in-process whatever the worker count.
+MIN_PARALLEL_RECORDS = 10000
+_BRACKETS = str.maketrans("", "", "[]")
+
+class ReplayReport:
+    """
+    Outcome of a replay: record counts per command and status ('match', 'mismatch',
+    'error' when the command now fails, 'skipped' when the record cannot be replayed)
+    and one entry per record that did not match, ordered by history row.
+    """
+    def __init__(self):
+        self.counts = {}
+        self.differences = []
+
+    def count(self, command, status, records=1):
+        if records:
+            statuses = self.counts.setdefault(command, dict.fromkeys(STATUSES, 0))
+            statuses[status] += records
+
+    def add_difference(self, row, command, arguments, recorded, replayed, status, error=None):
+        self.count(command, status)
+        self.differences.append({"row": row, "command": command, "arguments": arguments,
+                                 "recorded": recorded, "replayed": replayed,
+                                 "status": status, "error": error})
+
+    def merge(self, other):
+        """Fold a report on a later slice of the history into this one."""
+        for command, statuses in other.counts.items():
+            for status, records in statuses.items():
+                self.count(command, status, records)
+        self.differences.extend(other.differences)
+
+    def totals(self):
+        """Record counts per status over every command."""
+        totals = dict.fromkeys(STATUSES, 0)
+        for statuses in self.counts.values():
+            for status, records in statuses.items():
+                totals[status] += records
+        return totals
+
+    @property
+    def total(self):
+        return sum(self.totals().values())
+
+    def format_summary(self):
+        totals = self.totals()
+        return (f"Replayed {self.total} records: " +
+                ", ".join(f"{records} {status}" for status, records in totals.items()))
+
+class HistoryReplay:
+    """
+    Replays history records against 'command_factory' and, for plugin and 'eval'
+    records, 'plugin_manager'. The factory should have no result cache, so that every
+    result is recomputed rather than looked up.
+    """
+    def __init__(self, command_factory=None, plugin_manager=None,
+                 tolerance=DEFAULT_TOLERANCE):
+        self.command_factory = command_factory or CommandFactory()
+        self.plugin_manager = plugin_manager
+        self.expressions = ExpressionCompiler(self.command_factory, plugin_manager,
+                                              cache_size=4096)
+        self.tolerance = tolerance
+
+    def replay(self, history, first_row=0):
+        """
+        Replay 'history', a DataFrame or a mapping of column sequences with 'command',
+        'arguments' and 'result', numbering its records from 'first_row'.
+        Returns a ReplayReport.
+        """
+        import pandas as pd  # pylint: disable=import-outside-toplevel
+        commands = np.asarray(history["command"], dtype=object)
+        arguments = np.asarray(history["arguments"], dtype=object)
+        results = np.asarray(history["result"], dtype=object)
+        report = ReplayReport()
+        codes, names = pd.factorize(commands, use_na_sentinel=False)
+        order = np.argsort(codes, kind="stable")
+        bounds = [0] + np.cumsum(np.bincount(codes, minlength=len(names))).tolist()
+        for code, command in enumerate(names):
+            rows = order[bounds[code]:bounds[code + 1]]
+            self._replay_group(report, str(command), rows + first_row, arguments[rows],
+                               results[rows])
+        report.differences.sort(key=lambda difference: difference["row"])
+        return report
+
+    def _replay_group(self, report, command, rows, texts, recorded):
+        name = command.lower()
+        plugins = self.plugin_manager.plugins if self.plugin_manager is not None else {}
+        if name == "eval":
+            self._replay_scalar(report, command, rows, texts, recorded, self._evaluate)
+        elif name in self.command_factory.commands:
+            self._replay_numeric(report, command, rows, texts, recorded)
+        elif command in plugins:
+            self._replay_scalar(report, command, rows, texts, recorded,
+                                lambda text: self._run_plugin(command, text))
+        else:
+            for row, text, value in zip(rows.tolist(), texts.tolist(), recorded.tolist()):
+                report.add_difference(row, command, text, value, None, "skipped",
+                                      f"Unknown command '{command}'.")
+
+    def _replay_numeric(self, report, command, rows, texts, recorded):
+        """Replay calculator commands, one vectorized pass per argument count."""
+        try:
+            arities = np.fromiter(map(str.count, texts, repeat(",")), dtype=np.intp,
+                                  count=len(texts)) + 1
+        except TypeError:
+            # A missing (non-string) argument list; parse every record on its own.
+            arities = np.zeros(len(texts), dtype=np.intp)
+        for arity in np.unique(arities).tolist():
+            selected = np.flatnonzero(arities == arity)
+            matrix = _parse_matrix(texts[selected].tolist(), arity) if arity else None
+            if matrix is None:
+                self._replay_scalar(report, command, rows[selected], texts[selected],
+                                    recorded[selected],
+                                    lambda text: self._run_command(command, text))
+            else:
+                replayed, failures = self._run_matrix(command, matrix)
+                self._compare(report, command, rows[selected], texts[selected],
+                              recorded[selected], replayed, failures)
+
+    def _run_matrix(self, command, matrix):
+        """
+        Run 'command' on every row of 'matrix'. Returns the results and a dict mapping
+        the positions of failed rows to (status, message).
+        """
+        factory = self.command_factory
+        name = command.lower()
+        command_class = factory.commands[name]
+        try:
+            if name in BATCH_OPERATIONS and BATCH_OPERATIONS[name][0] is command_class:
+                batch = factory.execute_batch(name, *matrix.T)
+                failures = {index: ("error", message) for index, message in batch.error_report()}
+                return batch.values, failures
+            if name in BATCH_REDUCTIONS and BATCH_REDUCTIONS[name][0] is command_class:
+                return factory.execute_batch_rows(name, matrix).values, {}
+            operation = factory.resolve(name, matrix.shape[1])
+        except ValueError as e:
+            # The argument count is wrong for every row alike.
+            return np.full(len(matrix), np.nan), dict.fromkeys(range(len(matrix)),
+                                                              ("error", str(e)))
+        replayed = np.full(len(matrix), np.nan, dtype=object)
+        failures = {}
+        for index, args in enumerate(matrix.tolist()):
+            try:
+                replayed[index] = factory.execute_operation(operation, args)
+            except ValueError as e:
+                failures[index] = ("error", str(e))
+        return replayed, failures
+
+    def _replay_scalar(self, report, command, rows, texts, recorded, run):
+        """Replay records one at a time with 'run', which takes the argument text."""
+        replayed = np.full(len(texts), np.nan, dtype=object)
+        failures = {}
+        for index, text in enumerate(texts.tolist()):
+            try:
+                replayed[index] = run(text)
+            except _Unreplayable as e:
+                failures[index] = ("skipped", str(e))
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                failures[index] = ("error", str(e))
+        self._compare(report, command, rows, texts, recorded, replayed, failures)
+
+    def _run_command(self, command, text):
+        args = _parse_arguments(text)
+        if any(isinstance(arg, str) and is_file_operand(arg) for arg in args):
+            return execute_statistic(command, args)
+        return self.command_factory.execute_command(command, [float(arg) for arg in args])
+
+    def _run_plugin(self, command, text):
+        if command in self.plugin_manager.nondeterministic:
+            raise _Unreplayable(f"Plugin '{command}' is nondeterministic.")
+        return self.plugin_manager.execute_plugin(command, *_parse_arguments(text))
+
+    def _evaluate(self, source):
+        if not isinstance(source, str):
+            raise _Unreplayable("The expression is missing.")
+        expression = self.expressions.compile(source)
+        if expression.variables:
+            raise _Unreplayable("The expression reads variables: " +
+                                ", ".join(sorted(expression.variables)) + ".")
+        return expression()
+
+    def _compare(self, report, command, rows, texts, recorded, replayed, failures):
+        try:
+            same = np.isclose(np.asarray(replayed, dtype=float),
+                              np.asarray(recorded, dtype=float),
+                              rtol=self.tolerance, atol=0.0, equal_nan=True)
+        except (TypeError, ValueError):
+            # Plugins may return (and history may hold) values that are not numbers.
+            same = np.fromiter((_same(new, old, self.tolerance)
+                                for new, old in zip(replayed.tolist(), recorded.tolist())),
+                               dtype=bool, count=len(recorded))
+        if failures:
+            same[list(failures)] = False
+        report.count(command, "match", int(np.count_nonzero(same)))
+        for index in np.flatnonzero(~same).tolist():
+            status, error = failures.get(index, ("mismatch", None))
+            report.add_difference(int(rows[index]), command, texts[index],
+                                  _plain(recorded[index]),
+                                  None if index in failures else _plain(replayed[index]),
+                                  status, error)
+
+class _Unreplayable(Exception):
+    """A record that cannot be re-executed faithfully."""
+
+def _parse_matrix(texts, arity):
+    """
+    Parse argument lists of 'arity' numbers each into an (n, arity) array in one pass.
+    Returns None if any of them is not such a list, so they can be parsed one by one.
+    """
+    joined = ",".join(texts).translate(_BRACKETS)
+    with warnings.catch_warnings():
+        # np.fromstring only warns when it stops early at text that is not a number.
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            values = np.fromstring(joined, sep=",")
+        except (DeprecationWarning, ValueError):
+            return None
+    if values.size != len(texts) * arity:
+        return None
+    return values.reshape(len(texts), arity)
+
+def _parse_arguments(text):
+    """Parse one stored argument list into numbers, keeping quoted tokens as text."""
+    if not isinstance(text, str) or not text.strip().startswith("["):
+        raise _Unreplayable(f"Cannot parse arguments {text!r}.")
+    body = text.strip()[1:-1]
+    try:
+        if "'" in body or '"' in body:
+            return [arg if isinstance(arg, str) else float(arg)
+                    for arg in ast.literal_eval(text.strip())]
+        return [float(arg) for arg in body.split(",")] if body.strip() else []
+    except (ValueError, SyntaxError, TypeError):
+        raise _Unreplayable(f"Cannot parse arguments {text!r}.") from None
+
+def _same(new, old, tolerance):
+    numbers = (int, float)
+    if isinstance(new, numbers) and isinstance(old, numbers):
+        if math.isnan(new) or math.isnan(old):
+            return math.isnan(new) and math.isnan(old)
+        return math.isclose(new, old, rel_tol=tolerance)
+    return new == old
+
+def _plain(value):
+    """Turn NumPy scalars into the Python values reports are written with."""
+    return value.item() if isinstance(value, np.generic) else value
+
+def _replay_part(history, first_row, tolerance, plugin_dir):
+    plugin_manager = None
+    if plugin_dir is not None:
+        plugin_manager = PluginManager(plugin_dir)
+        plugin_manager.load_plugins()
+    return HistoryReplay(CommandFactory(), plugin_manager, tolerance).replay(history, first_row)
+
+def replay_history(history, tolerance=DEFAULT_TOLERANCE, workers=1, plugin_dir=None):
+    """
+    Replay every record in 'history' (see HistoryReplay.replay) with fresh commands and,
+    when 'plugin_dir' is given, its plugins. With 'workers' above one, the records are
+    split into that many contiguous slices replayed in parallel processes.
+    """
+    columns = {column: np.asarray(history[column], dtype=object)
+               for column in ("command", "arguments", "result")}
+    size = len(columns["command"])
+    if workers <= 1 or size < MIN_PARALLEL_RECORDS:
+        return _replay_part(columns, 0, tolerance, plugin_dir)
+    # Imported here so a single-process replay does not pay for multiprocessing.
+    from concurrent.futures import ProcessPoolExecutor  # pylint: disable=import-outside-toplevel
+    bounds = np.linspace(0, size, workers + 1).astype(int).tolist()
+    report = ReplayReport()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_replay_part,
+                                   {column: values[start:stop]
+                                    for column, values in columns.items()},
+                                   start, tolerance, plugin_dir)
+                   for start, stop in zip(bounds, bounds[1:])]
+        for future in futures:
+            report.merge(future.result())
+    return report
+
+def write_report(report, out, output_format="jsonl"):
+    """Write the report's differences as JSON lines or CSV and return how many were written."""
+    if output_format not in REPORT_FORMATS:
+        raise ValueError(f"Unsupported output format '{output_format}'.")
+    if output_format == "jsonl":
+        for difference in report.differences:
+            out.write(json.dumps(difference, default=str))
+            out.write("\n")
+    else:
+        writer = csv.writer(out)
+        writer.writerow(REPORT_FIELDS)
+        writer.writerows(["" if difference[field] is None else difference[field]
+                          for field in REPORT_FIELDS] for difference in report.differences)
+    return len(report.differences)
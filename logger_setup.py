@@ -1,17 +1,128 @@
 # logger_setup.py
+"""
+Configures logging from environment variables:
+  LOG_LEVEL       root level (default INFO)
+  LOG_CONFIG      INI file for logging.config.fileConfig, e.g. logging.conf
+  LOG_FILE        write to this file instead of stderr (ignored with LOG_CONFIG)
+  LOG_FORMAT      'text' (default) or 'json', one JSON object per line
+  LOG_QUEUE       '1' hands records to a background thread that does the formatting and I/O
+  LOG_RATE_LIMIT  warnings and errors allowed per call site and interval (default 10, 0 = off)
+  LOG_RATE_INTERVAL  length of that interval in seconds (default 60)
+"""
 
+import atexit
+import json
 import os
 import logging
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener = None
+
+class JsonFormatter(logging.Formatter):
+    """Formats each record as a single-line JSON object."""
+    def format(self, record):
+        entry = {"time": self.formatTime(record), "level": record.levelname,
+                 "logger": record.name, "message": record.getMessage()}
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class RateLimitFilter(logging.Filter):
+    """
+    Lets at most 'limit' records of 'level' or above from the same call site through per
+    'interval' seconds. The first record let through afterwards says how many were dropped.
+    One filter may be shared by several handlers: each record is counted once, and the
+    other handlers reuse the decision stored on it.
+    """
+    def __init__(self, limit, interval=60.0, level=logging.WARNING):
+        super().__init__()
+        self.limit = limit
+        self.interval = interval
+        self.level = level
+        self._lock = threading.Lock()
+        # (pathname, lineno) -> [window start, records let through, records suppressed]
+        self._windows = {}
+
+    def filter(self, record):
+        if record.levelno < self.level:
+            return True
+        allowed = record.__dict__.get("rate_limit_allowed")
+        if allowed is None:
+            allowed = record.rate_limit_allowed = self._allow(record)
+        return allowed
+
+    def _allow(self, record):
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            window = self._windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                self._windows[key] = [now, 1, 0]
+                if window is not None and window[2]:
+                    record.msg = f"{record.msg} ({window[2]} similar messages suppressed)"
+                return True
+            if window[1] < self.limit:
+                window[1] += 1
+                return True
+            window[2] += 1
+            return False
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    Enqueues records untouched. Unlike QueueHandler, the message is not formatted on the
+    logging thread, so callers only pay for creating the record.
+    """
+    def prepare(self, record):
+        return record
+
+def stop_logging():
+    """Stop the background listener, if any, after it has written every queued record."""
+    global _listener  # pylint: disable=global-statement
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
 
 def setup_logging():
+    global _listener  # pylint: disable=global-statement
     log_level_str = os.getenv("LOG_LEVEL", "INFO").upper()
     log_level = getattr(logging, log_level_str, logging.INFO)
     root_logger = logging.getLogger()
 
+    # Flush and stop a listener left over from an earlier call before replacing handlers.
+    stop_logging()
     # Clear existing handlers if any
     if root_logger.hasHandlers():
         root_logger.handlers.clear()
 
-    log_format = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    logging.basicConfig(level=log_level, format=log_format)
+    config_file = os.getenv("LOG_CONFIG")
+    if config_file:
+        from logging.config import fileConfig  # pylint: disable=import-outside-toplevel
+        fileConfig(config_file, disable_existing_loggers=False)
+        if "LOG_LEVEL" in os.environ:
+            root_logger.setLevel(log_level)
+        else:
+            log_level_str = logging.getLevelName(root_logger.level)
+    else:
+        logging.basicConfig(level=log_level, format=LOG_FORMAT, filename=os.getenv("LOG_FILE"))
+
+    if os.getenv("LOG_FORMAT", "text").lower() == "json":
+        for handler in root_logger.handlers:
+            handler.setFormatter(JsonFormatter())
+    if os.getenv("LOG_QUEUE", "0") == "1":
+        records = queue.SimpleQueue()
+        _listener = QueueListener(records, *root_logger.handlers, respect_handler_level=True)
+        root_logger.handlers = [_DeferredQueueHandler(records)]
+        _listener.start()
+    rate_limit = int(os.getenv("LOG_RATE_LIMIT", "10"))
+    if rate_limit > 0:
+        rate_filter = RateLimitFilter(rate_limit, float(os.getenv("LOG_RATE_INTERVAL", "60")))
+        for handler in root_logger.handlers:
+            handler.addFilter(rate_filter)
     logging.info("Logging is configured with level: %s", log_level_str)
+
+atexit.register(stop_logging)
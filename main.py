@@ -5,37 +5,324 @@ Provides a human-friendly REPL interface to perform arithmetic operations,
 view and manage calculation history, and execute plugin commands.
 """
 
+import argparse
 import logging
 import os
+import sys
+from config import get_config
 from logger_setup import setup_logging
+from batch_mode import OUTPUT_FORMATS, parse_plugin_args, run_batch
 from app.command import CommandFactory
+from app.columnar_store import ColumnarHistory
+from app.expression import ExpressionCompiler
+from app.file_operands import execute_statistic, is_file_operand
+from app.history_journal import HistoryJournal
+from app.shared_journal import SharedJournal
+from app.history_archive import HistoryArchive
+from app.history_index import parse_query
 from app.history_manager import HistoryManager
+from app.metrics import Metrics, MetricsDumper
+from app.result_cache import ResultCache
 from plugin_manager import PluginManager
 
+HISTORY_FILE = os.path.join("data", "history.csv")
+COLUMNAR_HISTORY_FILE = os.path.join("data", "history.cols")
+JOURNAL_FILE = os.path.join("data", "history.journal")
+JOURNAL_DIR = os.path.join("data", "history.journal.d")
+ARCHIVE_DIR = os.path.join("data", "history_archive")
+
+def history_snapshot_path(migrate=True):
+    """
+    Return the snapshot path for HISTORY_FORMAT ('csv', the default, or 'columnar').
+    Switching to the columnar format imports the existing CSV history once; with
+    'migrate' False, the CSV is returned until that has happened.
+    """
+    if get_config("HISTORY_FORMAT", "csv").lower() != "columnar":
+        return HISTORY_FILE
+    if not os.path.exists(COLUMNAR_HISTORY_FILE) and os.path.exists(HISTORY_FILE):
+        if not migrate:
+            return HISTORY_FILE
+        ColumnarHistory.import_csv(HISTORY_FILE, COLUMNAR_HISTORY_FILE)
+    return COLUMNAR_HISTORY_FILE
+
+def create_journal():
+    """
+    Build the history journal. By default every process journals to its own segment
+    under JOURNAL_DIR, so several calculators can share one history; HISTORY_SHARED=0
+    keeps the single-process JOURNAL_FILE instead. Fsync batching and compaction are
+    tuned with HISTORY_FSYNC_EVERY, HISTORY_FSYNC_INTERVAL and HISTORY_COMPACT_THRESHOLD.
+    """
+    options = {
+        "fsync_every": int(get_config("HISTORY_FSYNC_EVERY", "100")),
+        "fsync_interval": float(get_config("HISTORY_FSYNC_INTERVAL", "1.0")),
+        "compact_threshold": int(get_config("HISTORY_COMPACT_THRESHOLD", "10000")),
+    }
+    if get_config("HISTORY_SHARED", "1") == "0":
+        return HistoryJournal(JOURNAL_FILE, **options)
+    # A journal left by an earlier single-process run is folded in once.
+    return SharedJournal(JOURNAL_DIR, legacy_path=JOURNAL_FILE, **options)
+
+def open_history(history_manager):
+    """
+    Load the history snapshot plus journal (see create_journal) and keep journaling
+    changes. With HISTORY_MAX_RECORDS set, older records are rolled over into segments
+    under HISTORY_ARCHIVE_DIR holding up to HISTORY_SEGMENT_RECORDS records each, or one
+    HISTORY_SEGMENT_PERIOD (hour/day/month).
+    """
+    journal = create_journal()
+    os.makedirs(os.path.dirname(HISTORY_FILE), exist_ok=True)
+    capacity = get_config("HISTORY_MAX_RECORDS")
+    if capacity:
+        archive = HistoryArchive(
+            get_config("HISTORY_ARCHIVE_DIR", ARCHIVE_DIR),
+            segment_records=int(get_config("HISTORY_SEGMENT_RECORDS", "100000")),
+            segment_period=get_config("HISTORY_SEGMENT_PERIOD") or None)
+        history_manager.set_retention(int(capacity), archive)
+    history_manager.open_journal(history_snapshot_path(), journal)
+
+def close_history(history_manager):
+    """
+    Flush the history on exit and return whether it was saved. If open_history failed,
+    nothing was journaled, so the history is saved as a new snapshot instead, unless a
+    snapshot exists: it failed to load, and overwriting it would lose its records.
+    """
+    if history_manager.journal is not None:
+        history_manager.close_journal()
+        return True
+    path = history_snapshot_path()
+    if os.path.exists(path):
+        logging.error("History was not saved: %s could not be loaded at startup.", path)
+        return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    history_manager.save_history(path)
+    return True
+
+def create_result_cache():
+    """Build the shared result cache from CALC_CACHE_SIZE and CALC_CACHE_POLICY."""
+    return ResultCache(maxsize=int(get_config("CALC_CACHE_SIZE", "256")),
+                       policy=get_config("CALC_CACHE_POLICY", "lru"))
+
+def create_metrics():
+    """
+    Build the REPL's metrics from CALC_METRICS ('0' disables timing). When
+    CALC_METRICS_FILE is set, the metrics are also written there every
+    CALC_METRICS_INTERVAL seconds (default 60) in CALC_METRICS_FORMAT: 'prometheus'
+    (the default) or 'json' (the default for a .json file).
+    Returns (metrics, dumper or None).
+    """
+    metrics = Metrics(enabled=get_config("CALC_METRICS", "1") != "0")
+    path = get_config("CALC_METRICS_FILE")
+    if not path or not metrics.enabled:
+        return metrics, None
+    output_format = get_config("CALC_METRICS_FORMAT",
+                               "json" if path.endswith(".json") else "prometheus")
+    dumper = MetricsDumper(metrics, path, float(get_config("CALC_METRICS_INTERVAL", "60")),
+                           output_format.lower())
+    return metrics, dumper.start()
+
+def create_plugin_manager(result_cache):
+    """
+    Build and load the plugin manager. When PLUGIN_WORKERS is set above 0, plugins run
+    in that many worker processes, each call limited to PLUGIN_TIMEOUT seconds if set.
+    """
+    workers = int(get_config("PLUGIN_WORKERS", "0"))
+    pool = None
+    if workers > 0:
+        from plugin_pool import PluginPool  # pylint: disable=import-outside-toplevel
+        timeout = get_config("PLUGIN_TIMEOUT")
+        pool = PluginPool("plugins", max_workers=workers,
+                          timeout=float(timeout) if timeout else None).start()
+    plugin_manager = PluginManager(plugin_dir="plugins", cache=result_cache, pool=pool)
+    plugin_manager.load_plugins()
+    return plugin_manager
+
+def parse_history_window(options, total):
+    """
+    Translate 'history' options into a (start, stop) record range:
+    ['tail', '20'] for the last records, or ['--page', 'N', '--size', 'K'] for a page.
+    """
+    if options and options[0].lower() == "tail":
+        if len(options) > 2:
+            raise ValueError("tail takes at most one count")
+        count = int(options[1]) if len(options) == 2 else 20
+        return max(0, total - count), total
+    page, size = 1, 20
+    pairs = dict(zip(options[::2], options[1::2]))
+    if len(options) % 2 or set(pairs) - {"--page", "--size"}:
+        raise ValueError("unrecognized options")
+    page = int(pairs.get("--page", page))
+    size = int(pairs.get("--size", size))
+    if page < 1 or size < 1:
+        raise ValueError("page and size must be positive")
+    return (page - 1) * size, page * size
+
+def batch(input_path, output_format="jsonl", output_path=None):
+    """
+    Run commands from 'input_path' ('-' for stdin) without the interactive prompt,
+    writing machine-readable results to 'output_path' (stdout by default).
+    History is loaded once before the run and journaled in bulk after it.
+    """
+    result_cache = create_result_cache()
+    command_factory = CommandFactory(cache=result_cache)
+    history_manager = HistoryManager.get_instance()
+    plugin_manager = create_plugin_manager(result_cache)
+    try:
+        open_history(history_manager)
+    except Exception as e:
+        logging.error("Failed to load history: %s", e)
+
+    newline = "" if output_format == "csv" else None
+    in_stream = sys.stdin if input_path == "-" else open(input_path, encoding="utf-8")
+    out_stream = (sys.stdout if output_path is None
+                  else open(output_path, "w", encoding="utf-8", newline=newline,
+                            buffering=1 << 20))
+    try:
+        run_batch(in_stream, out_stream, command_factory, plugin_manager, history_manager,
+                  output_format=output_format)
+    finally:
+        if in_stream is not sys.stdin:
+            in_stream.close()
+        if out_stream is not sys.stdout:
+            out_stream.close()
+        close_history(history_manager)
+        if plugin_manager.pool is not None:
+            plugin_manager.pool.shutdown()
+
+def replay(history_path=None, output_format="jsonl", output_path=None, workers=1,
+           tolerance=None):
+    """
+    Re-execute every recorded calculation, from the history file 'history_path' or the
+    calculator's own history, and write the records whose results differ to
+    'output_path' (stdout by default). The calculator's history is read without
+    continuing or compacting its journal. Returns the number of records that
+    mismatched or failed; skipped records are reported but not counted.
+    """
+    # Imported here so the REPL and batch mode do not pay for loading the replay engine.
+    from history_replay import (  # pylint: disable=import-outside-toplevel
+        DEFAULT_TOLERANCE, replay_history, write_report)
+    history_manager = HistoryManager()
+    if history_path:
+        history_manager.load_history(history_path)
+    elif os.path.exists(os.path.dirname(HISTORY_FILE)):
+        # Without a data directory there is no history, and nothing should be created.
+        history_manager.load_journaled(history_snapshot_path(migrate=False), create_journal())
+    report = replay_history(history_manager.history,
+                            DEFAULT_TOLERANCE if tolerance is None else tolerance,
+                            workers=workers, plugin_dir="plugins")
+    newline = "" if output_format == "csv" else None
+    out_stream = (sys.stdout if output_path is None
+                  else open(output_path, "w", encoding="utf-8", newline=newline))
+    try:
+        write_report(report, out_stream, output_format)
+    finally:
+        if out_stream is not sys.stdout:
+            out_stream.close()
+    print(report.format_summary(), file=sys.stderr)
+    totals = report.totals()
+    return totals["mismatch"] + totals["error"]
+
+def serve(host="127.0.0.1", port=8765):
+    """
+    Serve the calculator over TCP until interrupted (see server.py for the protocol).
+    Every client shares one history, journaled like the REPL's.
+    """
+    # Imported here so the REPL and batch mode do not pay for loading asyncio.
+    import asyncio  # pylint: disable=import-outside-toplevel
+    from server import CalculatorServer  # pylint: disable=import-outside-toplevel
+    result_cache = create_result_cache()
+    command_factory = CommandFactory(cache=result_cache)
+    history_manager = HistoryManager.get_instance()
+    plugin_manager = create_plugin_manager(result_cache)
+    open_history(history_manager)
+    calculator = CalculatorServer(command_factory, plugin_manager, history_manager)
+
+    async def run():
+        server = await calculator.start(host, port)
+        for sock in server.sockets:
+            print("Listening on {}:{}".format(*sock.getsockname()[:2]), flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        history_manager.close_journal()
+        if plugin_manager.pool is not None:
+            plugin_manager.pool.shutdown()
+
+def format_history_stats(rows):
+    """Render HistoryManager.stats() rows as a text table."""
+    if not rows:
+        return "No history available."
+    lines = [f"{'command':<12} {'count':>8} {'sum':>14} {'min':>12} {'max':>12} {'mean':>12}"]
+    for row in rows:
+        lines.append(f"{row['command']:<12} {row['count']:>8} " + " ".join(
+            f"{'-' if row[key] is None else format(row[key], '.6g'):>{width}}"
+            for key, width in (("sum", 14), ("min", 12), ("max", 12), ("mean", 12))))
+    return "\n".join(lines)
+
+def format_archive(archive, request):
+    """
+    Answer 'history archive [<segment> | where <query>]': list the archived segments,
+    show one segment, or search all of them.
+    """
+    if archive is None:
+        return "History archiving is off; set HISTORY_MAX_RECORDS to enable it."
+    try:
+        if request.lower().startswith("where"):
+            matches = archive.query(**parse_query(request[len("where"):]))
+            return matches.to_string() if not matches.empty else "No matching records."
+        if request:
+            return archive.load(request).to_string(index=True)
+    except (OSError, ValueError) as e:
+        return f"Archive error: {e}"
+    segments = archive.segments()
+    if not segments:
+        return "No archived history."
+    return "\n".join(f"{segment['name']}  {segment['rows']:>8} records  "
+                     f"{segment['first_timestamp']} .. {segment['last_timestamp']}"
+                     for segment in segments)
+
 def repl():
     logging.info("Starting the Advanced Python Calculator REPL.")
-    command_factory = CommandFactory()
+    result_cache = create_result_cache()
+    command_factory = CommandFactory(cache=result_cache)
     history_manager = HistoryManager.get_instance()
-    plugin_manager = PluginManager(plugin_dir="plugins")
-    plugin_manager.load_plugins()
+    plugin_manager = create_plugin_manager(result_cache)
+    metrics, metrics_dumper = create_metrics()
+    expressions = ExpressionCompiler(
+        command_factory, plugin_manager,
+        cache_size=int(get_config("CALC_EXPRESSION_CACHE_SIZE", "256")))
+    variables = {}
 
-    # Load history if available
-    history_file = os.path.join("data", "history.csv")
-    if os.path.exists(history_file):
-        try:
-            history_manager.load_history(history_file)
-            logging.info("Loaded history from %s", history_file)
-        except Exception as e:
-            logging.error("Failed to load history from %s: %s", history_file, e)
+    # Load history if available; every change is journaled from here on.
+    try:
+        open_history(history_manager)
+        logging.info("Loaded history from %s", history_manager.snapshot_path)
+    except Exception as e:
+        logging.error("Failed to load history: %s", e)
 
     welcome_msg = (
         "\nWelcome to the Advanced Python Calculator!\n"
         "Commands (separate multiple commands with a semicolon ';'):\n"
         "  add, subtract, multiply, divide <arg1> <arg2>\n"
+        "  mean, median, mode, variance <args> -- args may include @file.f64 or @file.csv:col\n"
+        "  eval <expression> -- evaluate e.g. (3 + 4) * sqrt(2) / mean(1, 2, 3)\n"
+        "  let <name> = <expression> -- store a variable for later expressions\n"
         "  history        -- show calculation history\n"
+        "  history where [command=<name>] [since=<date>] [until=<date>]\n"
+        "                [result<op><number>] [limit <n>]  -- filter history\n"
+        "  history --page <n> [--size <k>] | history tail [<n>]  -- show part of history\n"
+        "  history archive [<segment> | where ...]  -- list, show or search archived history\n"
+        "  history stats  -- count, sum, min, max and mean of the results per command\n"
         "  clear_history  -- clear history\n"
         "  edit_history   -- edit a history record\n"
         "  plugins        -- list plugin commands\n"
+        "  reload_plugins -- pick up added, changed or removed plugins\n"
+        "  cache [clear]  -- show result cache statistics, or clear the cache\n"
+        "  stats [reset]  -- show per-command counts and latencies, or reset them\n"
         "  help           -- show this message\n"
         "  exit           -- quit (history will be saved)\n"
     )
@@ -47,10 +334,14 @@ def repl():
             # Check if the user wants to exit.
             if user_input.lower() in ("exit", "quit"):
                 try:
-                    history_manager.save_history(history_file)
-                    print("History saved.")
+                    print("History saved." if close_history(history_manager)
+                          else "History was not saved.")
                 except Exception as e:
                     logging.error("Failed to save history: %s", e)
+                if plugin_manager.pool is not None:
+                    plugin_manager.pool.shutdown()
+                if metrics_dumper is not None:
+                    metrics_dumper.stop()
                 print("Thank you for using the calculator. Goodbye!")
                 break
 
@@ -64,10 +355,86 @@ def repl():
                 elif cmd_line.lower() == "history":
                     print(history_manager.get_history())
                     continue
+                elif cmd_line.lower().startswith("history where"):
+                    try:
+                        conditions = parse_query(cmd_line[len("history where"):])
+                        matches = history_manager.query(**conditions)
+                    except ValueError as e:
+                        print("Invalid history query:", e)
+                        continue
+                    print(matches.to_string() if not matches.empty else "No matching records.")
+                    continue
+                elif cmd_line.lower() == "history stats":
+                    print(format_history_stats(history_manager.stats()))
+                    continue
+                elif cmd_line.lower().startswith("history archive"):
+                    print(format_archive(history_manager.archive,
+                                         cmd_line[len("history archive"):].strip()))
+                    continue
+                elif cmd_line.lower().startswith("history "):
+                    try:
+                        start, stop = parse_history_window(cmd_line.split()[1:],
+                                                           history_manager.record_count())
+                    except ValueError as e:
+                        print("Usage: history --page <n> [--size <k>] | history tail [<n>]:", e)
+                        continue
+                    history_manager.write_history(sys.stdout, start, stop)
+                    continue
                 elif cmd_line.lower() == "clear_history":
                     history_manager.clear_history()
                     print("Calculation history cleared.")
                     continue
+                elif cmd_line.lower().startswith("eval "):
+                    try:
+                        with metrics.time("execute", "eval"):
+                            expression = expressions.compile(cmd_line[len("eval "):])
+                            result = expression(variables)
+                    except ValueError as e:
+                        print("Error:", e)
+                        continue
+                    history_manager.add_record("eval", expression.source, result)
+                    print("Result:", result)
+                    continue
+                elif cmd_line.lower().startswith("let "):
+                    name, _, source = cmd_line[len("let "):].partition("=")
+                    name = name.strip()
+                    if not name.isidentifier() or not source.strip():
+                        print("Usage: let <name> = <expression>")
+                        continue
+                    try:
+                        variables[name] = expressions.evaluate(source, variables)
+                    except ValueError as e:
+                        print("Error:", e)
+                        continue
+                    print(f"{name} =", variables[name])
+                    continue
+                elif cmd_line.lower() == "cache":
+                    print("Result cache:", result_cache.stats())
+                    print("Expression cache:", expressions.cache.stats())
+                    continue
+                elif cmd_line.lower() == "cache clear":
+                    result_cache.clear()
+                    expressions.cache.clear()
+                    print("Result cache cleared.")
+                    continue
+                elif cmd_line.lower() == "stats":
+                    print(metrics.format_table())
+                    continue
+                elif cmd_line.lower() == "stats reset":
+                    metrics.reset()
+                    print("Metrics reset.")
+                    continue
+                elif cmd_line.lower() == "reload_plugins":
+                    report = plugin_manager.reload_plugins()
+                    if any(report.values()):
+                        # Compiled expressions may have folded in results of old plugins.
+                        expressions.cache.clear()
+                        for change, names in report.items():
+                            if names:
+                                print(f"Plugins {change}:", ", ".join(names))
+                    else:
+                        print("Plugins are up to date.")
+                    continue
                 elif cmd_line.lower() == "plugins":
                     print("Available plugin commands:", plugin_manager.get_plugin_commands())
                     continue
@@ -88,12 +455,11 @@ def repl():
                         print("Arguments must be numbers.")
                         continue
 
-                    command = command_factory.create_command(new_command, new_args)
-                    if command is None:
+                    if new_command.lower() not in command_factory.commands:
                         print("Unknown command for editing.")
                         continue
                     try:
-                        new_result = command.execute()
+                        new_result = command_factory.execute_command(new_command, new_args)
                         history_manager.edit_record(record_index, new_command=new_command, new_arguments=new_args, new_result=new_result)
                         print("Record updated successfully.")
                     except Exception as e:
@@ -107,23 +473,46 @@ def repl():
                 if command_name in plugin_manager.get_plugin_commands():
                     args = parts[1:]
                     try:
-                        args = [float(arg) if arg.replace('.', '', 1).isdigit() else arg for arg in args]
+                        with metrics.time("parse", command_name):
+                            args = parse_plugin_args(args)
                     except Exception:
                         pass
-                    result = plugin_manager.execute_plugin(command_name, *args)
+                    with metrics.time("plugin", command_name):
+                        result = plugin_manager.execute_plugin(command_name, *args)
                     print(f"Plugin '{command_name}' result:", result)
                     continue
 
                 # Otherwise, treat as an arithmetic command.
+                # Unknown names share one label so typos cannot grow the metrics without bound.
+                label = (command_name.lower() if command_name.lower() in command_factory.commands
+                         else "unknown")
+                if any(is_file_operand(arg) for arg in parts[1:]):
+                    try:
+                        with metrics.time("execute", label):
+                            result = execute_statistic(command_name, parts[1:])
+                    except (OSError, ValueError) as e:
+                        print("Error:", e)
+                        continue
+                    history_manager.add_record(command_name, parts[1:], result)
+                    print("Result:", result)
+                    continue
+                args = None
                 try:
-                    args = list(map(float, parts[1:]))
+                    with metrics.time("parse", label):
+                        args = list(map(float, parts[1:]))
+                        if label != "unknown":
+                            operation = command_factory.resolve(command_name, len(args))
                 except Exception as e:
+                    if args is not None:
+                        # A wrong argument count is reported like any other command error.
+                        raise
                     print("Error converting arguments to numbers:", e)
                     continue
-                command = command_factory.create_command(command_name, args)
-                if command:
-                    result = command.execute()
-                    history_manager.add_record(command_name, args, result)
+                if label != "unknown":
+                    with metrics.time("execute", label):
+                        result = command_factory.execute_operation(operation, args)
+                    with metrics.time("history", label):
+                        history_manager.add_record(command_name, args, result)
                     print("Result:", result)
                 else:
                     print("Unknown command. Type 'help' for available commands.")
@@ -131,6 +520,43 @@ def repl():
             logging.error("Error processing command: %s", e)
             print("Oops! There was an error:", e)
 
-if __name__ == "__main__":
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Advanced Python Calculator")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="run commands from FILE ('-' for stdin) non-interactively")
+    parser.add_argument("--replay", nargs="?", const="", metavar="HISTORY",
+                        help="re-execute the recorded history (or the HISTORY file) and "
+                             "report the records whose results differ")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="replay worker processes (default: 1)")
+    parser.add_argument("--tolerance", type=float,
+                        help="relative difference a replayed result may have (default: 1e-9)")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="jsonl",
+                        help="batch and replay output format (default: jsonl)")
+    parser.add_argument("--output", metavar="FILE",
+                        help="batch or replay output file (default: stdout)")
+    parser.add_argument("--serve", action="store_true",
+                        help="serve the calculator over TCP instead of starting the REPL")
+    parser.add_argument("--host", default="127.0.0.1", help="server address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="server port, 0 for any free port (default: 8765)")
+    options = parser.parse_args(argv)
+
     setup_logging()
-    repl()
+    if options.serve:
+        serve(options.host, options.port)
+        return
+    if options.replay is not None:
+        if replay(options.replay, options.format, options.output, options.workers,
+                  options.tolerance):
+            sys.exit(1)
+        return
+    if options.batch is None and not sys.stdin.isatty():
+        options.batch = "-"
+    if options.batch is not None:
+        batch(options.batch, options.format, options.output)
+    else:
+        repl()
+
+if __name__ == "__main__":
+    main()
@@ -2,43 +2,272 @@
 Module: plugin_manager
 Manages the dynamic loading and execution of calculator plugins.
 Plugins should be placed in the specified directory and implement a register() function.
+
+Plugins are discovered without being imported whenever their register() function simply
+returns a dictionary literal with a constant "name": the name is read from the source,
+a lazy stub is registered, and the module is only imported on its first call.
+Discovery results are cached in __pycache__/plugin_manifest.json, keyed on each file's
+mtime and size, so unchanged plugins are not parsed again.
+reload_plugins() repeats discovery at runtime and re-imports only the files whose
+content hash changed.
 """
 
+import ast
+import functools
+import hashlib
+import json
 import os
 import importlib.util
 import logging
+from threading import Lock
+
+MANIFEST_VERSION = 2
+
+def read_plugin_metadata(plugin_path, source=None):
+    """
+    Statically inspect a plugin file (or its already-read 'source' bytes).
+    Returns {"name": ..., "deterministic": ...} when register() returns a dictionary
+    literal with a constant name, {} when the module defines no register at all, and
+    None when the plugin has to be imported to find out.
+    """
+    if source is None:
+        with open(plugin_path, "rb") as f:
+            source = f.read()
+    try:
+        tree = ast.parse(source, filename=plugin_path)
+    except SyntaxError:
+        return None
+    register = None
+    for node in tree.body:
+        if isinstance(node, ast.FunctionDef) and node.name == "register":
+            register = node
+        elif isinstance(node, (ast.Assign, ast.AnnAssign, ast.AugAssign, ast.Import,
+                               ast.ImportFrom, ast.ClassDef, ast.AsyncFunctionDef)):
+            if "register" in _bound_names(node):
+                return None
+    if register is None:
+        return {}
+    returns = [node for node in ast.walk(register) if isinstance(node, ast.Return)]
+    if len(returns) != 1 or not isinstance(returns[0].value, ast.Dict):
+        return None
+    metadata = {"deterministic": True}
+    for key, value in zip(returns[0].value.keys, returns[0].value.values):
+        if not isinstance(key, ast.Constant) or key.value not in ("name", "deterministic"):
+            continue
+        if not isinstance(value, ast.Constant):
+            return None
+        metadata[key.value] = value.value
+    if not isinstance(metadata.get("name"), str):
+        return None
+    metadata["deterministic"] = bool(metadata["deterministic"])
+    return metadata
+
+def _bound_names(node):
+    if isinstance(node, (ast.Import, ast.ImportFrom)):
+        return {(alias.asname or alias.name).split(".")[0] for alias in node.names}
+    if isinstance(node, (ast.ClassDef, ast.AsyncFunctionDef)):
+        return {node.name}
+    targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+    return {name.id for target in targets for name in ast.walk(target)
+            if isinstance(name, ast.Name)}
+
+class LazyPlugin:
+    """Stands in for a plugin function until the plugin's module is first needed."""
+    def __init__(self, manager, name, filename):
+        self.manager = manager
+        self.name = name
+        self.filename = filename
+
+    def __call__(self, *args):
+        return self.manager._resolve(self)(*args)
 
 class PluginManager:
     """
     Loads plugins from a given directory. Each plugin must define a register() function
-    that returns a dictionary with keys "name" and "function".
+    that returns a dictionary with keys "name" and "function", and optionally
+    "deterministic": False to keep its results out of the result cache.
+    With a PluginPool (see plugin_pool.py), plugin calls run in worker processes.
     """
-    def __init__(self, plugin_dir):
+    def __init__(self, plugin_dir, cache=None, pool=None):
         self.plugin_dir = plugin_dir
         self.plugins = {}
+        self.cache = cache
+        self.pool = pool
+        self.nondeterministic = set()
+        self._import_lock = Lock()
+        # filename -> manifest entry plus the plugin names it registered
+        self._files = {}
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.plugin_dir, "__pycache__", "plugin_manifest.json")
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            return {}
+        return manifest.get("files", {})
+
+    def _write_manifest(self, files):
+        try:
+            os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+            tmp_path = f"{self.manifest_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": MANIFEST_VERSION, "files": files}, f)
+            os.replace(tmp_path, self.manifest_path)
+        except OSError as e:
+            logging.debug("Could not write plugin manifest %s: %s", self.manifest_path, e)
+
+    def _scan(self):
+        """Return {filename: manifest entry} for every plugin file, parsing only changed ones."""
+        cached = self._read_manifest()
+        files = {}
+        for filename in os.listdir(self.plugin_dir):
+            if not filename.endswith(".py"):
+                continue
+            plugin_path = os.path.join(self.plugin_dir, filename)
+            stat = os.stat(plugin_path)
+            entry = cached.get(filename)
+            if (entry is None or entry["mtime_ns"] != stat.st_mtime_ns
+                    or entry["size"] != stat.st_size):
+                with open(plugin_path, "rb") as f:
+                    source = f.read()
+                digest = hashlib.sha256(source).hexdigest()
+                if entry is not None and entry["sha256"] == digest:
+                    metadata = entry["metadata"]
+                else:
+                    metadata = read_plugin_metadata(plugin_path, source)
+                entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size,
+                         "sha256": digest, "metadata": metadata}
+            files[filename] = entry
+        if files != cached:
+            self._write_manifest(files)
+        return files
+
+    def _import_plugin(self, filename):
+        """Import a plugin file and return its register() result, or None on failure."""
+        plugin_path = os.path.join(self.plugin_dir, filename)
+        plugin_name = filename[:-3]
+        spec = importlib.util.spec_from_file_location(plugin_name, plugin_path)
+        module = importlib.util.module_from_spec(spec)
+        try:
+            # Compiled from the source rather than through the loader: __pycache__
+            # bytecode is validated only by whole-second mtime and size, so a quick
+            # same-size edit would otherwise keep running the old code.
+            with open(plugin_path, "rb") as f:
+                source = f.read()
+            exec(compile(source, plugin_path, "exec"), module.__dict__)  # pylint: disable=exec-used
+            if hasattr(module, "register"):
+                plugin_info = module.register()
+                if "name" not in plugin_info or "function" not in plugin_info:
+                    raise ValueError("register() must return 'name' and 'function'")
+                return plugin_info
+        except Exception as e:
+            logging.error("Error loading plugin %s: %s", plugin_name, e)
+        return None
+
+    def _register_file(self, filename, entry, plugins, nondeterministic):
+        """
+        Register the plugin defined in 'filename' into 'plugins', as a lazy stub when its
+        metadata is static. Returns the list of plugin names it registered.
+        """
+        metadata = entry["metadata"]
+        if metadata == {}:
+            return []
+        if metadata is None:
+            plugin_info = self._import_plugin(filename)
+            if plugin_info is None:
+                return []
+            name = plugin_info["name"]
+            plugins[name] = plugin_info["function"]
+            deterministic = plugin_info.get("deterministic", True)
+            logging.info("Loaded plugin: %s", name)
+        else:
+            name = metadata["name"]
+            plugins[name] = LazyPlugin(self, name, filename)
+            deterministic = metadata["deterministic"]
+            logging.info("Discovered plugin: %s", name)
+        if deterministic:
+            nondeterministic.discard(name)
+        else:
+            nondeterministic.add(name)
+        return [name]
 
     def load_plugins(self):
         """
-        Load all Python plugins from the plugin directory.
+        Discover all Python plugins in the plugin directory.
+        Plugins with static metadata are registered as lazy stubs; the rest are imported.
         """
         if not os.path.exists(self.plugin_dir):
             logging.info("Plugin directory '%s' does not exist.", self.plugin_dir)
             return
 
-        for filename in os.listdir(self.plugin_dir):
-            if filename.endswith(".py"):
-                plugin_path = os.path.join(self.plugin_dir, filename)
-                plugin_name = filename[:-3]
-                spec = importlib.util.spec_from_file_location(plugin_name, plugin_path)
-                module = importlib.util.module_from_spec(spec)
-                try:
-                    spec.loader.exec_module(module)
-                    if hasattr(module, "register"):
-                        plugin_info = module.register()
-                        self.plugins[plugin_info["name"]] = plugin_info["function"]
-                        logging.info("Loaded plugin: %s", plugin_info["name"])
-                except Exception as e:
-                    logging.error("Error loading plugin %s: %s", plugin_name, e)
+        for filename, entry in self._scan().items():
+            names = self._register_file(filename, entry, self.plugins, self.nondeterministic)
+            self._files[filename] = dict(entry, names=names)
+
+    def reload_plugins(self):
+        """
+        Pick up added, changed and removed plugin files without restarting.
+        Only files whose content hash changed are re-imported. The new plugin table is
+        built on the side and swapped in with a single assignment, so commands already
+        running keep the function they started with.
+        Returns {"added": [...], "changed": [...], "removed": [...]} plugin names.
+        """
+        report = {"added": [], "changed": [], "removed": []}
+        current = self._scan() if os.path.exists(self.plugin_dir) else {}
+        plugins = dict(self.plugins)
+        nondeterministic = set(self.nondeterministic)
+        files = {}
+        with self._import_lock:
+            for filename, old in self._files.items():
+                if filename not in current:
+                    for name in old["names"]:
+                        plugins.pop(name, None)
+                        nondeterministic.discard(name)
+                        report["removed"].append(name)
+            for filename, entry in current.items():
+                old = self._files.get(filename)
+                if old is not None and old["sha256"] == entry["sha256"]:
+                    files[filename] = dict(entry, names=old["names"])
+                    continue
+                old_names = old["names"] if old is not None else []
+                for name in old_names:
+                    plugins.pop(name, None)
+                    nondeterministic.discard(name)
+                names = self._register_file(filename, entry, plugins, nondeterministic)
+                files[filename] = dict(entry, names=names)
+                report["changed"].extend(name for name in names if name in old_names)
+                report["added"].extend(name for name in names if name not in old_names)
+                report["removed"].extend(name for name in old_names if name not in names)
+            self.plugins = plugins
+            self.nondeterministic = nondeterministic
+            self._files = files
+        if self.cache is not None:
+            for name in report["changed"] + report["removed"]:
+                self.cache.invalidate("plugin", name)
+        if self.pool is not None and any(report.values()):
+            self.pool.restart()
+        if any(report.values()):
+            logging.info("Reloaded plugins: %s", report)
+        return report
+
+    def _resolve(self, stub):
+        """Import the module behind a lazy stub and swap its real function in."""
+        with self._import_lock:
+            current = self.plugins.get(stub.name)
+            if current is not None and current is not stub:
+                return current
+            plugin_info = self._import_plugin(stub.filename)
+            if plugin_info is None or plugin_info["name"] != stub.name:
+                raise ValueError(f"Plugin '{stub.name}' could not be loaded from {stub.filename}.")
+            self.plugins[stub.name] = plugin_info["function"]
+            logging.info("Loaded plugin: %s", stub.name)
+            return plugin_info["function"]
 
     def get_plugin_commands(self):
         """Return a list of available plugin command names."""
@@ -50,6 +279,13 @@ class PluginManager:
         Raises a ValueError if the plugin is not found.
         """
         if name in self.plugins:
-            return self.plugins[name](*args)
+            if self.pool is not None:
+                function = functools.partial(self.pool.execute, name)
+            else:
+                function = self.plugins[name]
+            if self.cache is None or name in self.nondeterministic:
+                return function(*args)
+            key = self.cache.make_key("plugin", name, args)
+            return self.cache.get_or_compute(key, lambda: function(*args))
         else:
             raise ValueError(f"Plugin '{name}' not found.")
@@ -0,0 +1,162 @@
+"""
+Module: plugin_pool
+Runs plugin functions in a pool of worker processes.
+Each worker loads the plugin directory once at startup, so calls only ship the plugin
+name and arguments. A slow, hung or crashing plugin cannot block or take down the
+calling process: calls can time out, and a broken pool is replaced automatically.
+"""
+
+import logging
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+from threading import Lock, Thread
+from plugin_manager import LazyPlugin, PluginManager
+
+_worker_plugins = None
+
+def _init_worker(plugin_dir):
+    """Load and import every plugin once per worker process."""
+    global _worker_plugins  # pylint: disable=global-statement
+    _worker_plugins = PluginManager(plugin_dir)
+    _worker_plugins.load_plugins()
+    for name, function in list(_worker_plugins.plugins.items()):
+        if isinstance(function, LazyPlugin):
+            try:
+                _worker_plugins._resolve(function)
+            except ValueError as e:
+                logging.error("Worker could not preload plugin %s: %s", name, e)
+
+def _run_plugin(name, args):
+    return _worker_plugins.execute_plugin(name, *args)
+
+def _ping():
+    return True
+
+class PluginPool:
+    """
+    A warm pool of worker processes executing plugins from 'plugin_dir'.
+    'timeout' is the default per-call limit in seconds (None waits forever).
+    Replacing the workers never disturbs calls already running in the old ones: they
+    finish there before the old workers are stopped.
+    """
+    def __init__(self, plugin_dir, max_workers=None, timeout=None):
+        self.plugin_dir = plugin_dir
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self._executor = None
+        self._lock = Lock()
+        # executor -> its calls that have not finished yet
+        self._running = {}
+
+    def start(self):
+        """Start the workers and wait until each has loaded the plugins."""
+        with self._lock:
+            self._start()
+        return self
+
+    def _start(self):
+        if self._executor is None:
+            executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                           initializer=_init_worker,
+                                           initargs=(self.plugin_dir,))
+            workers = executor._max_workers  # pylint: disable=protected-access
+            for future in [executor.submit(_ping) for _ in range(workers)]:
+                future.result()
+            self._executor = executor
+            self._running[executor] = set()
+        return self._executor
+
+    def _submit(self, name, args):
+        with self._lock:
+            executor = self._start()
+            future = executor.submit(_run_plugin, name, args)
+            running = self._running[executor]
+            running.add(future)
+        future.add_done_callback(running.discard)
+        return executor, future
+
+    def execute(self, name, *args, timeout=None):
+        """
+        Run plugin 'name' in a worker and return its result.
+        Exceptions raised by the plugin are re-raised here. Raises TimeoutError if the
+        call takes longer than the timeout, and RuntimeError if the worker died.
+        """
+        executor, future = self._submit(name, args)
+        return self._result(name, executor, future,
+                            self.timeout if timeout is None else timeout)
+
+    def map(self, name, args_list, timeout=None):
+        """
+        Run plugin 'name' once per argument tuple in 'args_list', spread across all workers.
+        Returns the results in order; the first failure is raised.
+        """
+        calls = [self._submit(name, tuple(args)) for args in args_list]
+        timeout = self.timeout if timeout is None else timeout
+        return [self._result(name, executor, future, timeout) for executor, future in calls]
+
+    def _result(self, name, executor, future, timeout):
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            logging.error("Plugin '%s' timed out after %ss; replacing workers.", name, timeout)
+            # Other calls in those workers may run up to the pool's own limit.
+            self._retire(executor, hung=future, grace=max(timeout, self.timeout or 0))
+            raise TimeoutError(f"Plugin '{name}' timed out after {timeout} seconds.") from None
+        except BrokenProcessPool:
+            logging.error("A worker died while running plugin '%s'; replacing workers.", name)
+            self._retire(executor)
+            raise RuntimeError(f"Plugin '{name}' crashed its worker process.") from None
+
+    def restart(self):
+        """
+        Replace the workers, e.g. after plugins were reloaded. New calls go to fresh
+        workers; calls already submitted finish in the old ones, which then exit.
+        """
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            self._retire(executor)
+        self.start()
+
+    def _retire(self, executor, hung=None, grace=None):
+        """
+        Stop sending calls to 'executor'. If a call in it hung, its other calls get
+        'grace' seconds to finish before its workers are terminated.
+        Does nothing if 'executor' was already replaced, so calls failing together
+        replace the workers only once.
+        """
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            running = self._running.pop(executor)
+        if hung is None:
+            executor.shutdown(wait=False)
+            return
+        others = [future for future in list(running) if future is not hung]
+        Thread(target=self._terminate_after, args=(executor, others, grace),
+               daemon=True).start()
+
+    @staticmethod
+    def _terminate_after(executor, futures, grace):
+        wait(futures, timeout=grace)
+        _terminate(executor)
+
+    def shutdown(self, force=False):
+        """Stop the workers. With force=True, busy workers are terminated immediately."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._running.pop(executor, None)
+        if executor is None:
+            return
+        if force:
+            _terminate(executor)
+        else:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+def _terminate(executor):
+    # A hung plugin never returns, so its worker has to be killed outright.
+    processes = executor._processes or {}  # pylint: disable=protected-access
+    for process in list(processes.values()):
+        process.terminate()
+    executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,116 @@
+"""
+Module: server
+Serves the calculator to many clients over a TCP line protocol using asyncio.
+
+Each request is one line in the REPL's '<command> <arg1> <arg2> ...' form; each response
+is one JSON line {"id", "command", "result", "error"}, where "id" counts the requests on
+that connection; a NaN or infinite result is sent as null with an error. Clients may
+pipeline: several requests can be sent without waiting, and responses always come back
+in request order.
+
+Arithmetic and statistical commands run on the event loop thread, which is also the
+only thread that touches the shared HistoryManager. Plugin calls may block, so they are
+offloaded to an executor; the ResultCache they share with the loop thread is locked.
+"""
+
+import asyncio
+import functools
+import logging
+from batch_mode import parse_plugin_args, to_json_line
+
+PIPELINE_DEPTH = 1024
+
+class CalculatorServer:
+    """Dispatches protocol lines to a CommandFactory and PluginManager."""
+    def __init__(self, command_factory, plugin_manager, history_manager=None, executor=None):
+        self.command_factory = command_factory
+        self.plugin_manager = plugin_manager
+        self.history_manager = history_manager
+        self.executor = executor
+        self.requests = 0
+
+    async def execute(self, line):
+        """Run one command line and return its (result, error) pair."""
+        parts = line.split()
+        if not parts:
+            return None, "Empty command."
+        command_name, raw_args = parts[0], parts[1:]
+        try:
+            if (self.plugin_manager is not None
+                    and command_name in self.plugin_manager.plugins):
+                call = functools.partial(self.plugin_manager.execute_plugin, command_name,
+                                         *parse_plugin_args(raw_args))
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(self.executor, call), None
+            args = list(map(float, raw_args))
+            result = self.command_factory.execute_command(command_name, args)
+            if self.history_manager is not None:
+                self.history_manager.add_record(command_name, args, result)
+            return result, None
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            return None, str(e)
+
+    async def handle_client(self, reader, writer):
+        """Read pipelined requests and write their responses in order."""
+        pending = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+        responder = asyncio.create_task(self._respond(pending, writer))
+        requests = asyncio.create_task(self._read_requests(reader, pending))
+        try:
+            await asyncio.wait({requests, responder}, return_when=asyncio.FIRST_COMPLETED)
+            # If the responder stopped first, the client is gone: stop reading, since
+            # nobody would take requests off a full queue again.
+            if not responder.done():
+                await requests
+                closing = asyncio.ensure_future(pending.put(None))
+                await asyncio.wait({closing, responder}, return_when=asyncio.FIRST_COMPLETED)
+                closing.cancel()
+                await responder
+        finally:
+            requests.cancel()
+            responder.cancel()
+            while not pending.empty():
+                item = pending.get_nowait()
+                if item is not None:
+                    item[2].cancel()
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_requests(self, reader, pending):
+        request_id = 0
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            line = line.decode("utf-8", errors="replace").strip()
+            if not line:
+                continue
+            request_id += 1
+            task = asyncio.ensure_future(self.execute(line))
+            await pending.put((request_id, line.split(None, 1)[0], task))
+
+    async def _respond(self, pending, writer):
+        while True:
+            item = await pending.get()
+            if item is None:
+                return
+            request_id, command_name, task = item
+            result, error = await task
+            self.requests += 1
+            response = {"id": request_id, "command": command_name, "result": result,
+                        "error": error}
+            writer.write(to_json_line(response).encode("utf-8") + b"\n")
+            if pending.empty() or writer.transport.get_write_buffer_size() > 1 << 16:
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    return
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """Start listening and return the asyncio Server."""
+        server = await asyncio.start_server(self.handle_client, host, port)
+        for sock in server.sockets:
+            logging.info("Calculator server listening on %s:%s", *sock.getsockname()[:2])
+        return server
@@ -0,0 +1,80 @@
+import math
+import random
+import statistics
+import numpy as np
+import pytest
+
+from app.accumulators import MeanVarianceAccumulator, MedianAccumulator, ModeAccumulator
+
+def test_mean_variance_chunks_match_statistics():
+    values = [random.Random(1).uniform(-100, 100) for _ in range(1000)]
+    acc = MeanVarianceAccumulator()
+    acc.update(values[:300])
+    acc.update(np.array(values[300:700]))
+    for value in values[700:]:
+        acc.add(value)
+    assert acc.count == 1000
+    assert math.isclose(acc.mean, statistics.mean(values), rel_tol=1e-9)
+    assert math.isclose(acc.variance, statistics.variance(values), rel_tol=1e-9)
+
+def test_mean_variance_merge():
+    left = MeanVarianceAccumulator()
+    right = MeanVarianceAccumulator()
+    left.update([1, 2, 3])
+    right.update([4, 5])
+    left.merge(right)
+    assert left.mean == 3
+    assert math.isclose(left.variance, statistics.variance([1, 2, 3, 4, 5]))
+
+def test_mean_variance_empty_errors():
+    acc = MeanVarianceAccumulator()
+    with pytest.raises(ValueError):
+        _ = acc.mean
+    acc.add(1.0)
+    with pytest.raises(ValueError):
+        _ = acc.variance
+
+def test_mode_first_seen_wins_ties():
+    acc = ModeAccumulator()
+    acc.update([5, 1, 1, 5])
+    assert acc.mode == statistics.mode([5, 1, 1, 5])
+    other = ModeAccumulator()
+    other.update(np.array([1.0]))
+    acc.merge(other)
+    assert acc.mode == 1
+    assert acc.count == 5
+
+def test_mode_empty_errors():
+    with pytest.raises(ValueError):
+        _ = ModeAccumulator().mode
+
+def test_median_exact_even_and_odd():
+    acc = MedianAccumulator()
+    acc.update([4, 8, 10])
+    assert acc.median == 8
+    acc.add(1)
+    assert acc.median == statistics.median([4, 8, 10, 1])
+    assert acc.exact
+
+def test_median_merge_exact():
+    left = MedianAccumulator()
+    right = MedianAccumulator()
+    left.update([1, 2, 3])
+    right.update([100, 200])
+    right.add(300)
+    left.merge(right)
+    assert left.median == statistics.median([1, 2, 3, 100, 200, 300])
+
+def test_median_sketch_is_bounded_and_close():
+    values = np.random.default_rng(0).permutation(100_000).astype(float)
+    acc = MedianAccumulator(sketch_size=512, seed=0)
+    for chunk in np.array_split(values, 50):
+        acc.update(chunk)
+    assert not acc.exact
+    assert acc.count == values.size
+    assert sum(chunk.size for level in acc._levels for chunk in level) < 512 * 20
+    assert abs(acc.median - np.median(values)) < 0.02 * values.size
+
+def test_median_empty_errors():
+    with pytest.raises(ValueError):
+        _ = MedianAccumulator().median
@@ -0,0 +1,101 @@
+import io
+import json
+import logging
+import pytest
+
+import main
+from app.command import CommandFactory
+from app.history_manager import HistoryManager
+from batch_mode import iter_command_lines, run_batch
+from plugin_manager import PluginManager
+
+def test_iter_command_lines_splits_and_skips():
+    stream = io.StringIO("add 1 2; multiply 2 3\n\n# comment\nsqrt 9\n")
+    assert list(iter_command_lines(stream)) == [
+        (1, "add 1 2"), (1, "multiply 2 3"), (4, "sqrt 9")
+    ]
+
+def test_run_batch_jsonl_records_history():
+    hm = HistoryManager()
+    out = io.StringIO()
+    count = run_batch(io.StringIO("add 1 2\ndivide 1 0\nbogus 1\n"), out,
+                      CommandFactory(), history_manager=hm)
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert count == 3
+    assert rows[0]["result"] == 3 and rows[0]["error"] is None
+    assert rows[1]["error"] == "Division by zero is not allowed."
+    assert "Unknown command" in rows[2]["error"]
+    assert list(hm.history["command"]) == ["add"]
+
+def _strict(constant):
+    raise ValueError(f"{constant} is not valid JSON")
+
+def test_run_batch_jsonl_writes_non_finite_results_as_errors(tmp_path):
+    (tmp_path / "nans.py").write_text(
+        "def register():\n    return {'name': 'nans', 'function': lambda: [float('nan')]}\n")
+    pm = PluginManager(str(tmp_path))
+    pm.load_plugins()
+    out = io.StringIO()
+    run_batch(io.StringIO("multiply 1e308 10\nnans\n"), out, CommandFactory(), pm)
+    rows = [json.loads(line, parse_constant=_strict) for line in out.getvalue().splitlines()]
+    assert rows[0]["result"] is None and rows[0]["error"] == "Result inf is not a finite number."
+    assert rows[1]["result"] is None and "not finite" in rows[1]["error"]
+
+def test_run_batch_csv_with_plugin(tmp_path):
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    (plugin_dir / "double.py").write_text(
+        "def register():\n    return {'name': 'double', 'function': lambda x: x * 2}\n"
+    )
+    pm = PluginManager(plugin_dir=str(plugin_dir))
+    pm.load_plugins()
+    out = io.StringIO()
+    run_batch(io.StringIO("double 4\n"), out, CommandFactory(), pm, output_format="csv")
+    lines = out.getvalue().splitlines()
+    assert lines[0] == "line,command,args,result,error"
+    assert lines[1] == "1,double,4,8.0,"
+
+def test_run_batch_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        run_batch(io.StringIO(""), io.StringIO(), CommandFactory(), output_format="xml")
+
+def test_run_batch_logs_each_command_at_debug(caplog):
+    caplog.set_level(logging.DEBUG)
+    run_batch(io.StringIO("add 1 2\ndivide 1 0\n"), io.StringIO(), CommandFactory())
+    messages = [record.getMessage() for record in caplog.records]
+    assert "Line 1: add 1 2 -> 3.0" in messages
+    assert "Line 2: divide 1 0 -> Division by zero is not allowed." in messages
+
+def _failing_open(history_manager):
+    raise ValueError("corrupt history")
+
+@pytest.fixture
+def broken_history(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(HistoryManager, "_instance", None)
+    monkeypatch.setattr(main, "open_history", _failing_open)
+    (tmp_path / "commands.txt").write_text("add 1 2\n")
+    return tmp_path
+
+def test_batch_saves_history_when_journal_failed_to_open(broken_history):
+    main.batch("commands.txt", output_path="out.jsonl")
+    lines = (broken_history / "data" / "history.csv").read_text().splitlines()
+    assert [line.split(",")[0] for line in lines] == ["command", "add"]
+
+def test_unloadable_history_is_not_overwritten(broken_history, monkeypatch, capsys, caplog):
+    (broken_history / "data").mkdir()
+    (broken_history / "data" / "history.csv").write_text("not, a, history\n")
+    main.batch("commands.txt", output_path="out.jsonl")
+    assert "could not be loaded" in caplog.text
+    inputs = iter(["add 1 2", "exit"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(inputs))
+    main.repl()
+    assert "History was not saved." in capsys.readouterr().out
+    assert (broken_history / "data" / "history.csv").read_text() == "not, a, history\n"
+
+def test_history_window_options():
+    assert main.parse_history_window(["--page", "2", "--size", "2"], 5) == (2, 4)
+    assert main.parse_history_window(["tail", "1"], 5) == (4, 5)
+    assert main.parse_history_window([], 50) == (0, 20)
+    with pytest.raises(ValueError):
+        main.parse_history_window(["--page", "0"], 5)
@@ -0,0 +1,32 @@
+import json
+
+from benchmarks import suite
+
+def _run(seconds):
+    return {"meta": {}, "results": {name: {"seconds_per_op": value, "ops_per_second": 1 / value,
+                                           "relative": value * 10}
+                                    for name, value in seconds.items()}}
+
+def test_compare_flags_only_slowdowns_beyond_threshold():
+    baseline = _run({"a": 1.0, "b": 1.0, "gone": 1.0})
+    current = _run({"a": 1.2, "b": 2.0, "new": 1.0})
+    rows, regressions = suite.compare(current, baseline, threshold=0.5)
+    assert [row[0] for row in rows] == ["a", "b"]
+    assert [row[0] for row in regressions] == ["b"]
+
+def test_main_writes_results_and_fails_on_regression(tmp_path):
+    output = tmp_path / "results.json"
+    baseline = tmp_path / "baseline.json"
+    assert suite.main(["--quick", "--filter", "calculator.add", "--baseline", str(baseline),
+                       "--update-baseline", "--output", str(output)]) == 0
+    results = json.loads(output.read_text())
+    assert list(results["results"]) == ["calculator.add"]
+    stored = json.loads(baseline.read_text())
+    stored["results"]["calculator.add"]["relative"] /= 100
+    baseline.write_text(json.dumps(stored))
+    assert suite.main(["--quick", "--filter", "calculator.add",
+                       "--baseline", str(baseline)]) == 1
+
+def test_load_benchmark_runs_on_its_own():
+    results = suite.run_suite(quick=True, name_filter="history.load_history[csv,1000]")
+    assert list(results["results"]) == ["history.load_history[csv,1000]"]
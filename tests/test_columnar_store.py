@@ -0,0 +1,72 @@
+import pandas as pd
+
+from app.columnar_store import ColumnarHistory, is_columnar_path
+from app.history_journal import HistoryJournal
+from app.history_manager import HistoryManager
+
+def make_manager():
+    hm = HistoryManager()
+    hm.add_record("add", [1.0, 2.0], 3.0)
+    hm.add_record("divide", [9.0, 3.0], 3.0)
+    hm.add_record("add", [5.0, 5.0], 10.0)
+    return hm
+
+def test_is_columnar_path():
+    assert is_columnar_path("data/history.cols")
+    assert is_columnar_path("data/history.cols/")
+    assert not is_columnar_path("data/history.csv")
+
+def test_round_trip_through_columnar_store(tmp_path):
+    hm = make_manager()
+    path = tmp_path / "history.cols"
+    hm.save_history(path)
+    store = ColumnarHistory(path)
+    assert len(store) == 3
+    assert store.commands == ["add", "divide"]
+    assert list(store.results) == [3.0, 3.0, 10.0]
+    assert store.arguments(1, 3) == ["[9.0, 3.0]", "[5.0, 5.0]"]
+    pd.testing.assert_frame_equal(store.to_dataframe(), hm.history, check_dtype=False)
+
+def test_load_is_lazy_until_history_is_read(tmp_path):
+    path = tmp_path / "history.cols"
+    make_manager().save_history(path)
+    hm = HistoryManager()
+    hm.load_history(path)
+    assert hm._store is not None
+    hm.add_record("sqrt", [16.0], 4.0)
+    assert hm._store is not None
+    assert list(hm.history["command"]) == ["add", "divide", "add", "sqrt"]
+    assert hm._store is None
+
+def test_csv_import_and_export(tmp_path):
+    csv_path = tmp_path / "history.csv"
+    make_manager().save_history(csv_path)
+    store = ColumnarHistory.import_csv(csv_path, tmp_path / "history.cols")
+    exported = tmp_path / "exported.csv"
+    store.export_csv(exported)
+    assert exported.read_text() == csv_path.read_text()
+
+def test_empty_store(tmp_path):
+    path = tmp_path / "history.cols"
+    HistoryManager().save_history(path)
+    store = ColumnarHistory(path)
+    assert len(store) == 0
+    assert store.last_timestamp() is None
+    assert store.to_dataframe().empty
+
+def test_journal_on_columnar_snapshot(tmp_path):
+    path = str(tmp_path / "history.cols")
+    make_manager().save_history(path)
+    hm = HistoryManager()
+    hm.open_journal(path, HistoryJournal(str(tmp_path / "history.journal"), compact_threshold=2))
+    assert hm._store is not None
+    hm.add_record("multiply", [2.0, 2.0], 4.0)
+    hm.add_record("multiply", [3.0, 3.0], 9.0)
+    hm.close_journal()
+    assert len(ColumnarHistory(path)) == 5
+
+def test_interrupted_swap_recovers_old_store(tmp_path):
+    path = tmp_path / "history.cols"
+    make_manager().save_history(path)
+    path.rename(tmp_path / "history.cols.old")
+    assert len(ColumnarHistory(path)) == 3
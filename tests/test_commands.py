@@ -1,5 +1,6 @@
 import math
 import statistics
+import numpy as np
 import pytest
 
 from app.command import CommandFactory, Command
@@ -148,3 +149,99 @@ def test_dummy_command_abstract():
             return "dummy_result"
     dummy = DummyCommand([])
     assert dummy.execute() == "dummy_result"
+
+# Tests for vectorized batch execution
+
+def test_execute_batch_add():
+    factory = CommandFactory()
+    result = factory.execute_batch("add", [1, 2, 3], [10, 20, 30])
+    assert list(result.values) == [11, 22, 33]
+    assert result.error_count == 0
+
+def test_execute_batch_divide_masks_zero():
+    factory = CommandFactory()
+    result = factory.execute_batch("divide", [10, 5, 8], [2, 0, 4])
+    assert result.values[0] == 5
+    assert math.isnan(result.values[1])
+    assert result.values[2] == 2
+    assert list(result.mask) == [False, True, False]
+    assert result.error_report() == [(1, "Division by zero is not allowed.")]
+
+def test_execute_batch_sqrt_negative():
+    factory = CommandFactory()
+    result = factory.execute_batch("SQRT", [4, -1, 9])
+    assert result.values[0] == 2 and result.values[2] == 3
+    assert result.error_report() == [(1, "Cannot take square root of a negative number.")]
+
+def test_execute_batch_broadcasts_scalar():
+    factory = CommandFactory()
+    result = factory.execute_batch("multiply", [1, 2, 3], 2)
+    assert list(result.values) == [2, 4, 6]
+
+def test_execute_batch_wrong_arity():
+    factory = CommandFactory()
+    with pytest.raises(ValueError):
+        factory.execute_batch("add", [1, 2])
+
+def test_execute_batch_unsupported_command():
+    factory = CommandFactory()
+    with pytest.raises(ValueError):
+        factory.execute_batch("mean", [1, 2])
+
+@pytest.mark.parametrize("name", ["mean", "median", "mode", "variance"])
+@pytest.mark.parametrize("width", [2, 3, 9, 130])
+def test_execute_batch_rows_matches_scalar_commands(name, width):
+    factory = CommandFactory()
+    rng = np.random.default_rng(width)
+    rows = rng.integers(-3, 4, (50, width)) * 10.0 ** rng.integers(-4, 6, (50, 1))
+    rows[rng.random(rows.shape) < 0.2] += 0.1
+    result = factory.execute_batch_rows(name, rows)
+    # Exactly equal, not approximately: replay compares against the scalar results.
+    assert result.values.tolist() == [factory.execute_command(name, row)
+                                      for row in rows.tolist()]
+
+def test_execute_batch_rows_mode_ties_and_nan():
+    factory = CommandFactory()
+    result = factory.execute_batch_rows("mode", [[2, 1, 1, 2], [np.nan, 3, 3, 3]])
+    assert result.values.tolist() == [2.0, 3.0]
+    assert math.isnan(factory.execute_batch_rows("mode", [[np.nan, np.nan]]).values[0])
+
+def test_execute_batch_rows_rejects_short_rows():
+    factory = CommandFactory()
+    with pytest.raises(ValueError, match="VarianceCommand requires at least 2 arguments."):
+        factory.execute_batch_rows("variance", [[1.0], [2.0]])
+    with pytest.raises(ValueError):
+        factory.execute_batch_rows("add", [[1.0, 2.0]])
+
+def test_resolve_returns_shared_operations():
+    factory = CommandFactory()
+    operation = factory.resolve("ADD", 2)
+    assert operation is CommandFactory().resolve("add")
+    assert factory.execute_operation(operation, [2.0, 3.0]) == 5.0
+    assert not hasattr(operation, "__dict__")
+
+@pytest.mark.parametrize("name, count, message", [
+    ("add", 1, "AddCommand requires exactly 2 arguments."),
+    ("sqrt", 2, "SqrtCommand requires exactly 1 argument."),
+    ("mean", 0, "MeanCommand requires at least 1 argument."),
+    ("variance", 1, "VarianceCommand requires at least 2 arguments."),
+])
+def test_resolve_checks_arity_like_commands(name, count, message):
+    with pytest.raises(ValueError, match=message):
+        CommandFactory().resolve(name, count)
+    with pytest.raises(ValueError, match=message):
+        CommandFactory().create_command(name, [1.0] * count).execute()
+
+def test_resolve_wraps_custom_command_classes():
+    class CubeCommand(Command):
+        def __init__(self, args):
+            self.args = args
+
+        def execute(self):
+            return self.args[0] ** 3
+
+    factory = CommandFactory()
+    factory.commands["add"] = CubeCommand
+    assert factory.execute_command("add", [2.0]) == 8.0
+    with pytest.raises(ValueError, match="Unknown command"):
+        factory.resolve("cube")
@@ -0,0 +1,74 @@
+import math
+import pytest
+
+from app.command import CommandFactory
+from app.expression import ExpressionCompiler
+from plugin_manager import PluginManager
+
+@pytest.fixture
+def compiler():
+    return ExpressionCompiler(CommandFactory())
+
+def test_evaluates_operators_and_commands(compiler):
+    result = compiler.evaluate("(3 + 4) * sqrt(2) / mean(1, 2, 3)")
+    assert result == pytest.approx(7 * math.sqrt(2) / 2)
+    assert compiler.evaluate("-add(1, 2) + +4") == 1
+
+def test_compiled_expression_is_reused_with_new_variables(compiler):
+    expression = compiler.compile("x * 2 + median(x, y, 10)")
+    assert expression.variables == {"x", "y"}
+    assert expression({"x": 1, "y": 3}) == 5
+    assert expression({"x": 4, "y": 0}) == 12
+    assert compiler.compile("  x * 2 + median(x, y, 10) ") is expression
+    assert compiler.cache.stats()["hits"] == 1
+
+def test_constant_subexpressions_are_folded():
+    calls = []
+    factory = CommandFactory()
+    original = factory.execute_operation
+    factory.execute_operation = lambda op, args: calls.append(op.name) or original(op, args)
+    expression = ExpressionCompiler(factory).compile("x + sqrt(16) * mean(2, 4)")
+    assert calls == ["sqrt", "mean"]
+    assert expression({"x": 1}) == 13
+    assert calls == ["sqrt", "mean"]
+
+@pytest.mark.parametrize("source, message", [
+    ("1 / 0", "Division by zero"),
+    ("2 ** 3", "Unsupported operator"),
+    ("__import__('os')", "Unknown function"),
+    ("x.y", "Unsupported expression element"),
+    ("'a' + 1", "Unsupported constant"),
+    ("1 +", "Invalid expression"),
+    ("y * 2", "Undefined variable 'y'"),
+])
+def test_invalid_expressions_raise_value_error(compiler, source, message):
+    with pytest.raises(ValueError, match=message):
+        compiler.evaluate(source)
+
+def test_plugins_and_nondeterministic_plugins(tmp_path):
+    (tmp_path / "double.py").write_text(
+        "def register():\n    return {'name': 'double', 'function': lambda x: x * 2}\n")
+    (tmp_path / "tick.py").write_text(
+        "import itertools\ncounter = itertools.count()\n"
+        "def register():\n"
+        "    return {'name': 'tick', 'function': lambda: next(counter), 'deterministic': False}\n")
+    pm = PluginManager(str(tmp_path))
+    pm.load_plugins()
+    compiler = ExpressionCompiler(CommandFactory(), pm)
+    assert compiler.evaluate("double(3) + 1") == 7
+    expression = compiler.compile("tick() + 0")
+    assert [expression(), expression()] == [0, 1]
+
+def test_call_failing_while_folding_fails_when_evaluated(tmp_path):
+    (tmp_path / "inverse.py").write_text(
+        "def register():\n    return {'name': 'inverse', 'function': lambda x: 1 / x}\n")
+    pm = PluginManager(str(tmp_path))
+    pm.load_plugins()
+    expression = ExpressionCompiler(CommandFactory(), pm).compile("inverse(0) + x")
+    assert expression.variables == {"x"}
+    with pytest.raises(ZeroDivisionError):
+        expression({"x": 1})
+
+def test_arity_is_checked_at_compile_time(compiler):
+    with pytest.raises(ValueError, match="AddCommand requires exactly 2 arguments"):
+        compiler.compile("x + add(x)")
@@ -0,0 +1,99 @@
+import io
+import json
+import math
+import statistics
+import numpy as np
+import pytest
+
+from app.command import CommandFactory
+from app.file_operands import execute_statistic, iter_file_values, parse_file_operand
+from app.history_manager import HistoryManager
+from batch_mode import run_batch
+
+VALUES = [3.5, 1.0, 4.0, 1.0, 5.5, 9.0, 2.0, 6.0]
+
+def test_parse_file_operand():
+    assert parse_file_operand("@data.f64") == ("data.f64", None)
+    assert parse_file_operand("@values.csv:col2") == ("values.csv", "col2")
+    assert parse_file_operand("@C:\\data\\x.f64") == ("C:\\data\\x.f64", None)
+    with pytest.raises(ValueError):
+        parse_file_operand("data.f64")
+
+def test_binary_chunks(tmp_path):
+    path = tmp_path / "data.f64"
+    np.array(VALUES, dtype="<f8").tofile(path)
+    chunks = list(iter_file_values(str(path), chunk_size=3))
+    assert [chunk.size for chunk in chunks] == [3, 3, 2]
+    assert np.concatenate(chunks).tolist() == VALUES
+
+def test_float32_and_npy(tmp_path):
+    np.array(VALUES, dtype="<f4").tofile(tmp_path / "data.f32")
+    np.save(tmp_path / "data.npy", np.array(VALUES).reshape(2, 4))
+    for name in ("data.f32", "data.npy"):
+        assert np.concatenate(list(iter_file_values(str(tmp_path / name)))).tolist() == VALUES
+
+def test_binary_size_mismatch(tmp_path):
+    path = tmp_path / "data.f64"
+    path.write_bytes(b"\0" * 12)
+    with pytest.raises(ValueError):
+        list(iter_file_values(str(path)))
+
+def test_statistics_over_binary_file(tmp_path):
+    path = tmp_path / "data.f64"
+    np.array(VALUES, dtype="<f8").tofile(path)
+    operand = f"@{path}"
+    assert math.isclose(execute_statistic("mean", [operand], chunk_size=3),
+                        statistics.mean(VALUES))
+    assert math.isclose(execute_statistic("variance", [operand], chunk_size=3),
+                        statistics.variance(VALUES))
+    assert execute_statistic("median", [operand], chunk_size=3) == statistics.median(VALUES)
+    assert execute_statistic("mode", [operand], chunk_size=3) == 1.0
+    assert execute_statistic("mean", [operand, "20"]) == statistics.mean(VALUES + [20.0])
+
+def test_csv_columns(tmp_path):
+    path = tmp_path / "values.csv"
+    path.write_text("id,value\n1,10\n2,\n3,30\n", encoding="utf-8")
+    assert execute_statistic("mean", [f"@{path}:value"]) == 20
+    assert execute_statistic("mean", [f"@{path}:col2"]) == 20
+    assert execute_statistic("mean", [f"@{path}:2"]) == 20
+    assert execute_statistic("median", [f"@{path}"]) == 2
+    with pytest.raises(ValueError, match="not found"):
+        execute_statistic("mean", [f"@{path}:missing"])
+    with pytest.raises(ValueError, match="no column 3"):
+        execute_statistic("mean", [f"@{path}:3"])
+
+def test_csv_without_header_in_chunks(tmp_path):
+    path = tmp_path / "values.csv"
+    path.write_text("".join(f"{value},x\n" for value in VALUES), encoding="utf-8")
+    chunks = list(iter_file_values(str(path), chunk_size=3))
+    assert len(chunks) == 3
+    assert execute_statistic("variance", [f"@{path}"]) == pytest.approx(
+        statistics.variance(VALUES))
+    with pytest.raises(ValueError, match="non-numeric"):
+        execute_statistic("mean", [f"@{path}:2"])
+
+def test_median_sketch_bounds_large_files(tmp_path):
+    data = np.random.default_rng(7).normal(0.0, 1.0, 100_000)
+    path = tmp_path / "data.f64"
+    data.tofile(path)
+    median = execute_statistic("median", [f"@{path}"], chunk_size=10_000,
+                               median_sketch_size=4_000)
+    assert abs(median - np.median(data)) < 0.05
+
+def test_rejects_other_commands_and_missing_files(tmp_path):
+    with pytest.raises(ValueError, match="only supported"):
+        execute_statistic("add", ["@data.f64"])
+    with pytest.raises(OSError):
+        execute_statistic("mean", [f"@{tmp_path / 'missing.f64'}"])
+
+def test_batch_mode_file_operands(tmp_path):
+    path = tmp_path / "data.f64"
+    np.array(VALUES, dtype="<f8").tofile(path)
+    hm = HistoryManager()
+    out = io.StringIO()
+    run_batch(io.StringIO(f"mean @{path}\nadd @{path} 1\n"), out, CommandFactory(),
+              history_manager=hm)
+    rows = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert rows[0]["result"] == statistics.mean(VALUES)
+    assert "only supported" in rows[1]["error"]
+    assert list(hm.history["arguments"]) == [str([f"@{path}"])]
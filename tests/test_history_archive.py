@@ -0,0 +1,146 @@
+import math
+import pytest
+
+from app.history_archive import HistoryArchive
+from app.history_journal import HistoryJournal
+from app.history_manager import HistoryManager
+
+def rows(*records):
+    return {column: [record[i] for record in records]
+            for i, column in enumerate(("command", "arguments", "result", "timestamp"))}
+
+def test_segments_roll_over_by_size(tmp_path):
+    archive = HistoryArchive(str(tmp_path), segment_records=2)
+    archive.append(rows(*[("add", "[1, 2]", float(i), f"2025-01-01 00:00:0{i}") for i in range(3)]))
+    archive.append(rows(("sqrt", "[9]", 3.0, "2025-01-01 00:00:09")))
+    assert archive.segment_names() == ["segment-000001.csv", "segment-000002.csv"]
+    assert [segment["rows"] for segment in archive.segments()] == [2, 2]
+    assert list(archive.load("segment-000002.csv")["command"]) == ["add", "sqrt"]
+
+def test_segments_roll_over_by_period(tmp_path):
+    archive = HistoryArchive(str(tmp_path), segment_period="day")
+    archive.append(rows(("add", "[]", 1.0, "2025-01-01 23:59:59"),
+                        ("add", "[]", 2.0, "2025-01-02 00:00:01")))
+    # A new archive object picks up the current segment from disk.
+    HistoryArchive(str(tmp_path), segment_period="day").append(
+        rows(("add", "[]", 3.0, "2025-01-02 08:00:00")))
+    assert [(segment["rows"], segment["first_timestamp"][:10])
+            for segment in archive.segments()] == [(1, "2025-01-01"), (2, "2025-01-02")]
+
+def test_archive_query_and_nan_results(tmp_path):
+    archive = HistoryArchive(str(tmp_path), segment_records=2)
+    archive.append(rows(("add", "[]", 1.0, "2025-01-01"), ("divide", "[]", math.nan, "2025-01-02"),
+                        ("divide", "[]", 8.0, "2025-01-03")))
+    matches = archive.query(command="divide")
+    assert list(matches.index) == [("segment-000001.csv", 1), ("segment-000002.csv", 0)]
+    assert math.isnan(matches["result"].iloc[0])
+    assert len(archive.query(result_min=0, limit=1)) == 1
+    with pytest.raises(ValueError):
+        archive.load("../history.csv")
+    with pytest.raises(ValueError):
+        HistoryArchive(str(tmp_path), segment_period="week")
+
+def test_retention_evicts_in_batches(tmp_path):
+    archive = HistoryArchive(str(tmp_path / "archive"))
+    hm = HistoryManager()
+    hm.set_retention(16, archive)
+    for i in range(18):
+        hm.add_record("add", [i], float(i))
+    # 16 + 16 // 8 records are allowed before anything is evicted.
+    assert hm.record_count() == 18
+    hm.add_record("add", [18], 18.0)
+    assert hm.record_count() == 16
+    assert list(hm.history["result"])[0] == 3.0
+    assert list(archive.load("segment-000001.csv")["result"]) == [0.0, 1.0, 2.0]
+    # Queries only see the records still in memory.
+    assert len(hm.query(command="add")) == 16
+
+def test_retention_after_dataframe_is_materialized(tmp_path):
+    archive = HistoryArchive(str(tmp_path))
+    hm = HistoryManager()
+    hm.add_records(("add", [i], float(i)) for i in range(10))
+    assert len(hm.history) == 10
+    hm.set_retention(4, archive)
+    assert list(hm.history["result"]) == [6.0, 7.0, 8.0, 9.0]
+    assert list(hm.history.index) == [0, 1, 2, 3]
+    assert archive.segments()[0]["rows"] == 6
+
+def test_retention_without_archive_drops_records():
+    hm = HistoryManager()
+    hm.set_retention(2)
+    hm.add_records(("add", [i], float(i)) for i in range(5))
+    assert list(hm.history["result"]) == [3.0, 4.0]
+    with pytest.raises(ValueError):
+        hm.set_retention(0)
+
+def test_evictions_replay_from_journal(tmp_path):
+    def open_manager():
+        hm = HistoryManager()
+        hm.set_retention(4, HistoryArchive(str(tmp_path / "archive")))
+        hm.open_journal(str(tmp_path / "history.csv"),
+                        HistoryJournal(str(tmp_path / "history.journal")))
+        return hm
+
+    hm = open_manager()
+    for i in range(10):
+        hm.add_record("add", [i], float(i))
+    hm.edit_record(0, new_result=100.0)
+    # Crash without a snapshot: the journal replays adds, evictions and the edit.
+    hm.journal.sync()
+    reloaded = open_manager()
+    assert list(reloaded.history["result"]) == list(hm.history["result"])
+    assert reloaded.history["result"].iloc[0] == 100.0
+    archived = reloaded.archive.query()
+    assert list(archived["result"]) == [float(i) for i in range(10 - hm.record_count())]
+    reloaded.close_journal()
+
+def test_crash_between_archiving_and_journaling_the_eviction(tmp_path, monkeypatch):
+    def open_manager():
+        hm = HistoryManager()
+        hm.set_retention(8, HistoryArchive(str(tmp_path / "archive")))
+        hm.open_journal(str(tmp_path / "history.csv"),
+                        HistoryJournal(str(tmp_path / "history.journal")))
+        return hm
+
+    hm = open_manager()
+    for i in range(9):
+        hm.add_record("add", [i], float(i))
+    hm.journal.sync()
+
+    def crash(entries):
+        raise OSError("power lost")
+
+    # The tenth record evicts two; they reach the archive, but the journal never
+    # learns of the eviction.
+    monkeypatch.setattr(hm.journal, "append_many", crash)
+    with pytest.raises(OSError):
+        hm.add_record("add", [9], 9.0)
+    assert [record[2] for record in hm.archive.read("segment-000001.csv")] == [0.0, 1.0]
+    reloaded = open_manager()
+    assert reloaded.record_count() == 9
+    reloaded.add_record("add", [9], 9.0)
+    # The same two records were evicted again, but archived only once.
+    assert [record[2] for record in reloaded.archive.read("segment-000001.csv")] == [0.0, 1.0]
+    assert reloaded.history["result"].iloc[0] == 2.0
+    reloaded.add_records(("add", [i], float(i)) for i in (10, 11))
+    assert [record[2] for record in reloaded.archive.read("segment-000001.csv")] == [
+        0.0, 1.0, 2.0, 3.0]
+    reloaded.close_journal()
+
+def test_repeated_append_skips_records_already_written(tmp_path):
+    batch = rows(("add", "[1]", 1.0, "2025-01-01 00:00:01"),
+                 ("add", "[2]", 2.0, "2025-01-01 00:00:02"))
+    HistoryArchive(str(tmp_path), segment_records=1).append(batch)
+    longer = rows(("add", "[1]", 1.0, "2025-01-01 00:00:01"),
+                  ("add", "[2]", 2.0, "2025-01-01 00:00:02"),
+                  ("add", "[3]", 3.0, "2025-01-01 00:00:03"))
+    archive = HistoryArchive(str(tmp_path), segment_records=1)
+    archive.append(longer)
+    assert [segment["rows"] for segment in archive.segments()] == [1, 1, 1]
+    # Interrupted again: the next attempt still resumes from the same batch.
+    archive.append(rows(*[("add", f"[{i}]", float(i), f"2025-01-01 00:00:0{i}")
+                          for i in range(1, 5)]))
+    assert [record[2] for name in archive.segment_names()
+            for record in archive.read(name)] == [1.0, 2.0, 3.0, 4.0]
+    archive.append(rows(("add", "[5]", 5.0, "2025-01-01 00:00:05")))
+    assert len(archive.segments()) == 5
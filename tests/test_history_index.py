@@ -0,0 +1,159 @@
+import math
+import random
+import pytest
+
+from app.history_index import HistoryAggregates, HistoryIndex, parse_query
+from app.history_manager import HistoryManager
+
+def build_index():
+    index = HistoryIndex()
+    index.add(("add", "[1, 2]", 3.0, "2025-03-10 10:00:00.000000"))
+    index.add(("divide", "[500, 2]", 250.0, "2025-03-11 09:00:00.000000"))
+    index.add(("divide", "[9, 3]", 3.0, "2025-03-11 12:00:00.000000"))
+    index.add(("multiply", "[20, 10]", 200.0, "2025-03-12 08:00:00.000000"))
+    return index
+
+def rows(matches):
+    return [row for row, _ in matches]
+
+def test_query_by_command_time_and_result():
+    index = build_index()
+    assert rows(index.query(command="divide")) == [1, 2]
+    assert rows(index.query(since="2025-03-11", until="2025-03-12")) == [1, 2]
+    assert rows(index.query(result_min=100, min_inclusive=False)) == [1, 3]
+    assert rows(index.query(command="divide", since="2025-03-11", result_min=100)) == [1]
+    assert rows(index.query(result_min=3, result_max=3)) == [0, 2]
+    assert rows(index.query(limit=2)) == [0, 1]
+    assert not index.query(command="sqrt")
+
+def test_edit_updates_indexes():
+    index = build_index()
+    index.edit(0, {"command": "divide", "result": 1000.0,
+                   "timestamp": "2025-03-13 00:00:00.000000"})
+    assert rows(index.query(command="divide")) == [0, 1, 2]
+    assert not index.query(command="add")
+    assert rows(index.query(result_min=500)) == [0]
+    assert rows(index.query(since="2025-03-13")) == [0]
+    assert rows(index.query(until="2025-03-11")) == []
+
+def test_out_of_order_results_are_merged():
+    index = HistoryIndex()
+    for i, result in enumerate([5.0, 1.0, 4.0, 2.0, 3.0] * 30):
+        index.add(("add", "[]", result, f"2025-03-11 00:00:{i:02d}.000000"))
+    assert len(index.query(result_max=2.0)) == 60
+    assert index.by_result.keys == sorted(index.by_result.keys)
+
+def test_parse_query():
+    assert parse_query("command=divide since=2025-03-11 result>100 limit 50") == {
+        "command": "divide", "since": "2025-03-11", "result_min": 100.0,
+        "min_inclusive": False, "limit": 50,
+    }
+    assert parse_query("result<=5") == {"result_max": 5.0, "max_inclusive": True}
+    assert parse_query("result=3") == {"result_min": 3.0, "min_inclusive": True,
+                                       "result_max": 3.0, "max_inclusive": True}
+    with pytest.raises(ValueError):
+        parse_query("colour=red")
+    with pytest.raises(ValueError):
+        parse_query("command>add")
+
+def test_history_manager_query_tracks_changes():
+    hm = HistoryManager()
+    hm.add_record("add", [1, 2], 3)
+    hm.add_record("divide", [500, 2], 250)
+    assert list(hm.query(result_min=100).index) == [1]
+    hm.add_record("multiply", [20, 10], 200)
+    hm.edit_record(0, new_result=150)
+    assert list(hm.query(result_min=100).index) == [0, 1, 2]
+    assert list(hm.query(command="multiply")["result"]) == [200]
+    hm.clear_history()
+    assert hm.query(result_min=100).empty
+
+def test_aggregates_track_adds_edits_and_removals():
+    aggregates = HistoryAggregates.from_columns(["add", "add", "divide", "sqrt"],
+                                                [3.0, 4.0, float("nan"), 3.0])
+    summary = {row["command"]: row for row in aggregates.summary()}
+    assert summary["add"] == {"command": "add", "count": 2, "sum": 7.0, "min": 3.0,
+                              "max": 4.0, "mean": 3.5}
+    assert summary["divide"]["count"] == 1 and summary["divide"]["mean"] is None
+    aggregates.remove("add", 4.0)
+    aggregates.add("add", -1.0)
+    aggregates.remove("sqrt", 3.0)
+    summary = {row["command"]: row for row in aggregates.summary()}
+    assert (summary["add"]["min"], summary["add"]["max"]) == (-1.0, 3.0)
+    assert summary["add"]["sum"] == 2.0
+    assert "sqrt" not in summary
+
+def test_aggregates_retract_min_and_max_many_times():
+    rng = random.Random(3)
+    values = [rng.uniform(-1e6, 1e6) for _ in range(2000)]
+    aggregates = HistoryAggregates()
+    for value in values:
+        aggregates.add("add", value)
+    for value in values[:1500]:
+        aggregates.remove("add", value)
+    (row,) = aggregates.summary()
+    live = values[1500:]
+    assert row["count"] == 500
+    assert (row["min"], row["max"]) == (min(live), max(live))
+    assert math.isclose(row["sum"], math.fsum(live), rel_tol=1e-12, abs_tol=1e-6)
+
+def test_aggregates_recover_from_infinite_and_overflowing_results():
+    aggregates = HistoryAggregates()
+    aggregates.add("multiply", 2.0)
+    aggregates.add("multiply", math.inf)
+    (row,) = aggregates.summary()
+    assert row["sum"] == math.inf and row["max"] == math.inf
+    aggregates.add("multiply", -math.inf)
+    assert math.isnan(aggregates.summary()[0]["sum"])
+    aggregates.remove("multiply", math.inf)
+    aggregates.remove("multiply", -math.inf)
+    assert aggregates.summary()[0]["sum"] == 2.0
+    # Finite results whose sum overflows.
+    aggregates.add("multiply", 1e308)
+    aggregates.add("multiply", 1e308)
+    (row,) = aggregates.summary()
+    assert row["sum"] == math.inf and math.isclose(row["mean"], 1e308 / 3 * 2)
+    aggregates.remove("multiply", 1e308)
+    (row,) = aggregates.summary()
+    assert (row["sum"], row["mean"]) == (1e308 + 2.0, (1e308 + 2.0) / 2)
+    loaded = HistoryAggregates.from_columns(["multiply"] * 3, [1e308, 1e308, math.inf])
+    assert loaded.summary()[0]["sum"] == math.inf
+
+def test_manager_stats_after_editing_an_infinite_result():
+    hm = HistoryManager()
+    hm.add_record("multiply", [1e308, 10], 1e308 * 10)
+    hm.add_record("multiply", [2, 3], 6.0)
+    hm.stats()
+    hm.edit_record(0, new_result=5.0)
+    (row,) = hm.stats()
+    assert (row["sum"], row["mean"]) == (11.0, 5.5)
+
+def test_manager_stats_follow_changes(tmp_path):
+    hm = HistoryManager()
+    hm.add_record("add", [1, 2], 3.0)
+    assert hm.stats() == [{"command": "add", "count": 1, "sum": 3.0, "min": 3.0, "max": 3.0,
+                           "mean": 3.0}]
+    hm.add_record("multiply", [2, 5], 10.0)
+    hm.add_record("add", [2, 2], 4.0)
+    hm.edit_record(0, new_command="multiply", new_result=6.0)
+    assert [(row["command"], row["count"], row["sum"]) for row in hm.stats()] == [
+        ("add", 1, 4.0), ("multiply", 2, 16.0)]
+    # Edits on a materialized DataFrame are retracted the same way.
+    assert len(hm.history) == 3
+    hm.edit_record(2, new_result=1.0)
+    assert hm.stats()[0]["max"] == 1.0
+    path = tmp_path / "history.csv"
+    hm.save_history(str(path))
+    hm.clear_history()
+    assert hm.stats() == []
+    hm.load_history(str(path))
+    assert [(row["command"], row["sum"]) for row in hm.stats()] == [
+        ("add", 1.0), ("multiply", 16.0)]
+
+def test_manager_stats_exclude_evicted_records():
+    hm = HistoryManager()
+    hm.stats()
+    hm.set_retention(2)
+    hm.add_records(("add", [i], float(i)) for i in range(5))
+    assert hm.stats() == [{"command": "add", "count": 2, "sum": 7.0, "min": 3.0, "max": 4.0,
+                           "mean": 3.5}]
@@ -0,0 +1,84 @@
+import json
+import threading
+
+from app.history_journal import HistoryJournal
+from app.history_manager import HistoryManager
+
+def open_manager(tmp_path, **options):
+    hm = HistoryManager()
+    journal = HistoryJournal(str(tmp_path / "history.journal"), **options)
+    hm.open_journal(str(tmp_path / "history.csv"), journal)
+    return hm
+
+def test_changes_survive_without_save(tmp_path):
+    hm = open_manager(tmp_path)
+    hm.add_record("add", [1, 2], 3)
+    hm.add_record("multiply", [2, 3], 6)
+    hm.edit_record(0, new_result=4)
+    # Simulate a crash: the journal is never closed and no snapshot is written.
+    hm.journal.sync()
+    reloaded = open_manager(tmp_path)
+    assert list(reloaded.history["command"]) == ["add", "multiply"]
+    assert list(reloaded.history["result"]) == [4, 6]
+    assert not (tmp_path / "history.csv").exists()
+
+def test_clear_is_journaled(tmp_path):
+    hm = open_manager(tmp_path)
+    hm.add_record("add", [1, 2], 3)
+    hm.clear_history()
+    hm.add_record("sqrt", [9], 3)
+    hm.close_journal()
+    reloaded = open_manager(tmp_path)
+    assert list(reloaded.history["command"]) == ["sqrt"]
+
+def test_compaction_writes_snapshot_and_resets_journal(tmp_path):
+    hm = open_manager(tmp_path, compact_threshold=3)
+    for i in range(4):
+        hm.add_record("add", [i, i], 2 * i)
+    assert (tmp_path / "history.csv").exists()
+    assert hm.journal.entries == 1
+    hm.close_journal()
+    reloaded = open_manager(tmp_path)
+    assert list(reloaded.history["result"]) == [0, 2, 4, 6]
+
+def test_torn_last_line_is_ignored(tmp_path):
+    hm = open_manager(tmp_path)
+    hm.add_record("add", [1, 2], 3)
+    hm.close_journal()
+    with open(tmp_path / "history.journal", "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "rec')
+    reloaded = open_manager(tmp_path)
+    reloaded.add_record("add", [2, 2], 4)
+    reloaded.close_journal()
+    again = open_manager(tmp_path)
+    assert list(again.history["result"]) == [3, 4]
+
+def test_stale_journal_after_interrupted_compaction(tmp_path):
+    hm = open_manager(tmp_path)
+    hm.add_record("add", [1, 2], 3)
+    hm.journal.sync()
+    # The snapshot was replaced but the journal was not rewritten yet.
+    hm.save_history(str(tmp_path / "history.csv"))
+    reloaded = open_manager(tmp_path)
+    assert len(reloaded.history) == 1
+    with open(tmp_path / "history.journal", encoding="utf-8") as f:
+        checkpoint = json.loads(f.readline())
+    assert checkpoint["snapshot"]["rows"] == 1
+
+def test_concurrent_writers_journal_every_record(tmp_path):
+    hm = open_manager(tmp_path, compact_threshold=1000)
+
+    def write(worker):
+        for i in range(300):
+            hm.add_record("add", [worker, i], worker + i)
+
+    workers = [threading.Thread(target=write, args=(n,)) for n in range(16)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    expected = hm.history.copy()
+    hm.close_journal()
+    reloaded = open_manager(tmp_path)
+    assert len(reloaded.history) == 16 * 300
+    assert list(reloaded.history["arguments"]) == list(expected["arguments"])
@@ -1,4 +1,8 @@
+import io
+import math
+import threading
 import time
+import pandas as pd
 import pytest
 from app.history_manager import HistoryManager
 
@@ -92,3 +96,96 @@ def test_save_and_load_history(tmp_path):
     hm.clear_history()
     hm.load_history(file_path)
     assert "add" in hm.get_history()
+
+def test_buffered_records_materialize_in_order():
+    hm = HistoryManager.get_instance()
+    hm.clear_history()
+    for i in range(5):
+        hm.add_record("add", [i, 1], i + 1)
+    assert list(hm.history["result"]) == [1, 2, 3, 4, 5]
+    hm.add_record("multiply", [2, 3], 6)
+    assert len(hm.history) == 6
+    assert hm.history.iloc[5]["command"] == "multiply"
+
+def test_edit_record_flushes_pending_rows():
+    hm = HistoryManager.get_instance()
+    hm.clear_history()
+    hm.add_record("add", [1, 1], 2)
+    hm.add_record("add", [2, 2], 4)
+    hm.edit_record(1, new_result=5)
+    assert hm.history.iloc[1]["result"] == 5
+
+def test_history_slice_spans_frame_and_pending():
+    hm = HistoryManager()
+    for i in range(3):
+        hm.add_record("add", [i, 0], i)
+    _ = hm.history
+    for i in range(3, 6):
+        hm.add_record("add", [i, 0], i)
+    assert hm.record_count() == 6
+    window = hm.history_slice(2, 5)
+    assert list(window.index) == [2, 3, 4]
+    assert list(window["result"]) == [2, 3, 4]
+    assert hm.history_slice(10, 20).empty
+
+def test_write_history_streams_chunks():
+    hm = HistoryManager()
+    for i in range(5):
+        hm.add_record("add", [i, 1], i + 1)
+    out = io.StringIO()
+    assert hm.write_history(out, 1, 5, chunk_rows=2) == 4
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 5
+    assert lines[0].split() == ["command", "arguments", "result", "timestamp"]
+    assert lines[1].split()[0] == "1"
+    empty = io.StringIO()
+    assert hm.write_history(empty, 7) == 0
+    assert empty.getvalue() == "No history available.\n"
+
+def test_write_history_chunks_line_up_with_header():
+    hm = HistoryManager()
+    hm.add_record("add", [1, 1], 2.0)
+    hm.add_record("multiply", [12345, 1000], 12345000.0)
+    hm.add_record("divide", [1, 0], float("nan"))
+    out = io.StringIO()
+    hm.write_history(out, chunk_rows=1)
+    lines = out.getvalue().splitlines()
+    assert len({len(line) for line in lines}) == 1
+    assert lines[0].index("result") + len("result") == lines[1].index("2.0") + len("2.0")
+    assert "NaN" in lines[3].split()
+
+def _run_writers(hm, threads, per_thread):
+    def write(worker):
+        for i in range(per_thread):
+            hm.add_record(f"w{worker}", [i], float(i))
+    workers = [threading.Thread(target=write, args=(n,)) for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+def test_concurrent_writers_lose_no_records():
+    hm = HistoryManager()
+    hm.query(command="w0")  # build the index so it is maintained concurrently too
+    _run_writers(hm, threads=16, per_thread=500)
+    history = hm.history
+    assert len(history) == 16 * 500
+    assert history["timestamp"].is_monotonic_increasing
+    for worker in range(16):
+        assert list(hm.query(command=f"w{worker}")["result"]) == [float(i) for i in range(500)]
+
+def test_csv_round_trip_without_dataframe(tmp_path):
+    hm = HistoryManager()
+    hm.add_record("add", [1.0, 2.0], 3.0)
+    hm.add_record("mode", ["a,b"], float("nan"))
+    hm.edit_record(0, new_result=4.0)
+    path = tmp_path / "history.csv"
+    hm.save_history(str(path))
+    assert hm._history is None  # pylint: disable=protected-access
+    expected = pd.read_csv(path)
+    loaded = HistoryManager()
+    loaded.load_history(str(path))
+    assert loaded.record_count() == 2
+    assert loaded._history is None  # pylint: disable=protected-access
+    pd.testing.assert_frame_equal(loaded.history, expected)
+    assert math.isnan(loaded.history["result"][1])
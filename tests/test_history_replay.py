@@ -0,0 +1,133 @@
+import io
+import json
+import math
+import numpy as np
+import pytest
+
+import history_replay
+import main
+from app.command import CommandFactory
+from app.history_manager import HistoryManager
+from history_replay import HistoryReplay, replay_history, write_report
+from plugin_manager import PluginManager
+
+def columns(*records):
+    return {column: [record[i] for record in records]
+            for i, column in enumerate(("command", "arguments", "result"))}
+
+def test_replay_flags_changed_results():
+    history = columns(("add", "[1.0, 2.0]", 3.0), ("divide", "[1.0, 4.0]", 0.25),
+                      ("add", "[2.0, 2.0]", 5.0), ("sqrt", "[9.0]", 3.0),
+                      ("mean", "[1.0, 2.0, 4.0]", 7 / 3), ("mode", "[2.0, 1.0, 1.0, 2.0]", 2.0),
+                      ("median", "[nan, 1.0, 2.0]", math.nan), ("MULTIPLY", "[3, 4]", 12.0))
+    report = replay_history(history)
+    assert report.totals() == {"match": 7, "mismatch": 1, "error": 0, "skipped": 0}
+    assert report.differences == [{"row": 2, "command": "add", "arguments": "[2.0, 2.0]",
+                                   "recorded": 5.0, "replayed": 4.0, "status": "mismatch",
+                                   "error": None}]
+
+def test_replay_reports_errors_and_unreplayable_records():
+    history = columns(("divide", "[1.0, 0.0]", 1.0), ("variance", "[1.0]", 0.0),
+                      ("add", "[]", 0.0), ("add", "not a list", 0.0),
+                      ("mean", "['@missing.f64']", 1.0), ("eval", "1 + 2 * 3", 7.0),
+                      ("eval", "x + 1", 2.0), ("frobnicate", "[1.0]", 1.0))
+    report = replay_history(history)
+    statuses = {d["row"]: (d["status"], d["error"]) for d in report.differences}
+    assert statuses[0] == ("error", "Division by zero is not allowed.")
+    assert statuses[1] == ("error", "VarianceCommand requires at least 2 arguments.")
+    assert statuses[2][0] == "error"
+    assert statuses[3][0] == "skipped"
+    assert statuses[4][0] == "error"
+    assert 5 not in statuses
+    assert statuses[6] == ("skipped", "The expression reads variables: x.")
+    assert statuses[7] == ("skipped", "Unknown command 'frobnicate'.")
+    assert report.counts["eval"] == {"match": 1, "mismatch": 0, "error": 0, "skipped": 1}
+
+def test_replay_tolerance():
+    history = columns(("add", "[0.1, 0.2]", 0.3))
+    assert replay_history(history).totals()["match"] == 1
+    assert replay_history(history, tolerance=0.0).totals()["mismatch"] == 1
+
+def test_replay_plugins(tmp_path):
+    (tmp_path / "triple.py").write_text(
+        "def register():\n    return {'name': 'triple', 'function': lambda x: x * 3}\n")
+    (tmp_path / "noise.py").write_text(
+        "import random\n"
+        "def register():\n"
+        "    return {'name': 'noise', 'function': random.random, 'deterministic': False}\n")
+    plugins = PluginManager(str(tmp_path))
+    plugins.load_plugins()
+    history = columns(("triple", "[2.0]", 6.0), ("triple", "['ab']", "ababab"),
+                      ("eval", "triple(2) + 1", 7.0), ("noise", "[]", 0.5))
+    report = HistoryReplay(CommandFactory(), plugins).replay(history)
+    assert report.totals() == {"match": 3, "mismatch": 0, "error": 0, "skipped": 1}
+    assert report.differences[0]["row"] == 3
+
+def test_parallel_replay_matches_serial(monkeypatch):
+    monkeypatch.setattr(history_replay, "MIN_PARALLEL_RECORDS", 0)
+    rng = np.random.default_rng(0)
+    values = rng.integers(1, 100, (300, 2)).astype(float).tolist()
+    history = columns(*[("divide", str(pair), pair[0] / pair[1] + (row % 50 == 0))
+                        for row, pair in enumerate(values)])
+    serial = replay_history(history)
+    parallel = replay_history(history, workers=3)
+    assert parallel.counts == serial.counts
+    assert parallel.differences == serial.differences
+    assert [d["row"] for d in parallel.differences] == list(range(0, 300, 50))
+
+def test_write_report_formats():
+    report = replay_history(columns(("add", "[1.0, 2.0]", 4.0), ("sqrt", "[-1.0]", 1.0)))
+    out = io.StringIO()
+    assert write_report(report, out) == 2
+    assert [json.loads(line)["status"] for line in out.getvalue().splitlines()] == [
+        "mismatch", "error"]
+    out = io.StringIO()
+    write_report(report, out, "csv")
+    assert out.getvalue().splitlines()[0] == ",".join(history_replay.REPORT_FIELDS)
+    assert out.getvalue().splitlines()[1] == '0,add,"[1.0, 2.0]",4.0,3.0,mismatch,'
+    with pytest.raises(ValueError):
+        write_report(report, out, "xml")
+
+def test_main_replay_exit_status(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    history = HistoryManager()
+    history.add_records([("add", [1.0, 2.0], 3.0), ("multiply", [2.0, 3.0], 6.0)])
+    history.save_history("history.csv")
+    main.main(["--replay", "history.csv"])
+    assert "2 match" in capsys.readouterr().err
+    history.edit_record(1, new_result=7.0)
+    history.save_history("history.csv")
+    with pytest.raises(SystemExit):
+        main.main(["--replay", "history.csv", "--format", "csv", "--output", "diff.csv"])
+    assert (tmp_path / "diff.csv").read_text().splitlines()[1].startswith("1,multiply,")
+
+def test_main_replay_skipped_records_do_not_fail(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    history = HistoryManager()
+    history.add_records([("add", [1.0, 2.0], 3.0), ("no_such_plugin", [1.0], 2.0)])
+    history.save_history("history.csv")
+    main.main(["--replay", "history.csv"])
+    assert "1 skipped" in capsys.readouterr().err
+
+def test_main_replay_reads_journaled_history_without_changing_it(tmp_path, monkeypatch,
+                                                                   capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("HISTORY_MAX_RECORDS", "1")
+    monkeypatch.setenv("HISTORY_COMPACT_THRESHOLD", "1")
+    (tmp_path / "data").mkdir()
+    history = HistoryManager()
+    history.add_records([("add", [1.0, 2.0], 3.0), ("sqrt", [9.0], 3.0)])
+    history.save_history(main.HISTORY_FILE)
+    journal = main.create_journal()
+    journal.compact_threshold = 100
+    history.open_journal(main.HISTORY_FILE, journal)
+    history.add_record("multiply", [2.0, 3.0], 6.0)
+    history.journal.sync()
+    before = {path: path.read_bytes() for path in (tmp_path / "data").rglob("*")
+              if path.is_file()}
+    main.main(["--replay"])
+    assert "3 match" in capsys.readouterr().err
+    after = {path: path.read_bytes() for path in (tmp_path / "data").rglob("*")
+             if path.is_file()}
+    assert after == before
+    history.close_journal()
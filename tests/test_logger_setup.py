@@ -1,5 +1,7 @@
+import json
 import logging
-from logger_setup import setup_logging
+import time
+from logger_setup import RateLimitFilter, setup_logging, stop_logging
 
 def test_logger_setup_debug(monkeypatch):
     monkeypatch.setenv("LOG_LEVEL", "DEBUG")
@@ -32,3 +34,91 @@ def test_logger_setup_no_existing_handlers(monkeypatch):
     setup_logging()
     # After setup, basicConfig should have added at least one handler
     assert len(root_logger.handlers) > 0
+
+def _close_handlers():
+    stop_logging()
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers:
+        handler.close()
+    root_logger.handlers.clear()
+
+def test_logger_setup_json_file(monkeypatch, tmp_path):
+    log_file = tmp_path / "calc.log"
+    monkeypatch.setenv("LOG_FILE", str(log_file))
+    monkeypatch.setenv("LOG_FORMAT", "json")
+    monkeypatch.delenv("LOG_LEVEL", raising=False)
+    setup_logging()
+    logging.warning("disk %s is full", "/data")
+    _close_handlers()
+    entries = [json.loads(line) for line in log_file.read_text().splitlines()]
+    assert entries[-1]["level"] == "WARNING"
+    assert entries[-1]["message"] == "disk /data is full"
+
+def test_logger_setup_queue_flushes_on_stop(monkeypatch, tmp_path):
+    log_file = tmp_path / "calc.log"
+    monkeypatch.setenv("LOG_FILE", str(log_file))
+    monkeypatch.setenv("LOG_QUEUE", "1")
+    monkeypatch.setenv("LOG_LEVEL", "DEBUG")
+    setup_logging()
+    assert [type(handler).__name__ for handler in logging.getLogger().handlers] == [
+        "_DeferredQueueHandler"]
+    for i in range(100):
+        logging.debug("record %d", i)
+    _close_handlers()
+    lines = log_file.read_text().splitlines()
+    assert lines[-1].endswith("DEBUG - record 99")
+    assert len([line for line in lines if "record" in line]) == 100
+
+def test_logger_setup_from_config_file(monkeypatch, tmp_path):
+    config_file = tmp_path / "logging.conf"
+    config_file.write_text(
+        "[loggers]\nkeys=root\n[handlers]\nkeys=file\n[formatters]\nkeys=plain\n"
+        "[logger_root]\nlevel=WARNING\nhandlers=file\n"
+        f"[handler_file]\nclass=FileHandler\nformatter=plain\nargs=({str(tmp_path / 'x.log')!r},)\n"
+        "[formatter_plain]\nformat=%(levelname)s %(message)s\n")
+    monkeypatch.setenv("LOG_CONFIG", str(config_file))
+    monkeypatch.delenv("LOG_LEVEL", raising=False)
+    setup_logging()
+    assert logging.getLogger().getEffectiveLevel() == logging.WARNING
+    logging.error("boom")
+    _close_handlers()
+    assert (tmp_path / "x.log").read_text() == "ERROR boom\n"
+
+def test_rate_limit_filter_suppresses_repeats(monkeypatch):
+    clock = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    rate_filter = RateLimitFilter(limit=2, interval=10)
+
+    def record(level=logging.ERROR, lineno=1):
+        return logging.LogRecord("root", level, "main.py", lineno, "failed: %s", ("x",), None)
+
+    assert [rate_filter.filter(record()) for _ in range(5)] == [True, True, False, False, False]
+    assert rate_filter.filter(record(lineno=2))
+    assert rate_filter.filter(record(level=logging.INFO))
+    clock[0] = 10.0
+    allowed = record()
+    assert rate_filter.filter(allowed)
+    assert allowed.getMessage() == "failed: x (3 similar messages suppressed)"
+
+def test_rate_limit_counts_each_record_once_across_handlers(monkeypatch, tmp_path):
+    monkeypatch.setenv("LOG_RATE_LIMIT", "2")
+    monkeypatch.setenv("LOG_CONFIG", str(tmp_path / "two.conf"))
+    monkeypatch.delenv("LOG_QUEUE", raising=False)
+    monkeypatch.delenv("LOG_FORMAT", raising=False)
+    (tmp_path / "two.conf").write_text(
+        "[loggers]\nkeys=root\n\n[handlers]\nkeys=a,b\n\n[formatters]\nkeys=plain\n\n"
+        "[logger_root]\nlevel=INFO\nhandlers=a,b\n\n"
+        f"[handler_a]\nclass=FileHandler\nformatter=plain\nargs=(r'{tmp_path / 'a.log'}',)\n\n"
+        f"[handler_b]\nclass=FileHandler\nformatter=plain\nargs=(r'{tmp_path / 'b.log'}',)\n\n"
+        "[formatter_plain]\nformat=%(message)s\n"
+    )
+    setup_logging()
+    for i in range(4):
+        logging.warning("repeated %d", i)
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+    expected = ["Logging is configured with level: INFO", "repeated 0", "repeated 1"]
+    assert (tmp_path / "a.log").read_text().splitlines() == expected
+    assert (tmp_path / "b.log").read_text().splitlines() == expected
+    monkeypatch.delenv("LOG_CONFIG")
+    setup_logging()
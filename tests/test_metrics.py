@@ -0,0 +1,77 @@
+import json
+import pytest
+
+import main
+from app.history_manager import HistoryManager
+from app.metrics import LatencyHistogram, Metrics, MetricsDumper
+
+def test_histogram_percentiles_within_bucket_precision():
+    histogram = LatencyHistogram()
+    for ns in range(1, 10_001):
+        histogram.record(ns * 1000)
+    assert histogram.count == 10_000
+    for fraction, exact in ((0.5, 5_000_000), (0.99, 9_900_000)):
+        assert exact <= histogram.percentile(fraction) <= exact * 1.125
+    assert histogram.percentile(1.0) == histogram.max_ns == 10_000_000
+
+def test_bucket_bounds_are_contiguous():
+    previous_upper = -1
+    for index in range(200):
+        upper = LatencyHistogram.bucket_upper_ns(index)
+        assert LatencyHistogram.bucket_index(previous_upper + 1) == index
+        assert LatencyHistogram.bucket_index(upper) == index
+        previous_upper = upper
+
+def test_timer_counts_calls_and_errors():
+    metrics = Metrics()
+    with metrics.time("execute", "add"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.time("execute", "add"):
+            raise ValueError("boom")
+    (row,) = metrics.snapshot()
+    assert (row["command"], row["stage"], row["count"], row["errors"]) == ("add", "execute", 2, 1)
+    assert row["buckets"][-1][1] == 2
+    metrics.reset()
+    assert metrics.snapshot() == []
+
+def test_disabled_metrics_record_nothing():
+    metrics = Metrics(enabled=False)
+    with metrics.time("execute", "add"):
+        pass
+    assert metrics.snapshot() == []
+    assert metrics.format_table() == "Metrics are disabled."
+
+def test_prometheus_and_json_dumps(tmp_path):
+    metrics = Metrics()
+    metrics.record("plugin", "square", 1500)
+    metrics.record("plugin", "square", 2_000_000, error=True)
+    text = metrics.to_prometheus()
+    assert 'calc_command_seconds_bucket{command="square",stage="plugin",le="+Inf"} 2' in text
+    assert 'calc_command_seconds_count{command="square",stage="plugin"} 2' in text
+    assert 'calc_command_errors_total{command="square",stage="plugin"} 1' in text
+    path = tmp_path / "metrics.json"
+    metrics.dump(str(path), "json")
+    assert json.loads(path.read_text())["metrics"][0]["errors"] == 1
+    with pytest.raises(ValueError):
+        metrics.dump(str(path), "xml")
+
+def test_dumper_writes_final_dump_on_stop(tmp_path):
+    metrics = Metrics()
+    path = tmp_path / "metrics.prom"
+    dumper = MetricsDumper(metrics, str(path), interval=3600).start()
+    metrics.record("execute", "add", 1000)
+    dumper.stop()
+    assert 'command="add"' in path.read_text()
+
+def test_repl_command_is_parsed_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(HistoryManager, "_instance", None)
+    metrics = Metrics()
+    monkeypatch.setattr(main, "create_metrics", lambda: (metrics, None))
+    inputs = iter(["add 1 2", "exit"])
+    monkeypatch.setattr("builtins.input", lambda prompt: next(inputs))
+    main.repl()
+    counts = {row["stage"]: row["count"] for row in metrics.snapshot()
+              if row["command"] == "add"}
+    assert counts["parse"] == 1 and counts["execute"] == 1
@@ -1,5 +1,9 @@
+import os
+import sys
 import pytest
-from plugin_manager import PluginManager
+import plugin_manager
+from app.result_cache import ResultCache
+from plugin_manager import LazyPlugin, PluginManager, read_plugin_metadata
 
 def test_plugin_manager_nonexistent_dir():
     pm = PluginManager(plugin_dir="nonexistent_dir")
@@ -68,3 +72,140 @@ def test_plugin_ignore_non_py_file(tmp_path):
     pm.load_plugins()
     # Since the file doesn't end with .py, it should be ignored.
     assert not pm.get_plugin_commands()
+
+def test_static_plugin_is_imported_on_first_call(tmp_path):
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    (plugin_dir / "lazy_plugin.py").write_text(
+        "import pathlib\n"
+        "pathlib.Path(__file__).with_name('imported.flag').write_text('yes')\n"
+        "def triple(x):\n    return x * 3\n\n"
+        "def register():\n    return {'name': 'triple', 'function': triple}\n"
+    )
+    pm = PluginManager(plugin_dir=str(plugin_dir))
+    pm.load_plugins()
+    assert pm.get_plugin_commands() == ['triple']
+    assert not (plugin_dir / "imported.flag").exists()
+    assert pm.execute_plugin('triple', 2) == 6
+    assert (plugin_dir / "imported.flag").exists()
+    assert not isinstance(pm.plugins['triple'], LazyPlugin)
+
+def test_dynamic_register_is_imported_eagerly(tmp_path):
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    (plugin_dir / "dynamic.py").write_text(
+        "NAME = 'neg'\n"
+        "def register():\n    return {'name': NAME, 'function': lambda x: -x}\n"
+    )
+    pm = PluginManager(plugin_dir=str(plugin_dir))
+    pm.load_plugins()
+    assert not isinstance(pm.plugins['neg'], LazyPlugin)
+    assert pm.execute_plugin('neg', 2) == -2
+
+def test_read_plugin_metadata(tmp_path):
+    plugin = tmp_path / "meta.py"
+    plugin.write_text(
+        "def register():\n"
+        "    return {'name': 'tick', 'function': None, 'deterministic': False}\n"
+    )
+    assert read_plugin_metadata(str(plugin)) == {"name": "tick", "deterministic": False}
+    plugin.write_text("def helper():\n    pass\n")
+    assert read_plugin_metadata(str(plugin)) == {}
+    plugin.write_text("from elsewhere import register\n")
+    assert read_plugin_metadata(str(plugin)) is None
+
+def test_manifest_skips_parsing_unchanged_files(tmp_path, monkeypatch):
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    (plugin_dir / "double.py").write_text(
+        "def register():\n    return {'name': 'double', 'function': lambda x: x * 2}\n"
+    )
+    PluginManager(plugin_dir=str(plugin_dir)).load_plugins()
+    assert (plugin_dir / "__pycache__" / "plugin_manifest.json").exists()
+
+    def fail(path):
+        raise AssertionError(f"{path} should not be parsed again")
+    monkeypatch.setattr(plugin_manager, "read_plugin_metadata", fail)
+    pm = PluginManager(plugin_dir=str(plugin_dir))
+    pm.load_plugins()
+    assert pm.execute_plugin('double', 4) == 8
+
+def test_lazy_plugin_that_fails_to_import(tmp_path):
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    (plugin_dir / "broken.py").write_text(
+        "import not_a_real_module\n"
+        "def register():\n    return {'name': 'broken', 'function': None}\n"
+    )
+    pm = PluginManager(plugin_dir=str(plugin_dir))
+    pm.load_plugins()
+    with pytest.raises(ValueError):
+        pm.execute_plugin('broken')
+
+def write_plugin(path, name, body):
+    path.write_text(
+        f"def {name}(x):\n    return {body}\n\n"
+        f"def register():\n    return {{'name': '{name}', 'function': {name}}}\n"
+    )
+
+def test_reload_plugins_reports_changes(tmp_path):
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    write_plugin(plugin_dir / "double.py", "double", "x * 2")
+    write_plugin(plugin_dir / "halve.py", "halve", "x / 2")
+    pm = PluginManager(plugin_dir=str(plugin_dir))
+    pm.load_plugins()
+    assert pm.execute_plugin('double', 3) == 6
+    old_double = pm.plugins['double']
+
+    write_plugin(plugin_dir / "double.py", "double", "x * 2 + 1000")
+    (plugin_dir / "halve.py").unlink()
+    write_plugin(plugin_dir / "negate.py", "negate", "-x")
+    report = pm.reload_plugins()
+    assert report == {"added": ["negate"], "changed": ["double"], "removed": ["halve"]}
+    assert pm.execute_plugin('double', 3) == 1006
+    assert pm.execute_plugin('negate', 3) == -3
+    assert 'halve' not in pm.get_plugin_commands()
+    # A caller that already looked up the old function keeps using it.
+    assert old_double(3) == 6
+
+def test_reload_plugins_ignores_touch_without_change(tmp_path):
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    write_plugin(plugin_dir / "double.py", "double", "x * 2")
+    pm = PluginManager(plugin_dir=str(plugin_dir))
+    pm.load_plugins()
+    stub = pm.plugins['double']
+    os.utime(plugin_dir / "double.py", ns=(1, 1))
+    assert pm.reload_plugins() == {"added": [], "changed": [], "removed": []}
+    assert pm.plugins['double'] is stub
+
+def test_reload_plugins_invalidates_cached_results(tmp_path):
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    write_plugin(plugin_dir / "double.py", "double", "x * 2")
+    cache = ResultCache()
+    pm = PluginManager(plugin_dir=str(plugin_dir), cache=cache)
+    pm.load_plugins()
+    assert pm.execute_plugin('double', 3) == 6
+    write_plugin(plugin_dir / "double.py", "double", "x * 20")
+    pm.reload_plugins()
+    assert pm.execute_plugin('double', 3) == 60
+
+def test_reload_plugins_same_size_edit_within_a_second(tmp_path, monkeypatch):
+    monkeypatch.setattr(sys, "dont_write_bytecode", False)
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    path = plugin_dir / "triple.py"
+    # Built eagerly (no static register) so the module is imported at load time.
+    path.write_text("def triple(x):\n    return x * 2\n\n"
+                    "def register():\n    return dict(name='triple', function=triple)\n")
+    os.utime(path, ns=(1_700_000_000_100_000_000, 1_700_000_000_100_000_000))
+    pm = PluginManager(plugin_dir=str(plugin_dir))
+    pm.load_plugins()
+    assert pm.execute_plugin('triple', 3) == 6
+    # Same size and the same whole second: stale bytecode would still pass its check.
+    path.write_text(path.read_text().replace("x * 2", "x * 3"))
+    os.utime(path, ns=(1_700_000_000_200_000_000, 1_700_000_000_200_000_000))
+    assert pm.reload_plugins()["changed"] == ["triple"]
+    assert pm.execute_plugin('triple', 3) == 9
@@ -0,0 +1,89 @@
+import os
+import threading
+import pytest
+
+from plugin_manager import PluginManager
+from plugin_pool import PluginPool
+
+@pytest.fixture
+def plugin_dir(tmp_path):
+    directory = tmp_path / "plugins"
+    directory.mkdir()
+    (directory / "slow.py").write_text(
+        "import os, time\n"
+        "def work(x):\n"
+        "    if x < 0:\n"
+        "        raise ValueError('negative input')\n"
+        "    if x == 999:\n"
+        "        time.sleep(30)\n"
+        "    if x == 500:\n"
+        "        time.sleep(1)\n"
+        "    if x == 666:\n"
+        "        os._exit(1)\n"
+        "    return (x * 2, os.getpid())\n\n"
+        "def register():\n    return {'name': 'work', 'function': work}\n"
+    )
+    return str(directory)
+
+@pytest.fixture
+def pool(plugin_dir):
+    pool = PluginPool(plugin_dir, max_workers=2, timeout=5).start()
+    yield pool
+    pool.shutdown(force=True)
+
+def test_execute_runs_in_worker(pool):
+    value, pid = pool.execute("work", 21)
+    assert value == 42
+    assert pid != os.getpid()
+
+def test_map_fans_out_in_order(pool):
+    results = pool.map("work", [(i,) for i in range(20)])
+    assert [value for value, _ in results] == [i * 2 for i in range(20)]
+
+def test_plugin_errors_propagate(pool):
+    with pytest.raises(ValueError, match="negative input"):
+        pool.execute("work", -1)
+    with pytest.raises(ValueError, match="not found"):
+        pool.execute("missing")
+
+def test_timeout_restarts_workers(pool):
+    with pytest.raises(TimeoutError):
+        pool.execute("work", 999, timeout=0.5)
+    assert pool.execute("work", 1)[0] == 2
+
+def test_crashed_worker_is_replaced(pool):
+    with pytest.raises(RuntimeError):
+        pool.execute("work", 666)
+    assert pool.execute("work", 2)[0] == 4
+
+def test_plugin_manager_with_pool(plugin_dir, pool):
+    pm = PluginManager(plugin_dir=plugin_dir, pool=pool)
+    pm.load_plugins()
+    assert pm.execute_plugin("work", 5)[0] == 10
+
+def test_timeout_spares_calls_running_on_other_threads(pool):
+    _, slow = pool._submit("work", (500,))
+    with pytest.raises(TimeoutError):
+        pool.execute("work", 999, timeout=0.5)
+    assert slow.result()[0] == 1000
+    assert pool.execute("work", 1)[0] == 2
+
+def test_restart_lets_running_calls_finish(pool):
+    old, slow = pool._submit("work", (500,))
+    pool.restart()
+    assert pool._executor is not old
+    assert slow.result()[0] == 1000
+    assert pool.execute("work", 1)[0] == 2
+
+def test_failures_in_a_replaced_pool_keep_the_new_one(pool):
+    old = pool._executor
+    threads = [threading.Thread(target=pool._retire, args=(old,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    new = pool.start()._executor
+    # A late failure from the old workers must not replace the new ones again.
+    pool._retire(old)
+    assert pool._executor is new
+    assert pool.execute("work", 1)[0] == 2
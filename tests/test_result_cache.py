@@ -0,0 +1,80 @@
+import pytest
+
+from app.command import CommandFactory
+from app.result_cache import ResultCache
+from plugin_manager import PluginManager
+
+def test_cache_hit_and_miss_counters():
+    cache = ResultCache(maxsize=4)
+    calls = []
+    key = cache.make_key("command", "ADD", [1, 2])
+    assert cache.get_or_compute(key, lambda: calls.append(1) or 3) == 3
+    assert cache.get_or_compute(cache.make_key("command", "add", [1.0, 2.0]), lambda: 0) == 3
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+def test_lru_evicts_least_recently_used():
+    cache = ResultCache(maxsize=2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("c", lambda: 3)
+    assert cache.get_or_compute("a", lambda: "recomputed") == 1
+    assert cache.get_or_compute("b", lambda: "recomputed") == "recomputed"
+
+def test_fifo_evicts_oldest_insert():
+    cache = ResultCache(maxsize=2, policy="fifo")
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("b", lambda: 2)
+    cache.get_or_compute("a", lambda: 1)
+    cache.get_or_compute("c", lambda: 3)
+    assert cache.get_or_compute("a", lambda: "recomputed") == "recomputed"
+
+def test_zero_size_and_unhashable_bypass_cache():
+    cache = ResultCache(maxsize=0)
+    assert cache.get_or_compute("a", lambda: 1) == 1
+    assert len(cache) == 0
+    assert ResultCache.make_key("plugin", "x", [[1, 2]]) is None
+
+def test_clear_resets_entries_and_counters():
+    cache = ResultCache()
+    cache.get_or_compute("a", lambda: 1)
+    cache.clear()
+    assert cache.stats() == {"size": 0, "maxsize": 256, "policy": "lru",
+                             "hits": 0, "misses": 0, "hit_rate": 0.0}
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        ResultCache(maxsize=-1)
+    with pytest.raises(ValueError):
+        ResultCache(policy="random")
+
+def test_command_factory_uses_cache():
+    cache = ResultCache()
+    factory = CommandFactory(cache=cache)
+    assert factory.execute_command("mean", [1, 2, 3]) == 2
+    assert factory.execute_command("Mean", [1, 2, 3]) == 2
+    assert cache.hits == 1
+    with pytest.raises(ValueError):
+        factory.execute_command("unknown", [1])
+
+def test_nondeterministic_plugin_not_cached(tmp_path):
+    plugin_dir = tmp_path / "plugins"
+    plugin_dir.mkdir()
+    (plugin_dir / "counter.py").write_text(
+        "import itertools\n"
+        "_calls = itertools.count(1)\n"
+        "def register():\n"
+        "    return {'name': 'tick', 'function': lambda: next(_calls), 'deterministic': False}\n"
+    )
+    (plugin_dir / "double.py").write_text(
+        "def register():\n    return {'name': 'double', 'function': lambda x: x * 2}\n"
+    )
+    cache = ResultCache()
+    pm = PluginManager(plugin_dir=str(plugin_dir), cache=cache)
+    pm.load_plugins()
+    assert pm.execute_plugin("tick") == 1
+    assert pm.execute_plugin("tick") == 2
+    assert pm.execute_plugin("double", 4) == 8
+    assert pm.execute_plugin("double", 4) == 8
+    assert cache.hits == 1
@@ -0,0 +1,96 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from app.command import CommandFactory
+from app.history_manager import HistoryManager
+from app.result_cache import ResultCache
+from plugin_manager import PluginManager
+from server import PIPELINE_DEPTH, CalculatorServer
+
+def _strict(constant):
+    raise ValueError(f"{constant} is not valid JSON")
+
+async def _exchange(calculator, lines):
+    server = await calculator.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write("".join(f"{line}\n" for line in lines).encode())
+        await writer.drain()
+        responses = [json.loads(await reader.readline(), parse_constant=_strict)
+                     for _ in lines]
+        writer.close()
+        await writer.wait_closed()
+    return responses
+
+def test_pipelined_requests_answered_in_order():
+    hm = HistoryManager()
+    calculator = CalculatorServer(CommandFactory(), None, hm)
+    responses = asyncio.run(_exchange(calculator, ["add 1 2", "divide 1 0", "bogus", "sqrt 9"]))
+    assert [r["id"] for r in responses] == [1, 2, 3, 4]
+    assert responses[0]["result"] == 3 and responses[0]["error"] is None
+    assert responses[1]["error"] == "Division by zero is not allowed."
+    assert "Unknown command" in responses[2]["error"]
+    assert responses[3]["result"] == 3
+    assert list(hm.history["command"]) == ["add", "sqrt"]
+    assert calculator.requests == 4
+
+def test_non_finite_result_is_valid_json():
+    calculator = CalculatorServer(CommandFactory(), None)
+    (response,) = asyncio.run(_exchange(calculator, ["multiply 1e308 10"]))
+    assert response["result"] is None
+    assert response["error"] == "Result inf is not a finite number."
+
+def test_plugin_calls_run_in_executor(tmp_path):
+    (tmp_path / "double.py").write_text(
+        "def register():\n    return {'name': 'double', 'function': lambda x: x * 2}\n"
+    )
+    pm = PluginManager(plugin_dir=str(tmp_path))
+    pm.load_plugins()
+    calculator = CalculatorServer(CommandFactory(), pm)
+    responses = asyncio.run(_exchange(calculator, ["double 4", "add 2 2"]))
+    assert responses[0]["result"] == 8
+    assert responses[1]["result"] == 4
+
+class _ClosedWriter:
+    """A StreamWriter whose client has disconnected."""
+    class transport:  # pylint: disable=invalid-name
+        @staticmethod
+        def get_write_buffer_size():
+            return 1 << 20
+
+    def write(self, data):
+        pass
+
+    async def drain(self):
+        raise ConnectionResetError()
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+def test_disconnected_client_with_full_pipeline_is_released():
+    async def run():
+        reader = asyncio.StreamReader()
+        # More requests than the pipeline holds, and the stream never ends.
+        reader.feed_data(b"add 1 2\n" * (PIPELINE_DEPTH * 2))
+        calculator = CalculatorServer(CommandFactory(), None)
+        await asyncio.wait_for(calculator.handle_client(reader, _ClosedWriter()), 5)
+        return calculator.requests
+    assert asyncio.run(run()) == 1
+
+def test_cache_shared_with_executor_threads():
+    cache = ResultCache(maxsize=8)
+    factory = CommandFactory(cache)
+
+    def hammer(offset):
+        for i in range(2000):
+            assert factory.execute_command("add", [float((i + offset) % 20), 1.0]) == \
+                (i + offset) % 20 + 1
+    with ThreadPoolExecutor(max_workers=4) as threads:
+        list(threads.map(hammer, range(4)))
+    assert len(cache) == 8
+    assert cache.hits + cache.misses == 8000
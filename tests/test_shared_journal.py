@@ -0,0 +1,193 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+from app.history_archive import HistoryArchive
+from app.history_journal import HistoryJournal
+from app.history_manager import HistoryManager
+from app.shared_journal import SharedJournal
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+def open_manager(tmp_path, **options):
+    hm = HistoryManager()
+    journal = SharedJournal(str(tmp_path / "history.journal.d"), **options)
+    hm.open_journal(str(tmp_path / "history.csv"), journal)
+    return hm
+
+def test_processes_merge_by_timestamp(tmp_path):
+    first = open_manager(tmp_path)
+    second = open_manager(tmp_path)
+    first.add_record("add", [1, 1], 2)
+    second.add_record("add", [2, 2], 4)
+    first.add_record("add", [3, 3], 6)
+    first.close_journal()
+    second.close_journal()
+    reloaded = open_manager(tmp_path)
+    assert list(reloaded.history["result"]) == [2, 4, 6]
+    # Neither writer saw the other's records; nothing was lost to the last writer.
+    assert list(first.history["result"]) == [2, 6]
+
+def test_compaction_keeps_live_writers_records(tmp_path):
+    writer = open_manager(tmp_path)
+    writer.add_record("add", [1, 1], 2)
+    writer.journal.sync()
+    live = os.path.basename(writer.journal.journal_path)
+    finished = open_manager(tmp_path)
+    finished.add_record("add", [2, 2], 4)
+    exited = os.path.basename(finished.journal.journal_path)
+    finished.close_journal()
+    compactor = open_manager(tmp_path, compact_threshold=2)
+    compactor.add_record("add", [3, 3], 6)
+    # The compaction folded all three into the snapshot; the live writer goes on.
+    assert (tmp_path / "history.csv").exists()
+    writer.add_record("add", [4, 4], 8)
+    writer.close_journal()
+    compactor.close_journal()
+    segments = os.listdir(tmp_path / "history.journal.d")
+    assert live in segments and exited not in segments
+    reloaded = open_manager(tmp_path)
+    assert list(reloaded.history["result"]) == [2, 4, 6, 8]
+
+def test_edit_finds_record_moved_by_other_processes(tmp_path):
+    first = open_manager(tmp_path)
+    second = open_manager(tmp_path)
+    second.add_record("add", [1, 1], 2)
+    first.add_record("add", [2, 2], 4)
+    first.journal.sync()
+    second.close_journal()
+    # Record 0 here is record 1 in the merged history.
+    first.edit_record(0, new_result=5)
+    first.close_journal()
+    reloaded = open_manager(tmp_path)
+    assert list(reloaded.history["result"]) == [2, 5]
+
+def test_single_process_journal_is_migrated(tmp_path):
+    legacy = HistoryManager()
+    legacy.open_journal(str(tmp_path / "history.csv"),
+                        HistoryJournal(str(tmp_path / "history.journal")))
+    legacy.add_record("add", [1, 1], 2)
+    legacy.close_journal()
+    hm = open_manager(tmp_path, legacy_path=str(tmp_path / "history.journal"),
+                      compact_threshold=2)
+    assert list(hm.history["result"]) == [2]
+    hm.add_record("add", [2, 2], 4)
+    assert not (tmp_path / "history.journal").exists()
+    hm.close_journal()
+    reloaded = open_manager(tmp_path, legacy_path=str(tmp_path / "history.journal"))
+    assert list(reloaded.history["result"]) == [2, 4]
+
+def test_manifest_survives_interrupted_compaction(tmp_path):
+    hm = open_manager(tmp_path)
+    hm.add_record("add", [1, 1], 2)
+    hm.close_journal()
+    directory = tmp_path / "history.journal.d"
+    names = [name for name in os.listdir(directory) if name.endswith(".journal")]
+    # Crash after the snapshot was replaced but before the new manifest was moved in.
+    merged = HistoryManager()
+    merged.add_record("add", [1, 1], 2)
+    merged.save_history(str(tmp_path / "history.csv"))
+    (directory / "manifest.json.tmp").write_text(json.dumps(
+        {"snapshot": HistoryJournal.fingerprint(merged.history),
+         "folded": {name: os.path.getsize(directory / name) for name in names}}))
+    reloaded = open_manager(tmp_path)
+    assert list(reloaded.history["result"]) == [2]
+
+def test_retention_archives_at_compaction(tmp_path):
+    archive = HistoryArchive(str(tmp_path / "archive"))
+    hm = HistoryManager()
+    hm.set_retention(2, archive)
+    hm.open_journal(str(tmp_path / "history.csv"),
+                    SharedJournal(str(tmp_path / "history.journal.d"), compact_threshold=4))
+    for i in range(4):
+        hm.add_record("add", [i, i], 2 * i)
+    assert hm._row_count() == 2
+    assert [record[2] for record in archive.read("segment-000001.csv")] == [0, 2]
+    hm.close_journal()
+    reloaded = open_manager(tmp_path)
+    assert list(reloaded.history["result"]) == [4, 6]
+
+def test_concurrent_processes_lose_nothing(tmp_path):
+    script = (
+        "import sys\n"
+        "from app.history_manager import HistoryManager\n"
+        "from app.shared_journal import SharedJournal\n"
+        "hm = HistoryManager()\n"
+        "hm.open_journal('history.csv', SharedJournal('history.journal.d',"
+        " compact_threshold=25))\n"
+        "for i in range(100):\n"
+        "    hm.add_record('add', [sys.argv[1], i], i)\n"
+        "hm.close_journal()\n"
+    )
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    workers = [subprocess.Popen([sys.executable, "-c", script, str(n)], cwd=tmp_path, env=env)
+               for n in range(4)]
+    assert [worker.wait() for worker in workers] == [0] * 4
+    reloaded = open_manager(tmp_path)
+    arguments = sorted(reloaded.history["arguments"])
+    assert arguments == sorted(f"['{n}', {i}]" for n in range(4) for i in range(100))
+
+def test_compaction_interrupted_after_archiving(tmp_path, monkeypatch):
+    def open_retained():
+        hm = HistoryManager()
+        hm.set_retention(2, HistoryArchive(str(tmp_path / "archive")))
+        hm.open_journal(str(tmp_path / "history.csv"),
+                        SharedJournal(str(tmp_path / "history.journal.d"), compact_threshold=4))
+        return hm
+
+    hm = open_retained()
+
+    def crash(self, filepath):
+        raise OSError("power lost")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(HistoryManager, "save_history", crash)
+        for i in range(3):
+            hm.add_record("add", [i, i], 2 * i)
+        with pytest.raises(OSError):
+            hm.add_record("add", [3, 3], 6)
+    assert [record[2] for record in hm.archive.read("segment-000001.csv")] == [0, 2]
+    hm.journal.close()
+    # The next process compacts again and archives the same records, but only once.
+    reloaded = open_retained()
+    assert [record[2] for record in reloaded.archive.read("segment-000001.csv")] == [0, 2]
+    assert list(open_manager(tmp_path).history["result"]) == [4, 6]
+
+def test_compaction_deletes_exited_segment_with_torn_tail(tmp_path):
+    crashed = open_manager(tmp_path)
+    crashed.add_record("add", [1, 1], 2)
+    path = crashed.journal.journal_path
+    crashed.close_journal()
+    # The process died partway through writing its next entry.
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"op": "add", "rec')
+    compactor = open_manager(tmp_path, compact_threshold=2)
+    compactor.add_record("add", [2, 2], 4)
+    assert not os.path.exists(path)
+    compactor.close_journal()
+    assert list(open_manager(tmp_path).history["result"]) == [2, 4]
+
+def test_compaction_keeps_entries_written_after_it_read(tmp_path, monkeypatch):
+    finished = open_manager(tmp_path)
+    finished.add_record("add", [1, 1], 2)
+    path = finished.journal.journal_path
+    finished.close_journal()
+    entry = {"op": "add", "record": {"command": "add", "arguments": "[3, 3]", "result": 6,
+                                     "timestamp": "9999-12-31 23:59:59.999999"}}
+    save_history = HistoryManager.save_history
+
+    def append_then_save(self, filepath):
+        # The exited process's last entry reaches the disk after the compaction read.
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+        save_history(self, filepath)
+
+    compactor = open_manager(tmp_path, compact_threshold=2)
+    monkeypatch.setattr(HistoryManager, "save_history", append_then_save)
+    compactor.add_record("add", [2, 2], 4)
+    monkeypatch.undo()
+    assert os.path.exists(path)
+    compactor.close_journal()
+    assert list(open_manager(tmp_path).history["result"]) == [2, 4, 6]
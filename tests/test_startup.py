@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+# Modules that short-lived invocations should never pay for.
+DEFERRED = ("pandas", "asyncio", "concurrent.futures.process")
+
+def test_import_main_defers_heavy_modules():
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                               cwd=ROOT, capture_output=True, text=True, check=True)
+    imported = {line.split("|")[-1].strip() for line in completed.stderr.splitlines()
+                if line.startswith("import time:")}
+    assert "main" in imported
+    assert not imported & set(DEFERRED)
+
+def test_batch_run_never_imports_pandas(tmp_path):
+    script = (
+        "import sys, main\n"
+        "main.main(['--batch', 'commands.txt', '--output', 'out.jsonl'])\n"
+        "main.main(['--batch', 'commands.txt', '--output', 'out.jsonl'])\n"
+        "print('pandas' in sys.modules)\n"
+    )
+    (tmp_path / "commands.txt").write_text("add 1 2\ndivide 1 0\nsqrt 9\n")
+    env = dict(os.environ, PYTHONPATH=ROOT, HISTORY_COMPACT_THRESHOLD="3")
+    completed = subprocess.run([sys.executable, "-c", script], cwd=tmp_path, env=env,
+                               capture_output=True, text=True, check=True)
+    assert completed.stdout.strip() == "False"
+    # The second run loaded the first run's snapshot and compacted it without pandas.
+    lines = (tmp_path / "data" / "history.csv").read_text().splitlines()
+    assert lines[0] == "command,arguments,result,timestamp"
+    assert [line.split(",")[0] for line in lines[1:]] == ["add", "sqrt", "add", "sqrt"]